@@ -165,6 +165,7 @@ from .errors import *
 #---------Microscope control data classes handling data properties----------
 from .emcontrols import EMControl as EMC
 from .emcontrols import SIMControl as SIMC
+from .emcontrols import EMCGrid
 
 #---------Diffraction classes handling diffraction pattern data-------------
 from .kdiffs import diffPattern as DP
@@ -173,6 +174,18 @@ from .ddiffs import BlochImgs as BImgList
 
 #--------------Crystal Classes and subclasses-------------------------------
 from .crystals import Cell, Atom, SPG, Crystal
+
+#--------------Parallel simulations in worker processes---------------------
+from .parallel import DiffractionPool
+
+#--------------Persistent cache of simulation results------------------------
+from .cache import SimCache
+
+#--------------Dynamic diffraction simulation sessions-----------------------
+from .session import BlochSession, BlochPropagator
+
+#--------------Diffraction pattern databases for indexing--------------------
+from .dpdb import DPDatabase
 try:
     from .kdiffs import XMAX, YMAX
 except ImportError as e:
@@ -0,0 +1,449 @@
+'''
+.. This file is part of pyEMAPS
+
+Cache module keeps simulation results on disk so that simulations
+repeated with unchanged inputs are read back instead of rerun.
+
+Results are stored in the *cache* folder of the pyemaps data home set
+by PYEMAPS_DATA, under keys hashed from the crystal data, the simulation
+controls and the backend version. See `SimCache <pyemaps.cache.html#pyemaps.cache.SimCache>`_
+for the simulations cached.
+
+.. ----
+
+.. pyEMAPS is free software. You can redistribute it and/or modify
+.. it under the terms of the GNU General Public License as published
+.. by the Free Software Foundation, either version 3 of the License,
+.. or (at your option) any later version..
+
+.. pyEMAPS is distributed in the hope that it will be useful,
+.. but WITHOUT ANY WARRANTY; without even the implied warranty of
+.. MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+.. GNU General Public License for more details.
+
+.. You should have received a copy of the GNU General Public License
+.. along with pyEMAPS.  If not, see `<https://www.gnu.org/licenses/>`_.
+
+.. Contact supprort@emlabsoftware.com for any questions and comments.
+
+.. ----
+
+.. Author:     EMLab Solutions, Inc.
+.. Date:       October 18, 2026
+
+'''
+
+import hashlib
+import os
+
+import numpy as np
+from numpy import asfortranarray as farray
+
+from . import EMC, DP, DEF_MODE, DEF_CBED_DSIZE, DEF_XAXIS, PKG_TYPE
+from .fileutils import compose_ofn, find_pyemaps_datahome
+
+CACHE_HOME = 'cache'
+#str: cache folder in pyemaps data home
+
+DEF_CACHE_SIZE = 512*1024*1024
+#int: default size limit of the cache in bytes
+
+CACHE_EXT = '.npz'
+
+def _backend_version():
+    '''
+    internal - version of the simulation backend, emaps, and its package
+    type. Cached results of other versions are not used, and none are
+    cached when the version is unknown.
+
+    '''
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        ver = version('emaps')
+    except PackageNotFoundError:
+        return None
+
+    return f'{ver}-{PKG_TYPE}'
+
+def _emc_data(emc):
+    '''
+    internal - microscope and simulation control values of emc
+
+    '''
+    sc = emc.simc
+    simc = (sc.excitation, sc.gmax, sc.bmin, sc.intensity, sc.gctl,
+            sc.zctl, sc.omega, sc.sampling, sc.sth)
+
+    return (emc.zone, emc.tilt, emc.defl, emc.cl, emc.vt, emc.xaxis, simc)
+
+class SimCache:
+    '''
+    Persistent on-disk cache of simulation results.
+
+    Each result is saved as a compressed numpy .npz file named by a hash
+    of the crystal data, the simulation inputs and the backend version.
+    When the cache grows over its size limit, the least recently used
+    results are removed.
+
+    .. code-block:: python
+
+        from pyemaps import Crystal, EMC, SimCache
+
+        si = Crystal.from_builtin('Silicon')
+        cache = SimCache()
+
+        emc, dp = cache.generateDP(si, em_controls = EMC(tilt = (0.5, 0.0)))
+        print(cache.stats())
+
+    .. note::
+
+        Crystal names are not part of the keys, crystals with the same
+        data share their cached results.
+
+        Nothing is cached when the installed backend version is unknown,
+        as results of another backend could not be told apart.
+
+    '''
+    def __init__(self, cache_dir = None, max_size = DEF_CACHE_SIZE):
+        '''
+        :param cache_dir: Folder for the cached results, defaults to *cache* folder in pyemaps data home.
+        :type cache_dir: str, optional
+
+        :param max_size: Size limit of the cache in bytes.
+        :type max_size: int, optional
+
+        '''
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            raise FileNotFoundError(f'Cache folder {cache_dir} not found')
+
+        if not isinstance(max_size, int) or max_size <= 0:
+            raise ValueError('Cache size limit must be a positive integer')
+
+        self._dir = cache_dir
+        self._max_size = max_size
+        self._version = _backend_version()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def cache_dir(self):
+        '''
+        Folder of the cached results
+
+        '''
+        if self._dir is None:
+            return find_pyemaps_datahome(home_type=CACHE_HOME)
+
+        return self._dir
+
+    @property
+    def max_size(self):
+        '''
+        Size limit of the cache in bytes
+
+        '''
+        return self._max_size
+
+    @property
+    def hits(self):
+        '''
+        Number of results read from the cache
+
+        '''
+        return self._hits
+
+    @property
+    def misses(self):
+        '''
+        Number of results simulated and added to the cache
+
+        '''
+        return self._misses
+
+    def _key(self, feature, cr, *args):
+        '''
+        internal - cache key of a feature simulation of crystal cr with inputs args
+
+        '''
+        data = (self._version, feature, cr._fingerprint(), args)
+
+        return feature + '-' + hashlib.sha256(repr(data).encode()).hexdigest()
+
+    def _path(self, key):
+
+        if self._dir is None:
+            return compose_ofn(key + CACHE_EXT, None, ty=CACHE_HOME)
+
+        return os.path.join(self._dir, key + CACHE_EXT)
+
+    def _entries(self):
+        '''
+        internal - (path, size, last use time) of all cached results
+
+        '''
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith(CACHE_EXT):
+                    st = e.stat()
+                    entries.append((e.path, st.st_size, st.st_mtime))
+
+        return entries
+
+    def _get(self, key):
+        '''
+        internal - arrays cached under key, None if not in the cache
+
+        '''
+        fn = self._path(key)
+        if self._version is None or not os.path.exists(fn):
+            self._misses += 1
+            return None
+
+        try:
+            with np.load(fn) as f:
+                data = {k: f[k] for k in f.files}
+
+            # file modification time is the last use time for eviction
+            os.utime(fn)
+
+        except (OSError, ValueError) as e:
+            print(f'Warning: failed to read cached result {fn}: {e}')
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return data
+
+    def _put(self, key, **arrays):
+        '''
+        internal - saves arrays under key and evicts the least recently
+        used results over the size limit
+
+        '''
+        if self._version is None:
+            return
+
+        fn = self._path(key)
+        tmpfn = f'{fn}.{os.getpid()}.tmp'
+        try:
+            with open(tmpfn, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+
+            os.replace(tmpfn, fn)
+
+        except OSError as e:
+            print(f'Warning: failed to save simulation result to cache {fn}: {e}')
+            if os.path.exists(tmpfn):
+                os.remove(tmpfn)
+            return
+
+        self._evict(keep = fn)
+
+    def _evict(self, keep = None):
+
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+
+        for fn, sz, _ in entries:
+            if total <= self._max_size:
+                break
+
+            if fn == keep:
+                continue
+
+            try:
+                os.remove(fn)
+            except OSError:
+                continue
+
+            total -= sz
+
+    def size(self):
+        '''
+        Total size of the cached results in bytes.
+
+        '''
+        return sum(e[1] for e in self._entries())
+
+    def clear(self):
+        '''
+        Removes all cached results and resets the hit and miss counters.
+
+        '''
+        for fn, _, _ in self._entries():
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self):
+        '''
+        Cache usage statistics.
+
+        :return: hits, misses, number of entries and size in bytes
+        :rtype: dict
+
+        '''
+        entries = self._entries()
+
+        return dict(hits = self._hits,
+                    misses = self._misses,
+                    entries = len(entries),
+                    size = sum(e[1] for e in entries))
+
+    def generateDP(self, cr, mode = None, dsize = None, em_controls = None):
+        """
+        Cached kinematic diffraction simulation,
+        see `generateDP <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDP>`_.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :return: A tuple (emc, dp) where emc is the microscope control and dp is a diffraction pattern.
+        :rtype: tuple.
+
+        """
+        if em_controls is None:
+            em_controls = EMC()
+
+        if not mode:
+            mode = DEF_MODE
+
+        if mode == 2 and dsize is None:
+            dsize = DEF_CBED_DSIZE
+
+        key = self._key('dif', cr, _emc_data(em_controls), mode,
+                        dsize if mode == 2 else None)
+
+        data = self._get(key)
+        if data is None:
+            emc, dp = cr.generateDP(mode = mode, dsize = dsize, em_controls = em_controls)
+
+            dpd = dp._to_data()
+            self._put(key,
+                      nums = np.array([dp.nklines, dp.ndisks, dp.nhlines]),
+                      bounds = np.array(dpd['bounds']),
+                      klines = dpd['klines'],
+                      disks = dpd['disks'],
+                      hlines = dpd['hlines'],
+                      xaxis = np.array(emc.xaxis))
+            return emc, dp
+
+        # update the controls as generateDP does
+        em_controls(mode = mode)
+        if mode == 2:
+            em_controls(dsize = dsize)
+
+        if em_controls.xaxis == DEF_XAXIS:
+            em_controls(xaxis = tuple(data['xaxis'].tolist()))
+
+        nk, nd, nh = data['nums'].tolist()
+        dpd = {"nums": {"nklines": nk, "ndisks": nd, "nhlines": nh},
+               "bounds": tuple(data['bounds'].tolist()),
+               "klines": farray(data['klines']),
+               "hlines": farray(data['hlines']),
+               "disks": farray(data['disks']),
+               "name": cr.name}
+
+        return em_controls, DP(dpd)
+
+    def generateStereo(self, cr, xa = (0,2,0), tilt = (0.0,0.0), zone = (0, 0, 1)):
+        """
+        Cached stereodiagram generation,
+        see `generateStereo <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateStereo>`_.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :return: A list of stereodiagram elements represented by dict object
+        :rtype: list of dict object
+
+        """
+        key = self._key('stereo', cr, tuple(xa), tuple(tilt), tuple(zone))
+
+        data = self._get(key)
+        if data is None:
+            sl = cr.generateStereo(xa = xa, tilt = tilt, zone = zone)
+
+            data = dict(stereo = np.array([(*s['c'], s['r'], *s['idx']) for s in sl],
+                                          dtype=float).reshape(-1, 6))
+            self._put(key, **data)
+
+        # elements of a simulated and a cached stereodiagram are of the same types
+        return [{'c': (x, y), 'r': r, 'idx': (int(i1), int(i2), int(i3))}
+                for x, y, r, i1, i2, i3 in data['stereo'].tolist()]
+
+    def generateCSF(self, cr, kv = 100, smax = 0.5, sftype = 1, aptype = 0):
+        """
+        Cached structure factors calculation,
+        see `generateCSF <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateCSF>`_.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :return: a list of structure factors in dict objects, the first of which holds the inputs
+        :rtype: list
+
+        """
+        key = self._key('csf', cr, kv, smax, sftype, aptype)
+
+        data = self._get(key)
+        if data is None:
+            sfs, complete = cr._get_csf(kv, smax, sftype, aptype)
+
+            # only calculations the backend completed are cached
+            if complete:
+                self._put(key,
+                          hkl = np.array([sf['hkl'] for sf in sfs[1:]], dtype=int),
+                          sf = np.array([(sf['sw'], sf['ds'], sf['amp_re'], sf['phase_im'])
+                                         for sf in sfs[1:]], dtype=float))
+            return sfs
+
+        sfs = [dict(kv = kv, smax = smax, sftype = sftype, aptype = aptype)]
+        for hkl, (s, d, sf1, sf2) in zip(data['hkl'].tolist(), data['sf'].tolist()):
+            sfs.append(dict(hkl = tuple(hkl), sw = s, ds = d, amp_re = sf1, phase_im = sf2))
+
+        return sfs
+
+    def generatePowder(self, cr,
+                       kv = 100,
+                       t2max = 0.05,
+                       smax = 1.0,
+                       eta = 1.0,
+                       gamma = 0.001,
+                       absp = 0,
+                       bg = False,
+                       bamp = 0.35,
+                       bgamma = 0.001,
+                       bmfact = 0.02):
+        '''
+        Cached powder diffraction generation,
+        see `generatePowder <pyemaps.crystals.html#pyemaps.crystals.Crystal.generatePowder>`_.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :return: an array of 2 x 1000 with the first row representing the scattering angle 2theta and the second the intensity
+        :rtype: array
+
+        '''
+        pargs = dict(kv = kv, t2max = t2max, smax = smax, eta = eta, gamma = gamma,
+                     absp = absp, bg = bg, bamp = bamp, bgamma = bgamma, bmfact = bmfact)
+
+        key = self._key('powder', cr, tuple(sorted(pargs.items())))
+
+        data = self._get(key)
+        if data is None:
+            pw = cr.generatePowder(**pargs)
+
+            # failed runs leave the output empty
+            if np.any(pw):
+                self._put(key, powder = pw)
+            return pw
+
+        return farray(data['powder'])
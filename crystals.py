@@ -53,6 +53,21 @@ iso = DW.iso
 bij = DW.bij
 uij = DW.uij
 
+MAX_ATOM_SYMBOL_LEN = 10
+
+def _site_dtype(dw):
+    '''
+    internal - structured array type of the atom sites of a crystal 
+    with thermal type dw: symbol, position, Debye-Waller factor or 
+    the six anisotropic coefficients, and occupancy.
+
+    '''
+    ndw = 1 if dw == iso.value else 6
+    return np.dtype([('symb', f'S{MAX_ATOM_SYMBOL_LEN}'),
+                     ('xyz', float, (3,)),
+                     ('dw', float, (ndw,)),
+                     ('occ', float)])
+
 class Cell:
     """
 
@@ -330,6 +345,28 @@ class Cell:
         for key in self.__dict__:
             yield (key[1:], getattr(self, key))
 
+class _Loc(list):
+    '''
+    internal - atom position and thermal data list that counts the changes
+    made to it in place, such as at.loc[0] = 0.3
+
+    '''
+    rev = 0
+
+def _counted(name):
+    method = getattr(list, name)
+
+    def counted(self, *args):
+        self.rev += 1
+        return method(self, *args)
+
+    counted.__name__ = name
+    return counted
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'reverse', 'sort', 'clear'):
+    setattr(_Loc, _name, _counted(_name))
+
 class Atom:
     """
     Crystal atom descriptor class. Depending on the thermal types, its data
@@ -402,6 +439,10 @@ class Atom:
         si_at.loc = [0.125, 0.125, 0.125, 0.4668, 1.00]
 
     """
+    # counts changes of the atom other than those made in place to its
+    # loc list, crystals rebuild their site arrays when either changes
+    _rev = 0
+
     def __init__(self, a_type=iso.value, sym = '', data=None):
         """
         Internal representation of single atom in a crystal object.
@@ -482,10 +523,10 @@ class Atom:
             raise UCError("Atom thermal property type must be greater or equial to 1")
         
         self._atype = a_type
+        self._rev += 1
 
     @symb.setter
     def symb(self, sb=''):
-        MAX_ATOM_SYMBOL_LEN = 10
         if len(sb) == 0:
             sb='          '
         
@@ -493,6 +534,7 @@ class Atom:
             raise UCError("Invalid atom symbol length")
 
         self._symb = sb
+        self._rev += 1
     
     @loc.setter
     def loc(self, locdata=None):
@@ -507,14 +549,15 @@ class Atom:
         keylen = len(akeys)
 
         if locdata is None or len(locdata) == 0:
-            locdata = [0.0]*keylen
+            locdata = _Loc([0.0]*keylen)
             locdata[-1] = 1.0
             self._loc = locdata
             # defaults if location data is not provided
+            self._rev += 1
             return
 
 
-        if type(locdata) is not list:
+        if not isinstance(locdata, list):
             raise UCError("Invalid data type for atomic position entered!")
 
         inputlen = len(locdata)
@@ -523,12 +566,14 @@ class Atom:
         if inputlen < keylen-2 or inputlen > keylen-1:
             raise UCError(f"Input atom position data must have length of {keylen-1} or {keylen}")
 
-        self._loc=[0.0]*(keylen-1)
+        self._loc=_Loc([0.0]*(keylen-1))
         self._loc[-1] = 1.0 
 
         for i in range(len(locdata)):
             self._loc[i] = locdata[i]
 
+        self._rev += 1
+
         self._data = dict(zip(akeys[1:], self._loc))
                 
     def __eq__(self, other):
@@ -765,7 +810,7 @@ from .diffract.stereo_dec import add_stereo
 #   generates and plots stereographic projections
 
 #---Kinematic Diffraction Simulations---
-from .diffract.dif_dec import add_dif
+from .diffract.dif_dec import add_dif, is_resident
 
 #---Dynamic Diffraction Simulations---
 from .diffract.bloch_dec import add_bloch
@@ -915,6 +960,13 @@ class Crystal:
 
         """
          
+        # initially nothing is loaded, no rvec and no load type
+        self._loaded = False
+        self._ltype = -1
+        self._sites = None
+        self._sites_rev = None
+        self._sites_atoms = None
+
         setattr(self, 'name', name)
 
         if data is None:
@@ -953,10 +1005,6 @@ class Crystal:
         spg = SPG(data = data['spg'])
         setattr(self, 'spg', spg)
 
-        # initially nothing is loaded, no rvec and no load type
-        self._loaded = False
-        self._ltype = -1
-
     @property
     def cell(self):
         ''' 
@@ -1002,6 +1050,19 @@ class Crystal:
         '''
         return self._name
 
+    @property
+    def sites(self):
+        ''' 
+        
+        Read-only structured array of the atom sites with fields symb, 
+        xyz, dw and occ. Field dw holds the Debye-Waller factor for 
+        isotropic crystals, otherwise the six anisotropic coefficients.
+        
+        '''
+        sites = self._site_arrays()[0].view()
+        sites.flags.writeable = False
+        return sites
+
     @cell.setter
     def cell(self, c):
         
@@ -1055,6 +1116,69 @@ class Crystal:
                 raise CrystalClassError("Atoms positional data invalid")
 
         self._atoms = ats
+        self._sites = None
+
+    def _site_arrays(self):
+        '''
+        internal - structured array of the atom sites, and the Fortran
+        ordered site data and symbol arrays loaded into the backend.
+
+        The arrays are only built again after any atom has been changed
+        or other atoms are in the atoms list, also when replaced in place.
+
+        '''
+        rev = (tuple((id(at), at._rev, at._loc.rev) for at in self._atoms), self._dw)
+        if self._sites is not None and self._sites_rev == rev:
+            return self._sites
+
+        n = len(self._atoms)
+        symbs = [at.symb for at in self._atoms]
+        for sb in symbs:
+            if len(sb) > MAX_ATOM_SYMBOL_LEN:
+                raise CrystalClassError(f"Atomic symbol {sb} length cannot exceed {MAX_ATOM_SYMBOL_LEN}")
+
+        sites = np.empty(n, dtype=_site_dtype(self._dw))
+        ncols = 3 + sites.dtype['dw'].shape[0] + 1
+        try:
+            locs = np.array([at.loc for at in self._atoms], dtype=float).reshape(n, ncols)
+        except ValueError as e:
+            raise CrystalClassError("Atoms positional data invalid") from e
+
+        sites['symb'] = [sb.ljust(MAX_ATOM_SYMBOL_LEN) for sb in symbs]
+        sites['xyz'] = locs[:, 0:3]
+        sites['dw'] = locs[:, 3:-1]
+        sites['occ'] = locs[:, -1]
+
+        atn = farray(sites['symb'].copy().view('c').reshape(n, MAX_ATOM_SYMBOL_LEN))
+        diff_atoms = farray(locs)
+
+        self._sites = (sites, diff_atoms, atn)
+        self._sites_rev = rev
+        # atoms of the arrays are kept so that their ids are not reused
+        self._sites_atoms = list(self._atoms)
+        return self._sites
+
+    def _fingerprint(self):
+        '''
+        internal - content fingerprint of the crystal data that determines
+        simulation results: cell constants, atom sites, Debye-Waller type
+        and space group. The crystal name is not part of it.
+
+        Crystals with equal fingerprints share the data loaded in the backend,
+        and simulation results are cached and routed by it.
+
+        '''
+        import hashlib
+
+        _, diff_atoms, atn = self._site_arrays()
+        spg = np.array([self._spg.number, self._spg.setting], dtype=int)
+
+        h = hashlib.sha1(str(self._dw).encode())
+        for arr in (self._cell.prepare(), diff_atoms, atn, spg):
+            h.update(str(arr.shape).encode())
+            h.update(np.ascontiguousarray(arr).tobytes())
+
+        return h.hexdigest()
 
     @spg.setter
     def spg(self, vspg):
@@ -1073,10 +1197,24 @@ class Crystal:
         return self._dw == iso.value
 
     def __del__(self):
-        
+
+        # the backend data is freed with its last crystal object
         if self._loaded:
             self.unload()
 
+    def __getstate__(self):
+        '''
+        A copy of the crystal, pickled to another process for example,
+        does not own the data loaded in the backend simulation modules.
+
+        '''
+        state = self.__dict__.copy()
+        state['_loaded'] = False
+        state['_ltype'] = -1
+        state['_sites'] = None
+        state['_sites_atoms'] = None
+        return state
+
     def __eq__(self, other):
 
         if not isinstance(other, Crystal):
@@ -1147,7 +1285,7 @@ class Crystal:
         :rtype: bool
 
         '''
-        return self._loaded
+        return self._loaded and is_resident(self)
 
     @classmethod
     def from_builtin(cls, cn='Diamond'):
@@ -26,22 +26,232 @@
 
 '''
 
-from . import EMC
+import json
+import os
+
+import numpy as np
+
+from . import EMC, SIMC
 from . import BlochListError
+from .emcontrols import EMCIndex
 
 BLOCH_TOLERANCE = 1.0e-04
 
+IM3_OFFSET = 8
+#int: bytes of the .im3 raw image file header, detector size and number of sample thicknesses as 32-bit integers
+
+IM3_INDEX_EXT = '.json'
+#str: extension added to a .im3 file name for its controls index
+
+def _json_value(v):
+    '''
+    internal - control value v with numpy scalars converted to python ones
+
+    '''
+    if isinstance(v, (list, tuple)):
+        return [_json_value(x) for x in v]
+
+    return v.item() if isinstance(v, np.generic) else v
+
+def _emc_record(emc):
+    '''
+    internal - controls of emc in a JSON serializable dict
+
+    '''
+    rec = {k.lstrip('_'): _json_value(v) for k, v in emc.__dict__.items() if k != '_simc'}
+    rec['simc'] = {k.lstrip('_'): _json_value(v) for k, v in emc.simc.__dict__.items()}
+
+    return rec
+
+def _emc_from_record(rec):
+    '''
+    internal - EMControl object from a dict made by _emc_record
+
+    '''
+    def _val(v):
+        return tuple(v) if isinstance(v, list) else v
+
+    rec = {k: _val(v) for k, v in rec.items()}
+    sc = {k: _val(v) for k, v in rec.pop('simc').items()}
+
+    simc = SIMC(**{k: sc.pop(k) for k in ('excitation', 'gmax', 'bmin', 'intensity', 'gctl', 'zctl')})
+    simc(**sc)
+
+    emc = EMC(**{k: rec.pop(k) for k in ('tilt', 'zone', 'defl', 'vt', 'cl')}, simc = simc)
+    # mode is set before the beam size that is validated against it
+    emc(mode = rec.pop('mode', None))
+    emc(**rec)
+
+    return emc
+
+def _im3_map(fn, det_size = None, nimgs = None, mode = 'r', nthickness = None):
+    '''
+    internal - memory mapped images of .im3 raw image file fn in an 
+    array of shape (det_size, det_size, nimgs) in Fortran order, the
+    layout of Bloch image output from the backend. With mode 'w+', 
+    the file is created with its header.
+
+    The header holds det_size and the number of sample thicknesses, 
+    nimgs by default, as the backend writes it. LACBED files have nimgs
+    of nthickness times the number of calculated beams.
+
+    '''
+    if mode == 'w+':
+        mm = np.memmap(fn, dtype = np.float32, mode = 'w+', offset = IM3_OFFSET,
+                       shape = (det_size, det_size, nimgs), order = 'F')
+        with open(fn, 'r+b') as f:
+            f.write(np.array([det_size, nimgs if nthickness is None else nthickness], 
+                             dtype = np.int32).tobytes())
+
+        return mm
+
+    return np.memmap(fn, dtype = np.float32, mode = mode, offset = IM3_OFFSET,
+                     shape = (det_size, det_size, nimgs), order = 'F')
+
 class BlochImgs:
 
     '''
     list of Bloch image objects and its associated controls 
 
+    Lookups by controls go through an index of the controls that is 
+    built on first use, see `EMCIndex <pyemaps.emcontrols.html#pyemaps.emcontrols.EMCIndex>`_.
+
     '''
     def __init__(self, name):
         
+        self._index = None
+        self._mm = None
+        self._fn = None
+        self._slices = {}
         setattr(self, 'name', name)
         setattr(self, 'blochList', [])
 
+    @classmethod
+    def from_im3(cls, fn, mode = 'r'):
+        '''
+        Bloch image list memory mapped from a .im3 raw image file and its
+        controls index. The images are views of the mapping, which are 
+        read from the file only when used.
+
+        :param fn: .im3 file name.
+        :type fn: str, required
+
+        :param mode: File mode of the mapping, 'r' read-only, 'r+' read and write, or 'c' copy-on-write.
+        :type mode: str, optional
+
+        :rtype: pyemaps.BImgList
+
+        '''
+        if mode not in ('r', 'r+', 'c'):
+            raise BlochListError('Mapping mode must be one of r, r+ or c')
+
+        try:
+            with open(fn + IM3_INDEX_EXT) as f:
+                idx = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BlochListError(f'failed to read controls index of {fn}: {e}')
+
+        emcs = [_emc_from_record(rec) for rec in idx['controls']]
+
+        try:
+            mm = _im3_map(fn, idx['det_size'], len(idx['images']), mode)
+        except (OSError, ValueError) as e:
+            raise BlochListError(f'failed to map Bloch images in {fn}: {e}')
+
+        bimgs = cls(idx['name'])
+        bimgs._attach(mm, fn, [emcs[i] for i in idx['images']])
+
+        return bimgs
+
+    def _attach(self, mm, fn, emcs):
+        '''
+        internal - makes the list the images in mapping mm of file fn with
+        controls emcs
+
+        '''
+        self._blochList = [(emc, mm[:, :, i]) for i, emc in enumerate(emcs)]
+        self._index = None
+        self._mm = mm
+        self._fn = fn
+        # image slices in the file, which stay put when the list is sorted
+        self._slices = {id(b): i for i, (_, b) in enumerate(self._blochList)}
+
+    @property
+    def filename(self):
+        '''
+        .im3 file the images are mapped from, None if they are in memory
+
+        '''
+        return self._fn
+
+    def _write_index(self, fn):
+        '''
+        internal - writes the controls index of the list mapped to .im3 
+        file fn, with controls shared by images stored once
+
+        '''
+        if len(self._slices) != len(self._blochList) or \
+           any(id(b) not in self._slices for _, b in self._blochList):
+            raise BlochListError('Bloch image list changed since it was mapped, save it to a new file')
+
+        recs, pos = [], {}
+        images = [0]*len(self._blochList)
+        for emc, b in self._blochList:
+            if id(emc) not in pos:
+                pos[id(emc)] = len(recs)
+                recs.append(_emc_record(emc))
+            images[self._slices[id(b)]] = pos[id(emc)]
+
+        idx = dict(name = self._name,
+                   det_size = self._blochList[0][1].shape[0] if self._blochList else 0,
+                   controls = recs,
+                   images = images)
+
+        tmpfn = f'{fn}{IM3_INDEX_EXT}.{os.getpid()}.tmp'
+        with open(tmpfn, 'w') as f:
+            json.dump(idx, f)
+
+        os.replace(tmpfn, fn + IM3_INDEX_EXT)
+
+    def save_im3(self, fn = None):
+        '''
+        Saves the images to a .im3 raw image file with a controls index 
+        next to it, and maps the list to the file. A list mapped from a 
+        file is saved in place when fn is not given.
+
+        :param fn: .im3 file name.
+        :type fn: str, optional
+
+        '''
+        if fn is None or (self._fn is not None and os.path.abspath(fn) == os.path.abspath(self._fn)):
+            if self._mm is None:
+                raise BlochListError('File name required to save Bloch images in memory')
+
+            self._mm.flush()
+            self._write_index(self._fn)
+            return
+
+        if len(self._blochList) == 0:
+            raise BlochListError('No Bloch images to save')
+
+        shapes = {b.shape for _, b in self._blochList}
+        if len(shapes) != 1 or len(shapes.pop()) != 2 or \
+           self._blochList[0][1].shape[0] != self._blochList[0][1].shape[1]:
+            raise BlochListError('Only Bloch images of the same square size can be saved together')
+
+        det_size = self._blochList[0][1].shape[0]
+        emcs = [emc for emc, _ in self._blochList]
+
+        # images of one thickness, the beams of LACBED, share their controls
+        mm = _im3_map(fn, det_size, len(emcs), 'w+', 
+                      nthickness = len({id(emc) for emc in emcs}))
+        for i, (_, b) in enumerate(self._blochList):
+            mm[:, :, i] = b
+
+        mm.flush()
+        self._attach(mm, fn, emcs)
+        self._write_index(fn)
+
     @property
     def name(self):
         return self._name
@@ -69,6 +279,24 @@ class BlochImgs:
                 raise BlochListError('invalid data found in bloch imgage list')
 
         self._blochList = bl
+        self._index = None
+        self._mm = None
+        self._fn = None
+        self._slices = {}
+
+    def _emc_index(self):
+
+        '''
+        internal - controls index of the list, rebuilt when the list
+        has been changed other than by add
+
+        '''
+        if self._index is None or len(self._index) != len(self._blochList):
+            self._index = EMCIndex()
+            for i, (emc, _) in enumerate(self._blochList):
+                self._index.add(emc, i)
+
+        return self._index
 
     # Adding new diffraction patterns
     def add(self, emc, b):
@@ -77,7 +305,49 @@ class BlochImgs:
            b.ndim != 2:
             raise BlochListError('failed to add Bloch image object')
 
+        if self._index is not None and len(self._index) == len(self._blochList):
+            self._index.add(emc, len(self._blochList))
+
         self._blochList.append((emc, b))
+
+    def find(self, emc):
+
+        '''
+
+        Bloch images simulated with controls emc.
+
+        :param emc: Simulation controls to look up.
+        :type emc: pyemaps.EMC, required
+
+        :return: All images with controls equal to emc, in list order.
+        :rtype: list of numpy.ndarray
+
+        '''
+        return [self._blochList[i][1] for i in self._emc_index().find(emc)]
+
+    def merge(self, other):
+
+        '''
+
+        Adds the images of another list that are not in this list yet.
+
+        :param other: Bloch image list.
+        :type other: pyemaps.BImgList, required
+
+        :return: Number of images added.
+        :rtype: int
+
+        '''
+        if not isinstance(other, BlochImgs):
+            raise BlochListError('only Bloch image lists can be merged')
+
+        nadded = 0
+        for emc, b in list(other.blochList):
+            if not self.__contains__(emc, b):
+                self.add(emc, b)
+                nadded += 1
+
+        return nadded
     
     def sort(self):
 
@@ -86,7 +356,9 @@ class BlochImgs:
         Sort the bloch simulation results by controls
 
         '''
-        self._blochList.sort(key=lambda x: x[0])
+        # one key per entry instead of two for every comparison
+        self._blochList.sort(key=lambda x: x[0].__key__())
+        self._index = None
                 
     def __getitem__(self, key):
 
@@ -115,8 +387,9 @@ class BlochImgs:
         
         shape_given = b.shape
         
-        for (e,c) in self._blochList:
-            if e != emc or c.shape != shape_given:
+        for i in self._emc_index().find(emc):
+            c = self._blochList[i][1]
+            if c.shape != shape_given:
                 continue
             if np.allclose(c, b, atol=BLOCH_TOLERANCE): 
                 return True
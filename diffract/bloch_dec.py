@@ -24,6 +24,41 @@
 .. Date Created:       May 07, 2022  
 
 '''
+
+# Dynamic simulation run in the backend bloch module, shared by all crystal
+# objects in the process: the number of the last run started and whether 
+# its results are still held in the backend.
+_bloch_run = dict(number = 0, open = False)
+
+def bloch_run():
+    '''
+    Number of the dynamic simulation run whose results are held in the
+    backend, None if there is none.
+
+    '''
+    return _bloch_run['number'] if _bloch_run['open'] else None
+
+BIMG_ITEMSIZE = 4
+#int: bytes of a Bloch image pixel
+
+def bloch_chunk_size(det_size, nimgs, mem_limit):
+    '''
+    Number of sample thicknesses whose Bloch images fit in an image 
+    buffer of mem_limit bytes, with nimgs images of det_size x det_size
+    per thickness. 0 if the images of one thickness do not fit.
+
+    '''
+    return mem_limit // (det_size*det_size*nimgs*BIMG_ITEMSIZE)
+
+RVEC_PROBE = (0.137, 0.291, 0.413)
+#tuple: R vector the phases of R vector series are checked against the backend at
+
+RVEC_TOLERANCE = 1.0e-3
+#float: largest difference allowed between phased and backend scattering matrix elements
+
+EIGEN_FLOPS = 25
+#int: floating point operations of a complex eigen decomposition, in multiples of the cube of the matrix dimension
+
 def add_bloch(target):    
     """
     
@@ -56,6 +91,7 @@ def add_bloch(target):
 
     """
     from . import bloch, dif
+    from .dif_dec import controls_changed
     from .. import DEF_APERTURE, \
                    DEF_THICKNESS, \
                    DEF_SAMPLING, \
@@ -71,10 +107,35 @@ def add_bloch(target):
 
     from ..fileutils import compose_ofn
     from .. import BlochError,BlochListError
+    import math
     import numpy as np
     from numpy import asfortranarray as farray
     from .. import TY_NORMAL, TY_LACBED
 
+    def _beam_positions(bms, beams):
+        '''
+        Positions in beams of the selected beams found in backend beams
+        bms of shape (3, d), and their positions in bms.
+
+        '''
+        lookup = {tuple(b): j for j, b in enumerate(np.transpose(bms).tolist())}
+        sel, pos = [], []
+        for k, b in enumerate(beams.tolist()):
+            j = lookup.get(tuple(b))
+            if j is not None:
+                sel.append(k)
+                pos.append(j)
+
+        return sel, pos
+
+    def _disk_points(radius):
+        '''
+        Number of points of a square grid of unit spacing within a disk
+        of radius.
+
+        '''
+        return sum(2*math.isqrt(radius*radius - i*i) + 1 for i in range(-radius, radius + 1))
+
     BIMG_EXT = '.im3'
     MAX_BIMGFN = 256
     CBED_MODE = DEF_MODE + 1
@@ -181,8 +242,11 @@ def add_bloch(target):
         if em_controls is None or not isinstance(em_controls, EMC): 
             raise BlochError('Control object must be of EMControl type')
 
+        # results of any earlier run are replaced from here on
+        _bloch_run['open'] = False
 
         dif.initcontrols()
+        controls_changed()
         dif.setmode(CBED_MODE) # alway in CBED mode
 
         
@@ -221,17 +285,8 @@ def add_bloch(target):
         if ret != 0:
             raise BlochError('Error computing dynamic diffraction')
         
-        nsampling = bloch.get_nsampling()
-        sampling_points = farray(np.zeros((2, nsampling)), dtype=int)
-        sampling_points, ret = bloch.get_samplingpoints(sampling_points)
-
-        if ret != 0:
-            raise BlochError('Failed to retrive sampling points used in scattering matrix run')
-        
-        spoints = np.transpose(sampling_points)
-
-        # convert the np array to a array of python native tuple
-        sp = [(list(p)[0].item(),list(p)[1].item()) for p in spoints]
+        sp = self._sampling_points()
+        nsampling = len(sp)
 
         # updating controls with input params as optional attributes for easy handling
         em_controls(mode = 2, 
@@ -252,6 +307,10 @@ def add_bloch(target):
             em_controls(xaxis = (xa1,xa2,xa3))
 
         self.session_controls=em_controls
+
+        _bloch_run['number'] += 1
+        _bloch_run['open'] = True
+
         return nsampling, sp
 
     def getBlochImages(self, 
@@ -259,7 +318,9 @@ def add_bloch(target):
                   pix_size = DEF_PIXSIZE,
                   det_size = DEF_DETSIZE,
                   nType = TY_NORMAL,
-                  bSave = False):
+                  bSave = False,
+                  sink = None,
+                  mem_limit = None):
        """
         Retrieves a set of dynamic diffraction image from the simulation 
         sessiom marked by:
@@ -279,12 +340,22 @@ def add_bloch(target):
         :param nType: type of bloch images generated. 0 for normal or 1 for large angle CBED images
         :type nType: int, optional. defaults to 0
 
-        :param bSave: True - save the output to a raw image file with extension of 'im3'
+        :param bSave: True - save the output to a raw image file with extension of 'im3' and a controls index, 
+                      the images returned are then memory mapped from the file, see 
+                      `BImgList.from_im3 <pyemaps.ddiffs.html#pyemaps.ddiffs.BlochImgs.from_im3>`_
         :type bSave: bool, optional
 
+        :param sink: Destination of the images generated in chunks, see below. 
+        :type sink: numpy.ndarray, BImgList or callable, optional
+
+        :param mem_limit: Limit in bytes of the image buffer of each chunk, one thickness per chunk if not set.
+        :type mem_limit: int, optional
+
         :return: `BImgList <pyemaps.ddiffs.html#pyemaps.ddiffs.BlochImgs>`_ object
         :rtype: BImgList
 
+        :raises: BlochError, if the images of one sample thickness exceed mem_limit
+
         Default values:
 
         ::
@@ -311,92 +382,268 @@ def add_bloch(target):
             - The number of sampling points in *sampling*. 
               With less available memory on the system where pyemaps is running, decreased sampling 
               points in *sampling* parameter can make a big difference in pyemaps performance. 
+
+            Or generate the images in chunks of sample thicknesses into a *sink*, with the 
+            image buffer of each chunk kept under *mem_limit* bytes. The sink can be:
+
+            - A numpy array or numpy.memmap of shape (n, det_size, det_size) for n images in 
+              the order of the image list, which is filled and returned.
+            - A `BImgList <pyemaps.ddiffs.html#pyemaps.ddiffs.BlochImgs>`_ object, to which the
+              images are added and which is returned.
+            - A callable, called with (emc, image) for each image.
+
+            One sample thickness is the smallest chunk: the backend renders the 
+            LACBED images of all calculated beams of a thickness at once, so 
+            *mem_limit* must hold det_size x det_size x 4 bytes for each calculated beam.
+
+            See `iterBlochImages <pyemaps.crystals.html#pyemaps.crystals.Crystal.iterBlochImages>`_
+            to generate the images in chunks as a generator.
        """
-       from copy import deepcopy
+       isLACBED = (nType == TY_LACBED)
+       thlist = self._bloch_thicknesses(sample_thickness, pix_size, det_size)
+
+       if sink is not None or mem_limit is not None:
+            if bSave:
+                raise BlochListError('Images generated in chunks can not be saved to a raw image file')
+
+            nchunk = self._bloch_chunk(det_size, isLACBED, mem_limit)
+            return self._sink_bloch_images(sink, thlist, pix_size, det_size, isLACBED, nchunk)
+
+       if bSave:
+            return self._save_bloch_images(thlist, pix_size, det_size, isLACBED)
+
+       bimgs = BImgList(self.name)
+       for emc, img in self._iter_bloch_images(thlist, pix_size, det_size, isLACBED, len(thlist)):
+            bimgs.add(emc, img)
+
+       return bimgs
 
-       if pix_size is None or not isinstance(pix_size, int):
+    def _bloch_thicknesses(self, sample_thickness, pix_size, det_size):
+        '''
+        Validates Bloch image inputs and returns the list of sample thicknesses.
+
+        '''
+        if pix_size is None or not isinstance(pix_size, int):
             raise BlochListError('Pixel size input must be valid integert')
 
-       if det_size is None or not isinstance(det_size, int):
+        if det_size is None or not isinstance(det_size, int):
             raise BlochListError('Pixel size input must be valid integert')
 
-       if sample_thickness is None or \
-          not all(isinstance(v, int) for v in sample_thickness) or \
-          len(sample_thickness) !=3:
+        if sample_thickness is None or \
+           not all(isinstance(v, int) for v in sample_thickness) or \
+           len(sample_thickness) !=3:
             raise BlochListError('Sample thickness input must be valid tuple of three integers')
 
-       th_start, th_end, th_step = sample_thickness
+        th_start, th_end, th_step = sample_thickness
 
-       if th_start > th_end or th_step <= 0:
+        if th_start > th_end or th_step <= 0:
             raise BlochListError('Sample thickness input must be valid integers range')               
 
-       thlist = []
-       if th_start == th_end:
+        thlist = []
+        if th_start == th_end:
             thlist.append(th_start)
-       else:
+        else:
             thlist = list(range(th_start, th_end, th_step))
             thlist.append(th_end)
 
-       ndep = len(thlist)
-
-       if ndep > MAX_DEPTH:
+        if len(thlist) > MAX_DEPTH:
             raise BlochListError(f'Number of sample thickness cannot exceed {MAX_DEPTH}')
 
-       # save the input as optional control attributes
-       imgfn =''
-       if bSave: 
-            imgfn, bfn, l = self._getBlochFN()
-            if l > MAX_BIMGFN-1:
-                raise BlochError(f'File name must not exceed {MAX_BIMGFN-1}')
-            
-            if bloch.openimgfile(det_size, ndep, bfn, l) != 0:
-                raise BlochError('Error opening file for write, check if you have write permission')
+        return thlist
 
-       isLACBED = (nType == TY_LACBED)
-    #    for th in thlist:
-       nslices = ndep
-       nout = 0
-       if isLACBED:
-           nout = bloch.getncalcbeams()
-           nslices = ndep*nout
-           
-       bimg = farray(np.zeros((det_size, det_size, nslices), dtype=np.float32))
-       thl = farray(np.array(thlist), dtype=int)
-
-       bimg, ret = bloch.getimage(thl,
-                                  bimg,
-                                  teta = 0,
-                                  pix = pix_size,
-                                  det = det_size,
-                                  blacbed = isLACBED,
-                                  bsave = bSave)
-       
-       if(ret != 0):
+    def _render_bloch_images(self, thlist, pix_size, det_size, isLACBED, out = None):
+        '''
+        Bloch images of thicknesses thlist in one backend call, in an
+        array of shape (det_size, det_size, nslices) in Fortran order. 
+        The images are written into out if given, such as a mapping of
+        an image file.
+
+        '''
+        nslices = len(thlist)
+        if isLACBED:
+            nslices *= bloch.getncalcbeams()
+
+        if out is None:
+            buf = farray(np.zeros((det_size, det_size, nslices), dtype=np.float32))
+        else:
+            buf = out.view(np.ndarray)
+
+        thl = farray(np.array(thlist), dtype=int)
+
+        bimg, ret = bloch.getimage(thl,
+                                   buf,
+                                   teta = 0,
+                                   pix = pix_size,
+                                   det = det_size,
+                                   blacbed = isLACBED,
+                                   bsave = False)
+        
+        if(ret != 0):
             raise BlochError("bloch image generation failed!")
-       
-# build a image list
-       bimgs = BImgList(self.name)
 
-       self.session_controls(pix_size=pix_size, det_size=det_size)
-       
-       for i, th in enumerate(thlist):
-          emc = deepcopy(self.session_controls)
-          emc.simc(sth=th)
-          if isLACBED:
+        if not np.shares_memory(bimg, buf):
+            buf[...] = bimg
+
+        return buf
+
+    def _save_bloch_images(self, thlist, pix_size, det_size, isLACBED):
+        '''
+        Bloch images of thicknesses thlist rendered directly into a memory
+        mapped .im3 raw image file, returned as a list mapped to the file. 
+
+        '''
+        from ..ddiffs import _im3_map
+
+        imgfn, _, l = self._getBlochFN()
+        if l > MAX_BIMGFN-1:
+            raise BlochError(f'File name must not exceed {MAX_BIMGFN-1}')
+
+        nslices = len(thlist)
+        if isLACBED:
+            nslices *= bloch.getncalcbeams()
+
+        try:
+            mm = _im3_map(imgfn, det_size, nslices, 'w+', nthickness = len(thlist))
+        except OSError:
+            raise BlochError('Error opening file for write, check if you have write permission')
+
+        emcs = [emc for emc, _ in self._iter_bloch_images(thlist, pix_size, det_size, 
+                                                          isLACBED, len(thlist), out = mm)]
+        mm.flush()
+
+        bimgs = BImgList(self.name)
+        bimgs._attach(mm, imgfn, emcs)
+        bimgs._write_index(imgfn)
+
+        print(f'The raw bloch image(s) of dimensions {det_size}x{det_size}x{nslices} and an offset of 8 bytes successfully saved to: \n{imgfn}')
+        print(f'To view, import the file into ImageJ or other raw image visualization tools')
+
+        return bimgs
+
+    def _bloch_chunk(self, det_size, isLACBED, mem_limit = None):
+        '''
+        Number of sample thicknesses rendered at a time with image buffers
+        of at most mem_limit bytes, one if mem_limit is not set. The backend
+        renders the LACBED images of all calculated beams of a thickness in
+        one call, so they are not split.
+
+        '''
+        if mem_limit is None:
+            return 1
+
+        if not isinstance(mem_limit, int) or mem_limit <= 0:
+            raise BlochListError('Memory limit must be a positive integer')
+
+        nout = bloch.getncalcbeams() if isLACBED else 1
+        nchunk = bloch_chunk_size(det_size, nout, mem_limit)
+        if nchunk == 0:
+            nbytes = det_size*det_size*nout*BIMG_ITEMSIZE
+            raise BlochError(f'Bloch images of one sample thickness, {nbytes} bytes for {nout} image(s), '
+                             f'exceed the memory limit of {mem_limit} bytes')
+
+        return nchunk
+
+    def _iter_bloch_images(self, thlist, pix_size, det_size, isLACBED, nchunk, out = None):
+        '''
+        Generator of (emc, image) of thicknesses thlist, rendered nchunk
+        thicknesses at a time, into out if given in a single chunk. With 
+        LACBED, there is one image per calculated beam for each thickness.
+
+        '''
+        from copy import deepcopy
+
+        nout = bloch.getncalcbeams() if isLACBED else 1
+
+        self.session_controls(pix_size=pix_size, det_size=det_size)
+
+        for c in range(0, len(thlist), nchunk):
+            chunk = thlist[c:c+nchunk]
+            bimg = self._render_bloch_images(chunk, pix_size, det_size, isLACBED, out)
+
+            for i, th in enumerate(chunk):
+                emc = deepcopy(self.session_controls)
+                emc.simc(sth=th)
                 for j in range(nout):
-                    bimgs.add(emc, bimg[:,:,i*nout + j])
-          else:
-              bimgs.add(emc, bimg[:,:,i])
+                    yield emc, bimg[:,:,i*nout + j]
 
+            del bimg
 
-       if bSave:
-            if bloch.closeimgfile() != 0:
-                raise BlochError('Error closing file')
+    def _sink_bloch_images(self, sink, thlist, pix_size, det_size, isLACBED, nchunk):
+        '''
+        Generates Bloch images in chunks into sink, see getBlochImages.
+
+        '''
+        nout = bloch.getncalcbeams() if isLACBED else 1
+        nimgs = len(thlist)*nout
 
-            print(f'The raw bloch image(s) of dimensions {det_size}x{det_size}x{nslices} and an offset of 8 bytes successfully saved to: \n{imgfn}')
-            print(f'To view, import the file into ImageJ or other raw image visualization tools')
+        if sink is None:
+            sink = BImgList(self.name)
 
-       return bimgs
+        if isinstance(sink, np.ndarray):
+            if sink.shape != (nimgs, det_size, det_size):
+                raise BlochListError(f'Image array sink must be of shape {(nimgs, det_size, det_size)}')
+            put = lambda n, emc, img: sink.__setitem__(n, img)
+
+        elif isinstance(sink, BImgList):
+            # copied, so that chunk buffers are released
+            put = lambda n, emc, img: sink.add(emc, np.array(img))
+
+        elif callable(sink):
+            put = lambda n, emc, img: sink(emc, img)
+
+        else:
+            raise BlochListError('Image sink must be a numpy array, BImgList or callable')
+
+        for n, (emc, img) in enumerate(self._iter_bloch_images(thlist, pix_size, det_size, isLACBED, nchunk)):
+            put(n, emc, img)
+
+        if isinstance(sink, np.memmap):
+            sink.flush()
+
+        return sink
+
+    def iterBlochImages(self, 
+                        sample_thickness = DEF_THICKNESS,
+                        pix_size = DEF_PIXSIZE,
+                        det_size = DEF_DETSIZE,
+                        nType = TY_NORMAL,
+                        mem_limit = None):
+        """
+        Generator of dynamic diffraction images from the simulation session 
+        marked by `beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_ and 
+        `endBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.endBloch>`_.
+
+        The images are generated in chunks of sample thicknesses, each with 
+        an image buffer of at most mem_limit bytes, and yielded in the order of 
+        `getBlochImages <pyemaps.crystals.html#pyemaps.crystals.Crystal.getBlochImages>`_.
+        A chunk is released once none of its images are referenced.
+        
+        :param sample_thickness: sample thickness range and step in tuple of three integers (th_start, th_end, th_step)
+        :type sample_thickness: tuple, optional
+
+        :param pix_size: Detector pixel size in microns
+        :type pix_size: int, optional
+
+        :param det_size: Detector size or output image size
+        :type det_size: int, optional
+
+        :param nType: type of bloch images generated. 0 for normal or 1 for large angle CBED images
+        :type nType: int, optional. defaults to 0
+
+        :param mem_limit: Limit in bytes of the image buffer of each chunk, one thickness per chunk if not set.
+        :type mem_limit: int, optional
+
+        :return: A generator of (emc, image) tuples.
+        :rtype: generator
+
+        :raises: BlochError, if the images of one sample thickness exceed mem_limit
+
+        """
+        isLACBED = (nType == TY_LACBED)
+        thlist = self._bloch_thicknesses(sample_thickness, pix_size, det_size)
+        nchunk = self._bloch_chunk(det_size, isLACBED, mem_limit)
+
+        return self._iter_bloch_images(thlist, pix_size, det_size, isLACBED, nchunk)
            
     def getIBDetails(self, bPrint=True):
         '''
@@ -616,6 +863,256 @@ def add_bloch(target):
 
         return scmdim, scm, ev, np.transpose(bms)
 
+    def _sampling_points(self):
+        '''
+        Sampling points of the current simulation session as a list of tuples.
+
+        '''
+        nsampling = bloch.get_nsampling()
+        sampling_points = farray(np.zeros((2, nsampling)), dtype=int)
+        sampling_points, ret = bloch.get_samplingpoints(sampling_points)
+
+        if ret != 0:
+            raise BlochError('Failed to retrive sampling points used in scattering matrix run')
+
+        return [(int(p[0]), int(p[1])) for p in np.transpose(sampling_points)]
+
+    def getSCMatrixBatch(self,
+                         ib_list = None,
+                         thicknesses = (DEF_THICKNESS[0],),
+                         rvecs = ((0.0,0.0,0.0),),
+                         beams = None,
+                         bEigenOnly = False):
+        '''
+        Scattering matrices at many sampling points, sample thicknesses and 
+        R vectors in stacked arrays, see 
+        `getSCMatrix <pyemaps.crystals.html#pyemaps.crystals.Crystal.getSCMatrix>`_
+        for one matrix.
+
+        The matrix dimension differs between sampling points, so the matrices
+        are stacked in arrays of the largest dimension n, padded with zeros.
+        The backend sets up each sampling point once for all of its thicknesses 
+        and R vectors, and the output arrays only grow when a sampling point
+        of a larger dimension than all before it comes up.
+
+        This call must be made during a dynamic simulation session marked by
+        `beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_ and   
+        `endBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.endBloch>`_.
+
+        :param ib_list: Sampling point coordinates, defaults to all sampling points.
+        :type ib_list: list of tuples, optional
+
+        :param thicknesses: Sample thicknesses.
+        :type thicknesses: list of int, optional
+
+        :param rvecs: R vectors, each a tuple of 3 floats.
+        :type rvecs: list of tuples, optional
+
+        :param beams: Diffracted beams in Miller indexes to keep the matrix elements of, defaults to all.
+        :type beams: list of tuples, optional
+
+        :param bEigenOnly: Only retrieve eigen values, without scattering matrices.
+        :type bEigenOnly: bool, optional
+
+        :return: A dict of
+
+            * **ib**: sampling points, shape (nib, 2)
+            * **ndim**: matrix dimension at each sampling point, shape (nib,)
+            * **scm**: scattering matrices, shape (nib, nrvec, nthickness, n, n), None if bEigenOnly
+            * **ev**: eigen values, shape (nib, nrvec, n)
+            * **beams**: diffracted beams at each sampling point, shape (nib, n, 3)
+
+            With beams selected, n is the number of beams selected and the dict also has
+
+            * **present**: whether each selected beam is in the matrix of each sampling point, shape (nib, n)
+
+        :rtype: dict
+
+        '''
+        if ib_list is None:
+            ib_list = self._sampling_points()
+
+        ib_list = list(ib_list)
+        if len(ib_list) == 0 or \
+           not all(len(ib) == 2 and all(isinstance(v, int) for v in ib) for ib in ib_list):
+            raise BlochError("Invalid incident beam coordinates input, must be tuples of two integers")
+
+        if isinstance(thicknesses, int):
+            thicknesses = (thicknesses,)
+
+        thicknesses = list(thicknesses)
+        if len(thicknesses) == 0 or not all(isinstance(th, int) for th in thicknesses):
+            raise BlochError("Sample thicknesses must be integers")
+
+        rvecs = list(rvecs)
+        if len(rvecs) == 0 or \
+           not all(len(rv) == 3 and all(isinstance(v, (int,float)) for v in rv) for rv in rvecs):
+            raise BlochError("Invalid R-vector input, must be tuples of three floats")
+
+        if beams is not None:
+            beams = np.array(beams, dtype=int).reshape(-1, 3)
+
+        nib, nrv, nth = len(ib_list), len(rvecs), len(thicknesses)
+        dims = np.zeros(nib, dtype=int)
+
+        def _alloc(n):
+            return (None if bEigenOnly else np.zeros((nib, nrv, nth, n, n), dtype=np.complex64),
+                    np.zeros((nib, nrv, n), dtype=np.complex64),
+                    np.zeros((nib, n, 3), dtype=int))
+
+        # with all beams kept, the arrays grow by half at least, to the 
+        # largest dimension seen, and are cut to it at the end
+        n = cap = 0 if beams is None else len(beams)
+        out_scm, out_ev, out_beams = _alloc(cap)
+        present = None if beams is None else np.zeros((nib, n), dtype=bool)
+
+        # backend buffers, one set for each matrix dimension
+        bufs = {}
+
+        # the backend sets up one sampling point at a time
+        for i, ib in enumerate(ib_list):
+            scmdim, ret = bloch.compute_scm([ib[0], ib[1]])
+            if ret != 0 or scmdim <= 0:
+                raise BlochError(f"Error finding corresponding scattering matrix at {ib}")
+
+            d = dims[i] = int(scmdim)
+            if beams is None and d > cap:
+                cap = max(d, cap + cap//2)
+                grown = _alloc(cap)
+                if out_scm is not None:
+                    grown[0][..., :n, :n] = out_scm[..., :n, :n]
+                grown[1][..., :n] = out_ev[..., :n]
+                grown[2][:, :n] = out_beams[:, :n]
+                out_scm, out_ev, out_beams = grown
+
+            if beams is None:
+                n = max(n, d)
+
+            if d not in bufs:
+                bufs[d] = (farray(np.zeros((d, d)), dtype=np.complex64),
+                           farray(np.zeros(d), dtype=np.complex64),
+                           farray(np.zeros((3, d), dtype=int)))
+            scm, ev, bms = bufs[d]
+
+            for r, rv in enumerate(rvecs):
+                for t, th in enumerate(thicknesses):
+                    scm, ev, bms, ret = bloch.getscm(th, rv, scm, ev, bms)
+                    if ret != 0:
+                        raise BlochError(f'Error retieving scattering matrix at {ib}')
+
+                    if t == 0:
+                        if beams is None:
+                            out_ev[i, r, :d] = ev
+                        else:
+                            sel, pos = _beam_positions(bms, beams)
+                            out_ev[i, r, sel] = ev[pos]
+
+                    if bEigenOnly:
+                        break
+
+                    if beams is None:
+                        out_scm[i, r, t, :d, :d] = scm
+                    else:
+                        out_scm[i, r, t][np.ix_(sel, sel)] = scm[np.ix_(pos, pos)]
+
+            if beams is None:
+                out_beams[i, :d] = np.transpose(bms)
+            else:
+                out_beams[i] = beams
+                present[i, sel] = True
+
+        if beams is None and n < cap:
+            if out_scm is not None:
+                out_scm = np.ascontiguousarray(out_scm[..., :n, :n])
+            out_ev = np.ascontiguousarray(out_ev[..., :n])
+            out_beams = np.ascontiguousarray(out_beams[:, :n])
+
+        ret = dict(ib = np.array(ib_list, dtype=int),
+                   ndim = dims,
+                   scm = out_scm,
+                   ev = out_ev,
+                   beams = out_beams)
+
+        if present is not None:
+            ret['present'] = present
+
+        return ret
+
+    def getRvecSeries(self,
+                      rvecs,
+                      ib_list = None,
+                      thicknesses = (DEF_THICKNESS[0],),
+                      beams = None):
+        '''
+        Scattering matrices over a series of R vectors, for defect and strain 
+        contrast simulations, stacked with the R vectors along the first axis.
+
+        A shift of all atoms by R only changes the phases of the structure factors,
+        so the beam selection and eigen-solutions of the simulation are kept and
+        the matrices are S(R) = D(R) S(0) D(R)*, with D(R) diagonal in the beams g 
+        of exp(-2*pi*i*g.R). The backend matrices at R = 0 are retrieved once 
+        and the series is computed with numpy for all R vectors at once. The 
+        phases are checked against the backend matrices at RVEC_PROBE first, and 
+        the backend computes each R vector if they do not match.
+
+        This call must be made during a dynamic simulation session marked by
+        `beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_ and   
+        `endBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.endBloch>`_.
+
+        :param rvecs: R vectors, each a tuple of 3 floats.
+        :type rvecs: list of tuples, required
+
+        Other parameters are those of 
+        `getSCMatrixBatch <pyemaps.crystals.html#pyemaps.crystals.Crystal.getSCMatrixBatch>`_.
+
+        :return: A dict of
+
+            * **rvecs**: R vectors, shape (nrvec, 3)
+            * **scm**: scattering matrices, shape (nrvec, nib, nthickness, n, n)
+            * **phased**: whether the series was computed from the phases of the matrices at R = 0
+            * **ev**: eigen values, shape (nib, n)
+
+            and ib, ndim, beams and present as returned by getSCMatrixBatch.
+        :rtype: dict
+
+        '''
+        rvecs = list(rvecs)
+        if len(rvecs) == 0 or \
+           not all(len(rv) == 3 and all(isinstance(v, (int,float)) for v in rv) for rv in rvecs):
+            raise BlochError("Invalid R-vector input, must be tuples of three floats")
+
+        res = self.getSCMatrixBatch(ib_list = ib_list,
+                                    thicknesses = thicknesses,
+                                    rvecs = ((0.0,0.0,0.0), RVEC_PROBE),
+                                    beams = beams)
+
+        g = res['beams'].astype(float)
+        s0 = res['scm'][:, 0]
+        
+        for sign in (-1, 1):
+            ph = np.exp(sign*2j*np.pi*(g @ np.array(RVEC_PROBE)))
+            probe = ph[:, None, :, None]*s0*np.conj(ph)[:, None, None, :]
+            if np.abs(probe - res['scm'][:, 1]).max() <= RVEC_TOLERANCE:
+                break
+        else:
+            sign = None
+
+        rv = np.array(rvecs, dtype=float)
+        if sign is not None:
+            ph = np.exp(sign*2j*np.pi*np.einsum('bnk,rk->rbn', g, rv)).astype(np.complex64)
+            scm = ph[:, :, None, :, None]*s0[None]*np.conj(ph)[:, :, None, None, :]
+        else:
+            res = self.getSCMatrixBatch(ib_list = ib_list,
+                                        thicknesses = thicknesses,
+                                        rvecs = rvecs,
+                                        beams = beams)
+            scm = np.moveaxis(res['scm'], 1, 0)
+
+        res['ev'] = res['ev'][:, 0]
+        res.update(rvecs = rv, scm = scm, phased = sign is not None)
+
+        return res
+
     def endBloch(self):
        """
        Clean up Bloch module. This function follows 
@@ -623,6 +1120,8 @@ def add_bloch(target):
        to mark the end of a dynamic simulation session.
 
        """
+       _bloch_run['open'] = False
+
        dif.diff_delete()
        bloch.free_bloch()
         
@@ -645,6 +1144,10 @@ def add_bloch(target):
         2. `getBlockImages <pyemaps.crystals.html#pyemaps.crystals.Crystal.getBlockImages>`_
         3. `endBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.endBloch>`_
 
+        in a `BlochSession <pyemaps.session.html#pyemaps.session.BlochSession>`_. To generate
+        images with other thicknesses or detector settings from the same simulation, use a 
+        session directly.
+
         :param aperture: Objective aperture.
         :type aperture: float, optional
 
@@ -718,30 +1221,20 @@ def add_bloch(target):
               points in *sampling* parameter can make a big difference in pyemaps performance. 
 
         """
-        try:
-           
-            _, _ = self.beginBloch(aperture=aperture, 
-                            omega=omega, 
-                            sampling=sampling, 
-                            dbsize = disk_size,
-                            em_controls=em_controls)
-
-        except BlochError as e:
-            # re-raise the same error, so that the caller can handle it
-            raise e
-
-        except Exception as e:
-            # Any other exception will be handled by the callers as BlochError from this point on
-            raise BlochError(f'Something went wrong in starting bloch simulation') from e
-        
-        else:
+        from ..session import BlochSession
+
+        with BlochSession(self,
+                          aperture = aperture, 
+                          omega = omega, 
+                          sampling = sampling, 
+                          dbsize = disk_size,
+                          em_controls = em_controls) as bs:
             try:
-                bimgs = self.getBlochImages(
-                    sample_thickness = sample_thickness,
-                    pix_size = pix_size,
-                    det_size = det_size,
-                    nType = nType,
-                    bSave = bSave)
+                return bs.getBlochImages(sample_thickness = sample_thickness,
+                                         pix_size = pix_size,
+                                         det_size = det_size,
+                                         nType = nType,
+                                         bSave = bSave)
 
             except (BlochError, BlochListError) as e:
                 raise
@@ -749,16 +1242,145 @@ def add_bloch(target):
             except Exception as e:
                 raise BlochError(f'Something went wrong when retrieving bloch image {e}') from e
 
-            else:
-                return bimgs
+    def estimateBloch(self, aperture = DEF_APERTURE,
+                            omega = DEF_OMEGA,
+                            sampling = DEF_SAMPLING,
+                            det_size = DEF_DETSIZE,
+                            disk_size = DEF_CBED_DSIZE,
+                            sample_thickness = DEF_THICKNESS,
+                            em_controls = EMC(cl=200,
+                                              simc = SIMC(gmax=1.0, excitation=(0.3,1.0))),
+                            nType = TY_NORMAL,
+                            mem_limit = None):
+        """
+        Estimates the resources of a dynamic diffraction (Bloch) simulation
+        before it is run, from the kinematic CBED pre-pass of 
+        `beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_ 
+        only, so that jobs can be sized and rejected without solving any 
+        sampling point.
+
+        .. code-block:: python
+
+            from pyemaps import Crystal
+
+            si = Crystal.from_builtin('Silicon')
+            for ds in (512, 256, 128):
+                est = si.estimateBloch(sampling = 40, det_size = ds, mem_limit = 2**30)
+                if est['fits']:
+                    break
+
+        :param mem_limit: Memory limit in bytes to check the estimates against.
+        :type mem_limit: int, optional
+
+        Other parameters are those of 
+        `generateBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateBloch>`_.
+
+        :return: A dict of
+
+            * **nbeams**: diffracted beams of the kinematic pre-pass within the objective aperture, an estimate of the calculated beams
+            * **ndim**: largest scattering matrix dimension
+            * **nsampling**: number of sampling points, points of a square grid within the disk of radius sampling
+            * **point_flops**: floating point operations of the eigen solve at a sampling point
+            * **flops**: floating point operations of the eigen solves at all sampling points
+            * **eigen_bytes**: memory of the eigen-solutions held in the backend
+            * **image_bytes**: memory of the Bloch image buffer
+            * **total_bytes**: sum of eigen_bytes and image_bytes
+            * **fits**: whether total_bytes is within mem_limit, None if mem_limit is not set
+
+        :rtype: dict
+
+        .. note::
+
+            The backend settles the calculated beams and the matrix dimension at each 
+            sampling point only when the simulation runs. The pre-pass beams are 
+            cut to reciprocal vector lengths within *aperture*, in the units of gmax, 
+            while the diagnization cutoff *omega* is only known to the backend. The 
+            estimates are upper bounds in general, as beams beyond that cutoff are 
+            dropped from the scattering matrices.
+
+        """
+        from ..session import BlochSession, _eigen_bytes, _thickness_count
+
+        if aperture is None or not isinstance(aperture, (int, float)) or aperture <= 0:
+            raise BlochError('Objective aperture must be a positive number')
+
+        if omega is None or not isinstance(omega, int):
+            raise BlochError('Diagnization cutoff value must be valid numberal')
+
+        if not isinstance(sampling, int) or sampling <= 0:
+            raise BlochError('Number of sampling points must be a positive integer')
+
+        if disk_size is None or not isinstance(disk_size, (int,float)) or \
+            disk_size < DEF_DSIZE_LIMITS[0] or disk_size > DEF_DSIZE_LIMITS[1]:
+            raise BlochError(f'Diffracted beam size must be in range {DEF_DSIZE_LIMITS}')
+
+        if em_controls is None or not isinstance(em_controls, EMC): 
+            raise BlochError('Control object must be of EMControl type')
+
+        if mem_limit is not None and (not isinstance(mem_limit, int) or mem_limit <= 0):
+            raise BlochError('Memory limit must be a positive integer')
+
+        self._bloch_thicknesses(sample_thickness, DEF_PIXSIZE, det_size)
+
+        # the pre-pass replaces the controls the open simulation images are made with
+        if bloch_run() is not None:
+            raise BlochError('Bloch resources can not be estimated while a Bloch simulation is open')
 
-            finally:
-                self.endBloch()
+        dif.initcontrols()
+        controls_changed()
+        dif.setmode(CBED_MODE)
+        self.set_sim_controls(em_controls.simc)
+        dif.setdisksize(disk_size)
+
+        self.load()
+
+        tx, ty = em_controls.tilt
+        dx, dy = em_controls.defl
+        z = em_controls.zone
+        dif.setsamplecontrols(tx, ty, dx, dy)
+        dif.setemcontrols(em_controls.cl, em_controls.vt)
+        dif.setzone(z[0], z[1], z[2])
 
-        finally:
-            self.endBloch()
+        if em_controls.xaxis != DEF_XAXIS:
+            xa = em_controls.xaxis
+            dif.set_xaxis(1, xa[0], xa[1], xa[2])
 
-                
+        ret = dif.diffract(1)
+        dif.diff_internaldelete(1)
+        if ret == 0:
+            raise BlochError('Error in kinematic pre-pass of bloch simulation')
+
+        ndisks = dif.getdnum()
+        disks = farray(np.zeros((ndisks, 6)), dtype=np.single)
+        if ndisks > 0 and dif.get_disks(disks) != 0:
+            dif.diff_delete()
+            raise BlochError('Error retrieving disks of kinematic pre-pass')
+
+        # beams outside the objective aperture are not calculated
+        nbeams = sum(1 for h, k, l in np.rint(disks[:, 3:6]).astype(int).tolist()
+                     if dif.vlen(h, k, l, 1) <= aperture)
+        dif.diff_delete()
+
+        nsampling = _disk_points(sampling)
+        point_flops = EIGEN_FLOPS*nbeams**3
+
+        nslices = _thickness_count(sample_thickness)
+        if nType == TY_LACBED:
+            nslices *= nbeams
+
+        eigen_bytes = _eigen_bytes(nsampling, nbeams)
+        image_bytes = BlochSession.image_bytes(det_size = det_size, nslices = nslices)
+        total_bytes = eigen_bytes + image_bytes
+
+        return dict(nbeams = nbeams,
+                    ndim = nbeams,
+                    nsampling = nsampling,
+                    point_flops = point_flops,
+                    flops = nsampling*point_flops,
+                    eigen_bytes = eigen_bytes,
+                    image_bytes = image_bytes,
+                    total_bytes = total_bytes,
+                    fits = None if mem_limit is None else total_bytes <= mem_limit)
 
     target.beginBloch = beginBloch
     target._getBlochFN = _getBlochFN
@@ -767,13 +1389,24 @@ def add_bloch(target):
     target.getIBDetails = getIBDetails
     # target.getBeams = getBeams     <-------deprecate
     target.getSCMatrix = getSCMatrix
+    target.getSCMatrixBatch = getSCMatrixBatch
+    target.getRvecSeries = getRvecSeries
+    target._sampling_points = _sampling_points
     target.getBlochImages = getBlochImages
+    target.iterBlochImages = iterBlochImages
+    target._bloch_thicknesses = _bloch_thicknesses
+    target._render_bloch_images = _render_bloch_images
+    target._save_bloch_images = _save_bloch_images
+    target._bloch_chunk = _bloch_chunk
+    target._iter_bloch_images = _iter_bloch_images
+    target._sink_bloch_images = _sink_bloch_images
     target.getCalculatedBeams = getCalculatedBeams
     # target.getLACBEDImage = getLACBEDImage
     # ---These calls must be between beginBloch and endBloch calls
 
     target.endBloch = endBloch
 
+    target.estimateBloch = estimateBloch
     target.generateBloch = generateBloch
 
     return target
\ No newline at end of file
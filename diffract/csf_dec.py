@@ -187,16 +187,27 @@ def add_csf(target):
             }
 
         """
+        sfs, _ = self._get_csf(kv, smax, sftype, aptype)
+
+        return sfs
+
+    def _get_csf(self, kv, smax, sftype, aptype):
+        '''
+        internal - structure factors as from generateCSF and whether the
+        backend returned all of them
+
+        '''
         sfs = [dict(kv = kv, smax = smax, sftype = sftype, aptype = aptype)]
 
         self.load()
 
         nb, ret = csf.generate_sf(kv, smax, sftype, aptype)
+        complete = ret == 0
         
         if ret != 0 and nb <= 0:
             print(f'Error generating structure factor for {self.name}')
             self.cleanCSF()
-            return sfs
+            return sfs, False
 
         for i in range(2, nb+1):
             ret = 0
@@ -204,7 +215,7 @@ def add_csf(target):
             if ret != 0: 
                 print(f'Error generating sructure factor for {self.name}')
                 self.cleanCSF()
-                return sfs
+                return sfs, False
             
             sf = dict(hkl = (h,k,l),
                        sw = s,
@@ -217,9 +228,10 @@ def add_csf(target):
         #release the memory
         self.cleanCSF()
 
-        return sfs
+        return sfs, complete
     
     target.generateCSF = generateCSF
+    target._get_csf = _get_csf
     target.printCSF = printCSF
     target.cleanCSF = cleanCSF
 
@@ -24,12 +24,40 @@
 .. Date Created:       May 07, 2022  
 
 '''
+
+# Crystal data resident in the backend simulation modules, shared by all
+# crystal objects in the process: the fingerprint and load type of the 
+# data and the ids of the crystal objects using it.
+_resident = dict(key = None, ltype = -1, owners = set())
+
+# Generation of the microscope controls set in the backend, bumped by
+# every call that sets them, so that a suspended pattern stream can tell
+# whether the controls it sent are still in place.
+_controls = dict(generation = 0)
+
+def controls_changed():
+    '''
+    Records that the backend diffraction controls were set, and returns
+    the new controls generation.
+
+    '''
+    _controls['generation'] += 1
+
+    return _controls['generation']
+
+def is_resident(cr):
+    '''
+    Whether the data of crystal object cr is the one loaded in the backend.
+
+    '''
+    return id(cr) in _resident['owners']
+
 def add_dif(target):
     import numpy as np
     from numpy import asfortranarray as farray
 
     from . import dif
-    from .. import EMC, DP
+    from .. import EMC, DP, EMCGrid
     from .. import DEF_MODE, DEF_CBED_DSIZE, DEF_XAXIS
     from .. import EMCError,DPListError,CrystalClassError,DPError
 
@@ -56,40 +84,71 @@ def add_dif(target):
             and therefore miximizing the performance. Users do not need to handle this calls
             directly.
 
+            Crystal objects with the same data share what is loaded in the backend, 
+            the data is only loaded again when a crystal with different data was
+            loaded in between.
+
         '''
         if self.loaded() and cty == self._ltype:
             return
 
-        diff_cell = self._cell.prepare() #cell constant
-        
-        num_atoms = len(self._atoms)
-        atn = farray(np.empty((num_atoms, 10), dtype='c'))
-        
-        atnarr = [at.symb for at in self._atoms]
-        for i, an in enumerate(atnarr):
-            if len(an) > 10:
-                raise CrystalClassError(f"Atomic symbol {an} length cannot exceed 10")
-            atn[i] = an.ljust(10)
+        diff_cell, diff_atoms, atn, diff_spg = self._prepare()
+        key = self._fingerprint()
 
-        diff_atoms = farray([at.prepare() for at in self._atoms], dtype=float)
-        
-        diff_spg = self._spg.prepare()
+        if key == _resident['key'] and cty == _resident['ltype']:
+            _resident['owners'].add(id(self))
+            self._loaded = True
+            self._ltype = cty
+            return
 
         ret = dif.loadcrystal(diff_cell, diff_atoms, atn, diff_spg, ndw=self._dw, cty=cty)
         
         if ret != 0:
-            self.unload() #remove any memory from backend module
+            _release_backend()
+            self._loaded = False
             raise CrystalClassError('Failed to load crystal')
 
+        # crystals sharing the replaced data are no longer loaded
+        _resident.update(key = key, ltype = cty, owners = {id(self)})
         self._loaded = True
         self._ltype = cty
 
+    def _prepare(self):
+        '''
+        Prepares crystal data arrays for loading into the backend.
+
+        '''
+        diff_cell = self._cell.prepare() #cell constant
+        
+        # atom data arrays are kept by the crystal between loads
+        _, diff_atoms, atn = self._site_arrays()
+        
+        diff_spg = self._spg.prepare()
+
+        return diff_cell, diff_atoms, atn, diff_spg
+
+    def _release_backend():
+        '''
+        Removes any crystal data from the backend memory.
+
+        '''
+        dif.crystaldelete()
+        _resident.update(key = None, ltype = -1, owners = set())
+
     def unload(self):
         '''
         Remove crystal data from the memory in the backend simulation modules.
+
+        The data stays in the backend while other crystal objects with the 
+        same data still use it.
         
         '''
-        dif.crystaldelete()
+        owners = _resident['owners']
+        if id(self) in owners:
+            owners.discard(id(self))
+            if not owners:
+                _release_backend()
+
         self._loaded = False
 
     def generateDP(self, mode = None, dsize = None, em_controls = None):
@@ -188,12 +247,11 @@ def add_dif(target):
             if mode == 2 (CBED), then dsize must be set
 
         """
-        import copy
-
         if mode != DEF_MODE and mode != DEF_MODE + 1:
             raise EMCError('Simulation mode is invalid: 1 = normal (default), 2 = CBED')
 
         dif.initcontrols()
+        controls_changed()
         # mode defaults to DEF_MODE, in which dsize is not used
         # Electron Microscope controls defaults - DEF_CONTROLS
         
@@ -233,6 +291,19 @@ def add_dif(target):
         
         self.load()
         
+        return self._read_diffraction(mode)
+
+    def _read_diffraction(self, mode = None):
+        """
+        Runs the kinematic diffraction in the backend with the controls
+        currently set there and retrieves the raw diffraction data.
+
+        The crystal must already be loaded and all controls set before
+        this call. Only the diffraction pattern memory is released at 
+        the end, the controls and crystal data remain in the backend 
+        for the next run.
+
+        """
         ret = dif.diffract()
         if ret == 0:
             return 500, ({})
@@ -244,64 +315,35 @@ def add_dif(target):
         #remove module internal global memory
         dif.diff_internaldelete(0)
 
-        klines=[]
+        # the arrays filled by the backend are handed over to the 
+        # diffraction pattern object as they are, without copying
         num_klines = dif.getknum()
+        klines_arr = farray(np.zeros((num_klines, 5)), dtype=np.single)
         
-        if (num_klines > 0):
-            klines_arr = farray(np.zeros((num_klines, 5)), dtype=np.single)
-            
-            if dif.get_klines(klines_arr) == 0:
-                for i in range(num_klines):
-                    j=i+1
-                    x1,y1,x2,y2,intensity=klines_arr[i][0:]
-                    klines.append((x1,y1,x2,y2,intensity))
-            else:
-                print(f"Error: retrieving klines!")
-                return 500, ({})
-
-        disks=[]
+        if (num_klines > 0) and dif.get_klines(klines_arr) != 0:
+            print(f"Error: retrieving klines!")
+            return 500, ({})
+
         num_disks = dif.getdnum()
-        if (num_disks > 0):
-            disks_arr = farray(np.zeros((num_disks, 6)), dtype=np.single)
-            if dif.get_disks(disks_arr) == 0:
-                # for i in range(num_disks):
-                #     x1,y1,r,i1,i2,i3=disks_arr[i][0:]
-                #     disk={}
-                #     disk['c']=(x1,y1)
-                #     disk['r']=r
-                #     disk['idx']=(int(i1),int(i2),int(i3))
-                #     disks.append(disk)
-                for d in disks_arr:
-                    x1,y1,r,i1,i2,i3=d
-                    disk={}
-                    disk['c']=(x1,y1)
-                    disk['r']=r
-                    disk['idx']=(int(i1),int(i2),int(i3))
-                    disks.append(disk)
-
-            else:
-                print(f"Error: retrieving disks!")
-                return 500, ({})
-
-        hlines=[]
+        disks_arr = farray(np.zeros((num_disks, 6)), dtype=np.single)
+
+        if (num_disks > 0) and dif.get_disks(disks_arr) != 0:
+            print(f"Error: retrieving disks!")
+            return 500, ({})
+
         num_hlines = 0
         if (mode == 2):
             num_hlines = dif.gethnum()
-            
-            if (num_hlines > 0):
-                hlines_arr = farray(np.zeros((num_hlines, 5)), dtype=np.single)
-                if dif.get_hlines(hlines_arr) == 0:
-                    for i in range(num_hlines):
-                        x1,y1,x2,y2,intensity = hlines_arr[i][0:]
-                        hlines.append((x1,y1,x2,y2,intensity))
-                else:
-                    print(f"Info: no hlines detected!")
-                    return 500, ({})
+        hlines_arr = farray(np.zeros((num_hlines, 5)), dtype=np.single)
+
+        if (num_hlines > 0) and dif.get_hlines(hlines_arr) != 0:
+            print(f"Info: no hlines detected!")
+            return 500, ({})
 
         nums = {"nklines" : num_klines, "ndisks" : num_disks, "nhlines" : num_hlines}
-        data = {"nums" : copy.deepcopy(nums), "bounds": copy.deepcopy(bounds), \
-                    "klines": copy.deepcopy(klines), "hlines": copy.deepcopy(hlines), \
-                    "disks": copy.deepcopy(disks), "name" : self.name}
+        data = {"nums" : nums, "bounds": bounds, \
+                    "klines": klines_arr, "hlines": hlines_arr, \
+                    "disks": disks_arr, "name" : self.name}
 
         # delete diff pattern memory
         dif.diff_delete()
@@ -337,7 +379,258 @@ def add_dif(target):
         except (DPListError, EMCError, DPError) as e:
             raise CrystalClassError('failed to generate diffraction')
 
-        return myDif   
+        return myDif
+
+    def _set_batch_controls(self, ctl, prev = None, mode = None, dsize = None):
+        '''
+        Sets the controls ctl in the backend for a batch run. Only the 
+        controls that differ from the previous controls prev are sent
+        to the backend.
+
+        A change of zone axis, x-axis or simulation controls resets
+        all controls in the backend as their defaults are only restored
+        by dif.initcontrols().
+
+        :param ctl: controls snapshot from _batch_controls.
+        :type ctl: dict, required
+
+        :param prev: controls snapshot of the previous pattern in the batch.
+        :type prev: dict, optional
+
+        :return: `True` if the backend controls were reset.
+        :rtype: bool
+
+        '''
+        bReset = prev is None or \
+                 ctl['zone'] != prev['zone'] or \
+                 ctl['xaxis'] != prev['xaxis'] or \
+                 not (ctl['simc'] == prev['simc'])
+
+        if bReset:
+            dif.initcontrols()
+            if mode == 2:
+                dif.setmode(mode)
+                dif.setdisksize(dsize)
+
+            zone = ctl['zone']
+            dif.setzone(zone[0], zone[1], zone[2])
+            self.set_sim_controls(ctl['simc'])
+
+            xa = ctl['xaxis']
+            if xa != DEF_XAXIS:
+                dif.set_xaxis(1, xa[0], xa[1], xa[2])
+
+        if bReset or ctl['tilt'] != prev['tilt'] or ctl['defl'] != prev['defl']:
+            tx0, ty0 = ctl['tilt']
+            dx0, dy0 = ctl['defl']
+            dif.setsamplecontrols(tx0, ty0, dx0, dy0)
+
+        if bReset or ctl['cl'] != prev['cl'] or ctl['vt'] != prev['vt']:
+            dif.setemcontrols(ctl['cl'], ctl['vt'])
+
+        return bReset
+
+    @staticmethod
+    def _batch_controls(emc):
+        '''
+        Snapshot of the controls in emc that are sent to the backend. 
+        Taken before emc is updated with the backend results, so that
+        an x-axis calculated by the backend does not count as a change.
+
+        '''
+        return dict(zone = emc.zone, 
+                    xaxis = emc.xaxis, 
+                    simc = emc.simc,
+                    tilt = emc.tilt, 
+                    defl = emc.defl, 
+                    cl = emc.cl, 
+                    vt = emc.vt)
+
+    @staticmethod
+    def _kdif_mode(mode = None, dsize = None):
+        '''
+        Validated kinematic diffraction mode and disk size for batch runs.
+
+        '''
+        if not mode:
+            mode = DEF_MODE
+
+        if mode != DEF_MODE and mode != DEF_MODE + 1:
+            raise EMCError('Simulation mode is invalid: 1 = normal (default), 2 = CBED')
+
+        if mode == 2:
+            if dsize is None:
+                dsize = DEF_CBED_DSIZE
+            try:
+                dsize = float(dsize)
+            except (TypeError, ValueError):
+                raise EMCError('Invalid diffracted beams disk size')
+
+        return mode, dsize
+
+    def _dp_stream(self, emc_iter, mode, dsize):
+        '''
+        Generator of (emc, dp, bReset) for each microscope control taken 
+        from emc_iter, where bReset tells whether the backend controls 
+        were reset for the pattern.
+
+        Only the controls changed since the previous pattern are sent 
+        to the backend. If the backend data is replaced by another
+        crystal, or the backend controls are set by any other call while
+        the generator is suspended, the crystal is loaded again if needed
+        and all controls reset.
+
+        '''
+        self.load()
+
+        prev = None
+        gen = None
+        for emc in emc_iter:
+            if not isinstance(emc, EMC):
+                raise DPListError('Microscope controls input must be EMControl objects')
+
+            if not is_resident(self):
+                self.load()
+                prev = None
+
+            if gen != _controls['generation']:
+                prev = None
+
+            ctl = self._batch_controls(emc)
+            bReset = self._set_batch_controls(ctl, prev, mode, dsize)
+            gen = controls_changed()
+
+            ret, diffp = self._read_diffraction(mode)
+
+            if ret != 200:
+                raise DPError('failed to generate diffraction patterns')
+
+            # update the controls as in generateDP
+            emc(mode=mode)
+            if mode == 2:
+                emc(dsize=dsize)
+
+            if emc.xaxis == DEF_XAXIS:
+                xa1, xa2, xa3 = dif.get_xaxis()
+                emc(xaxis = (xa1,xa2,xa3))
+
+            prev = ctl
+            yield emc, DP(diffp), bReset
+
+    def iterDP(self, emc_iter, mode = None, dsize = None):
+        """
+        Kinematic diffraction simulation streamed over microscope controls.
+
+        Each pattern is generated only when the next one is requested and
+        none are kept by the generator, so orientation sweeps of any size
+        can be written out or matched one pattern at a time. As in 
+        `generateDPBatch <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDPBatch>`_,
+        only the controls that change between consecutive patterns are
+        sent to the backend.
+
+        .. code-block:: python
+
+            from pyemaps import Crystal, EMC
+
+            si = Crystal.from_builtin('Silicon')
+            tilts = (EMC(tilt=(0.01*i, 0.01*j)) for i in range(-100, 100) 
+                                                 for j in range(-100, 100))
+
+            for emc, dp in si.iterDP(tilts, mode = 2):
+                ...
+
+        :param emc_iter: Any iterable of `Microscope control <pyemaps.emcontrols.html#module-pyemaps.emcontrols>`_ objects, including generators.
+        :type emc_iter: iterable of pyemaps.EMC, required
+
+        :param mode: Mode of kinemetic diffraction - normal(1) or CBED(2).
+        :type mode: int, optional
+
+        :param dsize: diffractted beam size, only applied to CBED mode.
+        :type dsize: float, optional
+
+        :return: A generator of (emc, dp) tuples in the order of emc_iter.
+        :rtype: generator
+
+        """
+        mode, dsize = self._kdif_mode(mode, dsize)
+
+        try:
+            emc_iter = iter(emc_iter)
+        except TypeError:
+            raise DPListError('Microscope controls input must be an iterable of EMControl objects')
+
+        return ((emc, dp) for emc, dp, _ in self._dp_stream(emc_iter, mode, dsize))
+
+    def generateDPBatch(self, emc_list, mode = None, dsize = None, bTiming = False):
+        """
+        Kinematic diffraction simulation over a list of microscope controls.
+
+        The crystal is loaded once for the whole batch and only those
+        controls that change between consecutive microscope controls are
+        sent to the backend, which makes tilt or zone sweeps much cheaper
+        than calling `generateDP <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDP>`_
+        for each of them.
+
+        :param emc_list: A list of `Microscope control <pyemaps.emcontrols.html#module-pyemaps.emcontrols>`_ objects or a `microscope controls grid <pyemaps.emcontrols.html#pyemaps.emcontrols.EMCGrid>`_.
+        :type emc_list: list of pyemaps.EMC or pyemaps.EMCGrid, required
+
+        :param mode: Mode of kinemetic diffraction - normal(1) or CBED(2).
+        :type mode: int, optional
+
+        :param dsize: diffractted beam size, only applied to CBED mode.
+        :type dsize: float, optional
+
+        :param bTiming: whether to print the time spent on each pattern.
+        :type bTiming: bool, optional, default `False`
+
+        :return: diffraction patterns list in the order of emc_list.
+        :rtype: pyemaps.DPList
+
+        .. note::
+
+            Sorting emc_list by zone axis and simulation controls before this
+            call maximizes the saving, as a change in either of them resets all
+            controls in the backend. `EMCGrid.sort <pyemaps.emcontrols.html#pyemaps.emcontrols.EMCGrid.sort>`_
+            puts a grid in that order.
+
+        """
+        import time
+        from .. import DPList
+
+        if not isinstance(emc_list, EMCGrid) and \
+           (emc_list is None or not hasattr(emc_list, '__len__') or \
+            not all(isinstance(emc, EMC) for emc in emc_list)):
+            raise DPListError('Microscope controls input must be a list of EMControl objects')
+
+        mode, dsize = self._kdif_mode(mode, dsize)
+
+        dpl = DPList(self._name, mode = mode)
+        ptimes = []
+        nresets = 0
+
+        t0 = time.perf_counter()
+        for emc, dp, bReset in self._dp_stream(emc_list, mode, dsize):
+            if bReset:
+                nresets += 1
+
+            dpl.add(emc, dp)
+
+            t1 = time.perf_counter()
+            ptimes.append(t1 - t0)
+            t0 = t1
+
+        if bTiming and len(ptimes) > 0:
+            print(f'\n-------Kinematic Diffraction Batch Timing for {self._name}---------\n')
+            print(f"{'Pattern #':^11}{'Time (ms)':^16}")
+            for i, t in enumerate(ptimes):
+                print(f"{i+1:^11}{t*1000.0:^16.3f}")
+
+            total = sum(ptimes)
+            print(f'\nTotal number of patterns: {len(ptimes)}')
+            print(f'Backend controls resets: {nresets}')
+            print(f'Total time: {total*1000.0:.3f} ms, average per pattern: {total*1000.0/len(ptimes):.3f} ms')
+
+        return dpl
 
     def d2r(self, v = (0.0, 0.0, 0.0)):
         '''
@@ -505,7 +798,14 @@ def add_dif(target):
 
     target.generateDP = generateDP
     target._get_diffraction = _get_diffraction
+    target._read_diffraction = _read_diffraction
     target.generateDif=generateDif
+    target.generateDPBatch = generateDPBatch
+    target.iterDP = iterDP
+    target._dp_stream = _dp_stream
+    target._kdif_mode = _kdif_mode
+    target._set_batch_controls = _set_batch_controls
+    target._batch_controls = _batch_controls
     target.d2r = d2r
     target.r2d = r2d
     target.angle = angle
@@ -514,6 +814,7 @@ def add_dif(target):
     target.set_sim_controls = set_sim_controls
     target.load = load
     target.unload = unload
+    target._prepare = _prepare
     
 
     return target
\ No newline at end of file
@@ -24,9 +24,216 @@
 .. Date Created:       May 07, 2022  
 
 '''
+DPDB_MANIFEST_EXT = '.shards.json'
+#str: extension of the manifest of a sharded diffraction pattern database
+
+MAX_ZONE_INDEX = 24
+#int: largest index of the zone axes placed at edge midpoints when splitting an orientation region
+
+ZONE_ANGLE_TOL = 0.25
+#float: angle in degrees within which an edge midpoint zone axis of small indexes is taken
+
+def _reduce_zone(z):
+    '''
+    internal - zone axis indexes divided by their greatest common divisor
+
+    '''
+    import math
+
+    g = math.gcd(math.gcd(z[0], z[1]), z[2])
+    return [v // g for v in z] if g > 1 else list(z)
+
+def _lattice_basis(cell):
+    '''
+    internal - Cartesian direct lattice vectors as columns, from the lattice
+    constants (a, b, c, alpha, beta, gamma) in Angstroms and degrees
+
+    '''
+    import numpy as np
+
+    a, b, c = cell[:3]
+    ca, cb, cg = np.cos(np.radians(cell[3:6]))
+    sg = np.sin(np.radians(cell[5]))
+    cy = (ca - cb*cg)/sg
+
+    return np.array([[a, b*cg, c*cb],
+                     [0.0, b*sg, c*cy],
+                     [0.0, 0.0, c*np.sqrt(1.0 - cb*cb - cy*cy)]])
+
+def _midpoint_zone(p, q, basis):
+    '''
+    internal - integer zone axis at the angular midpoint of zone axes p and q:
+    the one of the smallest indexes within ZONE_ANGLE_TOL of the midpoint, or
+    the nearest one of indexes up to MAX_ZONE_INDEX
+
+    '''
+    import numpy as np
+
+    u, v = basis @ np.array(p, dtype=float), basis @ np.array(q, dtype=float)
+    m = u/np.linalg.norm(u) + v/np.linalg.norm(v)
+    if np.linalg.norm(m) < 1.0e-9:
+        raise ValueError(f'Zone axis vertices {p} and {q} are opposite')
+
+    m /= np.linalg.norm(m)
+    d = np.linalg.solve(basis, m)
+    d /= np.abs(d).max()
+
+    cos_tol = np.cos(np.radians(ZONE_ANGLE_TOL))
+    best, best_cos = None, -2.0
+    for n in range(1, MAX_ZONE_INDEX + 1):
+        z = np.rint(n*d)
+        w = basis @ z
+        cos = w @ m/np.linalg.norm(w)
+        if cos > best_cos:
+            best, best_cos = z, cos
+
+        if best_cos >= cos_tol:
+            break
+
+    return _reduce_zone([int(i) for i in best])
+
+def split_vertices(vertices, depth = 1, cell = None):
+    '''
+    Splits the orientation region enclosed by 3 or 4 zone axis vertices
+    into triangles of zone axis vertices, for diffraction pattern databases
+    generated in parts. 
+
+    A region of 4 vertices is first split into 2 triangles along a diagonal.
+    Each triangle is then split depth times into 4, at the angular midpoints
+    of its edges, so that the triangles of a split are of about equal size.
+    Vertices remain integer zone axis indexes: a midpoint is taken as the
+    zone axis of the smallest indexes within ZONE_ANGLE_TOL degrees of it.
+
+    :param vertices: 3 or 4 zone axis indexes.
+    :type vertices: list of three integer lists, required
+
+    :param depth: Number of times the triangles are split.
+    :type depth: int, optional
+
+    :param cell: Lattice constants (a, b, c, alpha, beta, gamma) the angles between 
+                 zone axes are measured in, those of a cubic lattice by default.
+    :type cell: sequence of six floats, optional
+
+    :return: Vertices of each triangle.
+    :rtype: list
+
+    '''
+    import numpy as np
+
+    basis = np.identity(3) if cell is None else _lattice_basis(cell)
+
+    verts = [_reduce_zone([int(v) for v in z]) for z in vertices]
+    if len(verts) == 3:
+        tris = [verts]
+    elif len(verts) == 4:
+        tris = [[verts[0], verts[1], verts[2]], [verts[0], verts[2], verts[3]]]
+    else:
+        raise ValueError('Orientation region must have 3 or 4 zone axis vertices')
+
+    for _ in range(depth):
+        split = []
+        for a, b, c in tris:
+            ab, bc, ca = [_midpoint_zone(p, q, basis) 
+                          for p, q in ((a, b), (b, c), (c, a))]
+            split += [[a, ab, ca], [ab, b, bc], [ca, bc, c], [ab, bc, ca]]
+        tris = split
+
+    return tris
+
+def _write_manifest(fn, manifest):
+    '''
+    internal - writes the manifest of a sharded diffraction pattern 
+    database, replacing the file only once it is complete
+
+    '''
+    import json
+    import os
+
+    tmpfn = f'{fn}.{os.getpid()}.tmp'
+    with open(tmpfn, 'w') as f:
+        json.dump(manifest, f, indent = 1)
+
+    os.replace(tmpfn, fn)
+
+def _part_id(key, vertices):
+    '''
+    internal - identifier of a part of a sharded diffraction pattern database 
+    from the crystal, controls, x-axis and resolution in the manifest key and
+    its triangle of zone axis vertices
+
+    '''
+    import hashlib
+    import json
+
+    part = dict(crystal = key['crystal'],
+                controls = key['controls'],
+                xaxis = key['xaxis'],
+                res = key['res'],
+                vertices = [list(z) for z in vertices])
+
+    return hashlib.sha1(json.dumps(part, sort_keys = True).encode()).hexdigest()[:16]
+
+def _complete_parts(manifest_fn):
+    '''
+    internal - part files that are complete and unchanged in the manifest
+    of a sharded diffraction pattern database, by part identifier
+
+    '''
+    import json
+    import os
+
+    try:
+        with open(manifest_fn) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict) or 'key' not in manifest or 'shards' not in manifest:
+        return {}
+
+    parts = {}
+    for sh in manifest['shards']:
+        if sh['status'] == 'done' and \
+           os.path.exists(sh['file']) and os.path.getsize(sh['file']) == sh['size']:
+            parts[_part_id(manifest['key'], sh['vertices'])] = (sh['file'], sh['size'])
+
+    return parts
+
+# crystal and controls of the database generated by a worker process,
+# sent once to each worker rather than with each part
+_shard_job = None
+
+def _init_dpdb_worker(cr, emc, xa, res):
+    '''
+    internal - sets up a worker process generating the parts of a sharded
+    diffraction pattern database
+
+    '''
+    global _shard_job
+    _shard_job = (cr, emc, xa, res)
+
+def _dpdb_shard(task):
+    '''
+    internal - generates one part of a sharded diffraction pattern database
+    in a worker process
+
+    '''
+    i, vertices, output_fn = task
+    cr, emc, xa, res = _shard_job
+
+    try:
+        ret, _ = cr.generateDPDB(emc = emc, xa = xa, res = res, 
+                                 vertices = vertices, output_fn = output_fn)
+    except Exception as e:
+        print(f'Error generating diffraction pattern database part {i}: {e}')
+        ret = -1
+
+    return i, ret
+
 def add_dpgen(target):
     try:
         from . import dif, dpgen
+        from .dif_dec import controls_changed
 
     except ImportError as e:             
         # return an empty target if non-extant
@@ -68,7 +275,8 @@ def add_dpgen(target):
     def generateDPDB(self, emc = EMC(),
                            xa = DEF_XAXIS,
                            res = LOW_RES,
-                           vertices = DEF_VERTMAT
+                           vertices = DEF_VERTMAT,
+                           output_fn = None
                     ):
         
         """
@@ -98,6 +306,10 @@ def add_dpgen(target):
                     graphic illustration of the vertices input.
 
         :type vertices: three integer tuple, optional
+
+        :param output_fn: database file name without the .bin extension, defaults to 
+                    an auto-generated name.
+        :type output_fn: string, optional
         
         :return: a tuple of a status code and database file name
         :rtype: tuple of an integer and a string
@@ -122,6 +334,7 @@ def add_dpgen(target):
 
         self.load()
         dif.initcontrols()
+        controls_changed()
         
         vt = emc.vt
         zone = emc.zone
@@ -149,7 +362,8 @@ def add_dpgen(target):
         vert = np.array(vertices).transpose()    
         vertices = farray(vert, dtype=int)
         
-        output_fn = self._getDPDBFN()
+        if output_fn is None:
+            output_fn = self._getDPDBFN()
         
         final_fp= output_fn+'.' + DPDB_EXT
 
@@ -169,7 +383,181 @@ def add_dpgen(target):
         print('*******************************************************************************')
         return 0, final_fp
     
+    def generateDPDBSharded(self, emc = EMC(),
+                                  xa = DEF_XAXIS,
+                                  res = LOW_RES,
+                                  vertices = DEF_VERTMAT,
+                                  depth = 1,
+                                  nworkers = None,
+                                  output_fn = None,
+                                  resume = True,
+                                  progress = None,
+                                  base = None
+                    ):
+        """
+        Generates a diffraction pattern database in parts, each in a separate
+        worker process. The orientation region enclosed by the vertices is split
+        into triangles with `split_vertices <pyemaps.diffract.dpgen_dec.html#pyemaps.diffract.dpgen_dec.split_vertices>`_,
+        and the database of each triangle is generated with 
+        `generateDPDB <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDPDB>`_
+        into a .bin file of its own.
+
+        The triangles are split at the angular midpoints of their edges in the
+        lattice of the crystal. res is the number of sampling points along the
+        radius of the stereo projection map, which does not depend on the region
+        the patterns are generated in, so each part is generated at res and the
+        parts together sample the region as one database at res does.
+
+        The parts are listed in a manifest file, output_fn + '.shards.json', which
+        records the crystal, controls and region of the database and whether each
+        part is complete. It is updated as each part completes, so that a run that 
+        fails or is stopped resumes with the parts that are not.
+
+        Databases are refined incrementally on their manifests: a part of the same
+        crystal, controls, resolution and triangle that is complete in the manifest
+        at output_fn or in a *base* manifest is reused rather than generated again.
+        A region extended with more vertices, or split so that some of its triangles
+        are those of an earlier database, only generates the parts that are missing.
+
+        .. code-block:: python
+
+            from pyemaps import Crystal, EMC
+
+            si = Crystal.from_builtin('Silicon')
+            ret, manifest = si.generateDPDBSharded(emc = EMC(), res = 200, 
+                                                   depth = 2, nworkers = 8)
+
+        :param depth: Number of times the region is split, into 4**depth triangles.
+        :type depth: int, optional
+
+        :param nworkers: Number of worker processes, defaults to the number of CPUs.
+        :type nworkers: int, optional
+
+        :param output_fn: database file name without extension, defaults to the crystal name
+                          and resolution in the data directory, so that reruns resume.
+        :type output_fn: string, optional
+
+        :param resume: whether to keep the complete parts of a manifest of the same database.
+        :type resume: bool, optional
+
+        :param progress: called with the number of complete parts and the number of parts 
+                         as each part completes, progress is printed if not set.
+        :type progress: callable, optional
+
+        :param base: manifest file names of earlier databases to reuse complete parts from.
+        :type base: list of strings, optional
+
+        Other parameters are those of generateDPDB.
+
+        :return: a tuple of a status code and manifest file name
+        :rtype: tuple of an integer and a string
+
+        .. note::
+
+            The .bin database format is private to the backend module, which has
+            no call to merge databases, so the parts are not merged into one file.
+            Each part is a database of its own triangle, listed in the manifest,
+            and is loaded and indexed with `indexImage <pyemaps.stackimg.html#pyemaps.stackimg.StackImage.indexImage>`_
+            as any database generated with generateDPDB.
+
+        """
+        import json
+        import multiprocessing as mp
+        import os
+        from ..ddiffs import _emc_record
+        from ..fileutils import compose_ofn
+
+        if (res > HIGH_RES) or (res < LOW_RES):
+            print(f'Resolution input {res} is out of range: ({LOW_RES}, {HIGH_RES})')
+            return -1, None
+
+        if not isinstance(depth, int) or depth < 0:
+            raise DPError('Number of region splits must be a non-negative integer')
+
+        if nworkers is None:
+            nworkers = os.cpu_count() or 1
+
+        if not isinstance(nworkers, int) or nworkers < 1:
+            raise DPError('Number of workers must be a positive integer')
+
+        try:
+            tris = split_vertices(vertices, depth, cell = self.cell.prepare())
+        except ValueError as e:
+            raise DPError(str(e)) from e
+
+        if output_fn is None:
+            output_fn = compose_ofn(f'{self.name}-dpdb-{res}', self.name, ty='dpdb')
+
+        manifest_fn = output_fn + DPDB_MANIFEST_EXT
+
+        # normalized to what is read back from the manifest
+        key = json.loads(json.dumps(dict(crystal = self._fingerprint(),
+                                         controls = _emc_record(emc),
+                                         xaxis = list(xa),
+                                         res = res,
+                                         vertices = [list(z) for z in vertices],
+                                         depth = depth), default = str))
+
+        if isinstance(base, str):
+            base = [base]
+
+        # complete parts to reuse, the ones of this database last to take precedence
+        sources = list(base or [])
+        if resume and os.path.exists(manifest_fn):
+            sources.append(manifest_fn)
+
+        complete = {}
+        for src in sources:
+            complete.update(_complete_parts(src))
+
+        # part files are named by part, so a reused file is never overwritten
+        # by another part of the same output_fn
+        shards = []
+        for t in tris:
+            pid = _part_id(key, t)
+            if pid in complete:
+                fn, size = complete[pid]
+                shards.append(dict(vertices = t, file = fn, size = size, status = 'done'))
+            else:
+                shards.append(dict(vertices = t, file = f'{output_fn}_{pid}.{DPDB_EXT}',
+                                   size = None, status = 'pending'))
+
+        manifest = dict(key = key, shards = shards)
+
+        todo = [i for i, sh in enumerate(shards) if sh['status'] != 'done']
+        ndone = len(shards) - len(todo)
+        _write_manifest(manifest_fn, manifest)
+
+        if progress is None:
+            progress = lambda n, total: print(f'Diffraction pattern database parts complete: {n}/{total}')
+
+        if todo:
+            tasks = [(i, shards[i]['vertices'], shards[i]['file'][:-len(DPDB_EXT)-1]) 
+                     for i in todo]
+
+            with mp.Pool(min(nworkers, len(todo)), initializer = _init_dpdb_worker,
+                         initargs = (self, emc, xa, res)) as pool:
+                for i, ret in pool.imap_unordered(_dpdb_shard, tasks):
+                    sh = shards[i]
+                    if ret == 0 and os.path.exists(sh['file']):
+                        sh['status'] = 'done'
+                        sh['size'] = os.path.getsize(sh['file'])
+                        ndone += 1
+                    else:
+                        sh['status'] = 'failed'
+
+                    _write_manifest(manifest_fn, manifest)
+                    progress(ndone, len(shards))
+
+        if ndone < len(shards):
+            print(f'Error generating {len(shards) - ndone} of {len(shards)} diffraction pattern database parts, '
+                  f'rerun to resume')
+            return -1, manifest_fn
+
+        return 0, manifest_fn
+
     target.generateDPDB = generateDPDB
+    target.generateDPDBSharded = generateDPDBSharded
     target._getDPDBFN = _getDPDBFN
 
     return target
\ No newline at end of file
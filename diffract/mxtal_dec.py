@@ -27,6 +27,7 @@ Date Created:       May 07, 2022
 '''
 def add_mxtal(target):
     from . import dif
+    from .dif_dec import controls_changed
     from .. import (ID_MATRIX, MLEN, DEF_CELLBOX, 
                    DEF_XZ, DEF_ORSHIFT, DEF_TRSHIFT,
                    DEF_LOCASPACE)
@@ -141,6 +142,7 @@ def add_mxtal(target):
         from . import mxtal as MX
 
         dif.initcontrols()
+        controls_changed()
         
         self.load(cty=1)
             
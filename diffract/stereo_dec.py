@@ -60,6 +60,7 @@ def add_stereo(target):
         
         """
         from . import dif, stereo
+        from .dif_dec import controls_changed
         
         import numpy as np
         from numpy import asfortranarray as farray
@@ -68,6 +69,7 @@ def add_stereo(target):
         from .. import DEF_XAXIS
 
         dif.initcontrols()
+        controls_changed()
         dif.setzone(zone[0], zone[1], zone[2])        
         
         if xa != DEF_XAXIS:
@@ -35,10 +35,12 @@ elif 'win32' in sys.platform:
 
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.collections import LineCollection
 import multiprocessing as mp
 
 from pyemaps import BlochListError
 from pyemaps import DP
+from .kdiffs import MIN_OPACITY, MAX_OPACITY
 
 from .fileutils import *
 
@@ -145,40 +147,22 @@ class DifPlotter:
         iax.set_aspect('equal')
 
         if dp.nklines > 0:
-            intlist = [k.intensity for k in dp.klines]
-            lint, hint = min(intlist), max(intlist)
-
-            for kl in dp.klines:
-                
-                if not kshow:
-                    opacity = 0.0 
-                else: 
-                    opacity = kl.calOpacity(lint,hint)
-
-                kl *=PLOT_MULTIPLIER
-                xx = [kl.pt1.x, kl.pt2.x]
-                yy = [kl.pt1.y, kl.pt2.y]
-            
-                iax.plot(xx, yy, 'k', alpha=opacity, linewidth=1.75)
+            kls = dp.klines_arr
+            opacity = _lineOpacity(kls[:, 4]) if kshow else np.zeros(len(kls))
+            _plotLines(iax, kls, opacity)
         
         if dp.nhlines > 0:
-            intlist = [h.intensity for h in dp.hlines]
-            lint, hint = min(intlist), max(intlist)
-
-            for hl in dp.hlines:
-                opacity = hl.calOpacity(lint, hint)
-                hl *=PLOT_MULTIPLIER
-                xx = [hl.pt1.x, hl.pt2.x]
-                yy = [hl.pt1.y, hl.pt2.y]
-                iax.plot(xx, yy, 'k', alpha=opacity, linewidth=1.75)
-
-        for d in dp.disks:
-            d *= PLOT_MULTIPLIER
-            centre = (d.c.x, d.c.y)
+            hls = dp.hlines_arr
+            _plotLines(iax, hls, _lineOpacity(hls[:, 4]))
+
+        bFill = True if mode == 1 else False
+        dks = dp.disks_arr
+        dks[:, 0:3] *= PLOT_MULTIPLIER
+        for x, y, r, i1, i2, i3 in dks.tolist():
+            centre = (x, y)
             
-            bFill = True if mode == 1 else False
             dis = patches.Circle(centre, 
-                                d.r, 
+                                r, 
                                 fill=bFill, 
                                 linewidth = 0.5, 
                                 alpha=1.0, 
@@ -187,7 +171,7 @@ class DifPlotter:
         
             if ishow:
                 iax.text(centre[0],centre[1], 
-                        str(d.idx),
+                        '{} {} {}'.format(int(i1), int(i2), int(i3)),
                         {'color': 'red', 'fontsize': 8},
                         horizontalalignment='center',
                         verticalalignment='bottom' if mode == 1 else 'center')
@@ -645,6 +629,32 @@ def _getGridPos(i, nCols = 3):
 
     return nrows, ncols
 
+def _lineOpacity(ints):
+
+    '''
+    Line opacities from an array of intensities, as Line.calOpacity does
+    for one line.
+
+    '''
+    l, h = ints.min(), ints.max()
+    if h == l:
+        return np.full(len(ints), MAX_OPACITY)
+
+    return MIN_OPACITY + ((ints - l)*(MAX_OPACITY - MIN_OPACITY))/(h - l)
+
+def _plotLines(iax, lines, opacity):
+
+    '''
+    Plots an array of lines in one collection instead of one plot
+    per line.
+
+    '''
+    segs = lines[:, 0:4].reshape(-1, 2, 2) * PLOT_MULTIPLIER
+    clrs = np.zeros((len(lines), 4))
+    clrs[:, 3] = opacity
+
+    iax.add_collection(LineCollection(segs, colors = clrs, linewidths = 1.75))
+
 # image display for stem4d module
 
 
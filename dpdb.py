@@ -0,0 +1,818 @@
+'''
+.. This file is part of pyEMAPS
+
+DP database module keeps kinematic diffraction patterns of a crystal
+over a region of orientations in numpy arrays on disk, for diffraction
+pattern search and indexing in Python.
+
+The orientations of a database are the zone axes on a grid over a
+region enclosed by 3 or 4 zone axis vertices, each pattern is computed
+on its zone axis exactly. The database keeps a manifest of the crystal,
+controls and regions it was built for, so that going to a finer grid or
+a larger region only adds the patterns of the zone axes not in it yet.
+
+The arrays of a database are memory mapped when it is opened, so opening
+takes no longer than reading its manifest, and processes on one node
+opening the same database share its pages in the operating system cache.
+`DPDatabase.open <pyemaps.dpdb.html#pyemaps.dpdb.DPDatabase.open>`_ keeps
+opened databases resident in the process for repeated indexing calls.
+
+These databases are separate from the .bin databases of
+`generateDPDB <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDPDB>`_,
+whose format is private to the backend and which are refined incrementally
+on their manifests with `generateDPDBSharded <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDPDBSharded>`_.
+Their resolution is also counted differently: *res* here is the number of
+grid steps along each region edge in zone axis index space, not the number 
+of stereo projection sampling points along the radius of *LOW_RES* to 
+*HIGH_RES*. Patterns are kept by integer zone axis, and only a grid in index
+space is contained in the grids of its multiples, which is what makes going
+to a finer grid add patterns rather than replace them.
+
+.. ----
+
+.. pyEMAPS is free software. You can redistribute it and/or modify
+.. it under the terms of the GNU General Public License as published
+.. by the Free Software Foundation, either version 3 of the License,
+.. or (at your option) any later version..
+
+.. pyEMAPS is distributed in the hope that it will be useful,
+.. but WITHOUT ANY WARRANTY; without even the implied warranty of
+.. MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+.. GNU General Public License for more details.
+
+.. You should have received a copy of the GNU General Public License
+.. along with pyEMAPS.  If not, see `<https://www.gnu.org/licenses/>`_.
+
+.. Contact supprort@emlabsoftware.com for any questions and comments.
+
+.. ----
+
+.. Author:     EMLab Solutions, Inc.
+.. Date:       October 18, 2026
+
+'''
+
+import heapq
+import json
+import os
+
+import numpy as np
+
+from . import EMC, EMCGrid, DPError
+
+DPDB_FORMAT = 1
+#int: version of the DP database format
+
+DEF_DPDB_VERTICES = ((0,0,1), (1,1,1), (0,1,1))
+#tuple: default zone axis vertices of the orientation region
+
+DEF_DPDB_RES = 20
+#int: default number of grid steps along each edge of the orientation region, in zone axis index space
+
+DPDB_MANIFEST = 'manifest.json'
+#str: name of the manifest file in a DP database directory
+
+DPDB_DESCRIPTOR_PEAKS = 8
+#int: number of shortest diffraction vectors a pattern descriptor is made of
+
+DPDB_DESCRIPTOR_BINS = 16
+#int: number of bins of each of the length ratio and angle histograms of a descriptor
+
+DPDB_LEAF_SIZE = 256
+#int: largest number of patterns in a leaf of a descriptor index
+
+DPDB_BRUTE_FORCE = 50000
+#int: largest number of patterns a descriptor index searches by a full scan instead of its KD-tree
+
+DPDB_TOP_K = 20
+#int: default number of candidate patterns from a descriptor index matched in full
+
+DPDB_MATCH_TOL = 0.05
+#float: largest distance of matched peaks, relative to the shortest experimental vector
+
+DPDB_MATCH_DTYPE = np.dtype([('pattern', np.int64),
+                             ('rotation', np.float64),
+                             ('scale', np.float64),
+                             ('correlation', np.float64),
+                             ('nmatched', np.int32)])
+#numpy.dtype: candidate match of an experimental pattern to a database pattern
+
+# arrays of a database, each in a .npy file of its name
+_DPDB_ARRAYS = ('zones', 'offsets', 'peaks', 'hkls', 'descriptors')
+
+# databases opened with DPDatabase.open, by directory
+_open_dbs = {}
+
+def zone_grid(vertices = DEF_DPDB_VERTICES, res = DEF_DPDB_RES):
+    '''
+    Zone axes on a grid over the region enclosed by 3 or 4 zone axis vertices.
+
+    The zone axes of a triangle A, B, C are i*A + j*B + k*C with i + j + k = res,
+    divided by their greatest common divisor, and a region of 4 vertices is
+    made of 2 triangles. A grid of res is contained in the grid of any multiple
+    of res over the same region.
+
+    res counts grid steps in zone axis index space, unlike the resolution of
+    `generateDPDB <pyemaps.crystals.html#pyemaps.crystals.Crystal.generateDPDB>`_
+    in stereo projection points along the radius, so the two do not compare.
+
+    :param vertices: 3 or 4 zone axis indexes.
+    :type vertices: list of three integer tuples, optional
+
+    :param res: Number of grid steps along each edge.
+    :type res: int, optional
+
+    :return: zone axes without repeats, shape (n, 3)
+    :rtype: numpy.ndarray
+
+    '''
+    if not isinstance(res, int) or res < 1:
+        raise DPError('DP database resolution must be a positive integer')
+
+    verts = np.array(vertices, dtype=np.int64)
+    if verts.shape == (3, 3):
+        tris = [verts]
+    elif verts.shape == (4, 3):
+        tris = [verts[[0, 1, 2]], verts[[0, 2, 3]]]
+    else:
+        raise DPError('Orientation region must have 3 or 4 zone axis vertices')
+
+    i, j = np.meshgrid(np.arange(res + 1), np.arange(res + 1), indexing = 'ij')
+    keep = i + j <= res
+    w = np.stack((i[keep], j[keep], res - i[keep] - j[keep]), axis = 1)
+
+    zones = np.concatenate([w @ t for t in tris])
+    g = np.gcd.reduce(np.abs(zones), axis = 1)
+    if np.any(g == 0):
+        raise DPError('Orientation region must not contain zone axis (0,0,0)')
+
+    zones //= g[:, None]
+
+    _, first = np.unique(zones, axis = 0, return_index = True)
+    return zones[np.sort(first)]
+
+def _soft_histogram(v, lo, hi, bins):
+    '''
+    internal - histogram of v over [lo, hi] with each value shared
+    linearly between its two nearest bin centers, so that values
+    moving across a bin edge change it gradually
+
+    '''
+    x = np.clip((v - lo)/(hi - lo)*bins - 0.5, 0.0, bins - 1.0)
+    i = np.minimum(np.floor(x).astype(np.int64), bins - 2)
+    w = x - i
+
+    return (np.bincount(i, weights = 1.0 - w, minlength = bins) +
+            np.bincount(i + 1, weights = w, minlength = bins))
+
+def peak_descriptor(xy):
+    '''
+    Rotation and scale invariant descriptor of a diffraction pattern from
+    its peak positions relative to the transmitted beam.
+
+    The descriptor is made of the shortest DPDB_DESCRIPTOR_PEAKS vectors
+    of the pattern: the histograms of the length ratio (shorter over
+    longer) and of the angle of each pair of them, each normalized to a
+    sum of 1. A missing or extra peak only changes the pairs it is in.
+    Experimental peak positions in image pixels and database peak
+    positions have the same descriptor for the same orientation.
+
+    :param xy: Peak positions relative to the transmitted beam, shape (k, 2).
+    :type xy: numpy.ndarray, required
+
+    :return: descriptor, shape (2*DPDB_DESCRIPTOR_BINS,)
+    :rtype: numpy.ndarray
+
+    '''
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    r = np.hypot(xy[:, 0], xy[:, 1])
+
+    keep = r > 0
+    xy, r = xy[keep], r[keep]
+
+    desc = np.zeros(2*DPDB_DESCRIPTOR_BINS, dtype=np.float32)
+    if len(r) < 2:
+        return desc
+
+    order = np.argsort(r, kind = 'stable')[:DPDB_DESCRIPTOR_PEAKS]
+    xy, r = xy[order], r[order]
+
+    # r is sorted, so r[i] <= r[j]
+    i, j = np.triu_indices(len(r), k = 1)
+    ratios = _soft_histogram(r[i]/r[j], 0.0, 1.0, DPDB_DESCRIPTOR_BINS)
+
+    u = xy/r[:, None]
+    angles = _soft_histogram(np.arccos(np.clip(np.sum(u[i]*u[j], axis = 1), -1.0, 1.0)),
+                             0.0, np.pi, DPDB_DESCRIPTOR_BINS)
+
+    desc[:DPDB_DESCRIPTOR_BINS] = ratios/ratios.sum()
+    desc[DPDB_DESCRIPTOR_BINS:] = angles/angles.sum()
+
+    return desc
+
+class DescriptorIndex:
+    '''
+    KD-tree of pattern descriptors for finding the database patterns
+    with descriptors nearest to that of an experimental pattern, in
+    about logarithmic time of the number of patterns.
+
+    Databases of up to *brute_force* patterns are searched by a full scan
+    of one matrix product instead, which is faster than the tree walk for
+    them.
+
+    '''
+    def __init__(self, descriptors, leaf_size = DPDB_LEAF_SIZE,
+                 brute_force = DPDB_BRUTE_FORCE):
+        '''
+        :param descriptors: Pattern descriptors, shape (n, d).
+        :type descriptors: numpy.ndarray, required
+
+        :param leaf_size: Largest number of descriptors in a leaf.
+        :type leaf_size: int, optional
+
+        :param brute_force: Largest number of descriptors searched by a full scan instead of the tree.
+        :type brute_force: int, optional
+
+        '''
+        if not isinstance(leaf_size, int) or leaf_size < 1:
+            raise DPError('Descriptor index leaf size must be a positive integer')
+
+        if not isinstance(brute_force, int) or brute_force < 0:
+            raise DPError('Descriptor index full scan size must be a non negative integer')
+
+        self._data = np.ascontiguousarray(descriptors, dtype=np.float64)
+        if self._data.ndim != 2:
+            raise DPError('Descriptors must be an array of shape (n, d)')
+
+        n = len(self._data)
+        self._perm = np.arange(n)
+        self._brute_force = brute_force
+
+        # squared norms, for distances by one matrix product per scan
+        self._sq = np.einsum('ij,ij->i', self._data, self._data)
+
+        # node arrays: descriptor range in _perm, children and bounding box
+        self._start, self._end = [], []
+        self._left, self._right = [], []
+        self._lo, self._hi = [], []
+
+        if n > brute_force:
+            stack = [(self._node(0, n), 0, n)]
+            while stack:
+                node, s, e = stack.pop()
+                if e - s <= leaf_size:
+                    continue
+
+                d = self._hi[node] - self._lo[node]
+                dim = int(np.argmax(d))
+                if d[dim] == 0:
+                    continue
+
+                idx = self._perm[s:e]
+                mid = (e - s)//2
+                self._perm[s:e] = idx[np.argpartition(self._data[idx, dim], mid)]
+                m = s + mid
+
+                self._left[node] = self._node(s, m)
+                self._right[node] = self._node(m, e)
+                stack.append((self._left[node], s, m))
+                stack.append((self._right[node], m, e))
+
+        self._lo = np.array(self._lo).reshape(-1, self._data.shape[1])
+        self._hi = np.array(self._hi).reshape(-1, self._data.shape[1])
+
+    def _node(self, s, e):
+        '''
+        internal - adds a leaf over _perm[s:e], returns its number
+
+        '''
+        pts = self._data[self._perm[s:e]]
+        self._start.append(s)
+        self._end.append(e)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._lo.append(pts.min(axis = 0))
+        self._hi.append(pts.max(axis = 0))
+
+        return len(self._start) - 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def _box_dist(self, node, q):
+        '''
+        internal - squared distance from q to the bounding box of node
+
+        '''
+        d = np.maximum(self._lo[node] - q, 0.0) + np.maximum(q - self._hi[node], 0.0)
+
+        return float(d @ d)
+
+    def query(self, q, k = DPDB_TOP_K):
+        '''
+        Finds the k descriptors nearest to q.
+
+        :param q: Descriptor, shape (d,).
+        :type q: numpy.ndarray, required
+
+        :param k: Number of nearest descriptors.
+        :type k: int, optional
+
+        :return: indexes of the nearest descriptors and their distances, nearest first
+        :rtype: tuple of numpy.ndarray
+
+        '''
+        if not isinstance(k, int) or k < 1:
+            raise DPError('Number of nearest descriptors must be a positive integer')
+
+        q = np.asarray(q, dtype=np.float64)
+        if q.shape != self._data.shape[1:]:
+            raise DPError(f'Descriptor must be of shape {self._data.shape[1:]}')
+
+        if len(self) <= self._brute_force:
+            return self._nearest(q, k)
+
+        # nearest found so far, at most k of them, and the current largest distance
+        bi = np.empty(0, dtype=np.int64)
+        bd = np.empty(0, dtype=np.float64)
+        worst = np.inf
+
+        nodes = [(self._box_dist(0, q), 0)]
+        while nodes:
+            dist, node = heapq.heappop(nodes)
+            if len(bi) == k and dist >= worst:
+                break
+
+            if self._left[node] >= 0:
+                for c in (self._left[node], self._right[node]):
+                    heapq.heappush(nodes, (self._box_dist(c, q), c))
+                continue
+
+            idx = self._perm[self._start[node]:self._end[node]]
+            bi = np.concatenate((bi, idx))
+            bd = np.concatenate((bd, self._dist(idx, q)))
+            if len(bi) > k:
+                keep = np.argpartition(bd, k - 1)[:k]
+                bi, bd = bi[keep], bd[keep]
+            if len(bi) == k:
+                worst = bd.max()
+
+        return self._sorted(bi, bd)
+
+    def _dist(self, idx, q):
+        '''
+        internal - squared distances from q to the descriptors of idx
+
+        '''
+        return np.maximum(self._sq[idx] - 2.0*(self._data[idx] @ q) + q @ q, 0.0)
+
+    def _nearest(self, q, k):
+        '''
+        internal - the k descriptors nearest to q by a full scan
+
+        '''
+        idx = np.arange(len(self))
+        dd = np.maximum(self._sq - 2.0*(self._data @ q) + q @ q, 0.0)
+        if len(idx) > k:
+            keep = np.argpartition(dd, k - 1)[:k]
+            idx, dd = idx[keep], dd[keep]
+
+        return self._sorted(idx, dd)
+
+    @staticmethod
+    def _sorted(idx, dd):
+        '''
+        internal - indexes and distances by squared distance, then index
+
+        '''
+        order = np.lexsort((idx, dd))
+
+        return idx[order].astype(np.int64), np.sqrt(dd[order])
+
+def _match_peaks(ze, zp, tol):
+    '''
+    internal - best similarity transform a of database peaks zp onto
+    experimental peaks ze, both complex, with the number of experimental
+    peaks within tol*|ze[0]| of a transformed database peak.
+
+    The transform is anchored on each of the shortest two experimental
+    vectors taken as each of the shortest database vectors, and refined
+    by least squares on the peaks it matches.
+
+    '''
+    anchors = ze[:2, None]/zp[None, :DPDB_DESCRIPTOR_PEAKS]
+    a = anchors.ravel()
+
+    # (transforms, experimental, database)
+    d = np.abs(ze[None, :, None] - a[:, None, None]*zp[None, None, :])
+    near = np.argmin(d, axis = 2)
+    ok = np.take_along_axis(d, near[:, :, None], axis = 2)[:, :, 0] <= tol*abs(ze[0])
+
+    t = int(np.argmax(ok.sum(axis = 1)))
+    ok, near = ok[t], near[t]
+    if ok.sum() < 2:
+        return a[t], int(ok.sum())
+
+    p, e = zp[near[ok]], ze[ok]
+    a = np.sum(np.conj(p)*e)/np.sum(np.abs(p)**2)
+
+    d = np.abs(ze[:, None] - a*zp[None, :])
+
+    return a, int((d.min(axis = 1) <= tol*abs(ze[0])).sum())
+
+def _controls_record(emc):
+    '''
+    internal - controls of emc shared by all patterns of a database,
+    as read back from the manifest
+
+    '''
+    from .ddiffs import _emc_record
+
+    rec = _emc_record(emc)
+    rec.pop('zone', None)
+
+    return json.loads(json.dumps(rec, default = str))
+
+def _save_array(path, name, arr):
+    '''
+    internal - writes a database array, replacing its file only once
+    it is complete
+
+    '''
+    fn = os.path.join(path, name + '.npy')
+    tmpfn = f'{fn}.{os.getpid()}.tmp'
+    with open(tmpfn, 'wb') as f:
+        np.save(f, arr)
+
+    os.replace(tmpfn, fn)
+
+class DPDatabase:
+    '''
+    Kinematic diffraction patterns of a crystal over orientation regions,
+    stored in a directory of numpy arrays with a manifest:
+
+    * **zones**: zone axis of each pattern, shape (n, 3)
+    * **offsets**: start of the peaks of each pattern, shape (n+1,)
+    * **peaks**: diffraction peak positions relative to the transmitted beam, shape (m, 2)
+    * **hkls**: Miller indexes of the peaks, shape (m, 3)
+    * **descriptors**: `peak_descriptor <pyemaps.dpdb.html#pyemaps.dpdb.peak_descriptor>`_ of each pattern, shape (n, 2*DPDB_DESCRIPTOR_BINS)
+
+    .. code-block:: python
+
+        from pyemaps import Crystal
+        from pyemaps.dpdb import DPDatabase
+
+        si = Crystal.from_builtin('Silicon')
+
+        db = DPDatabase.build(si, 'si_dpdb', res = 10)
+
+        # later, for another sample batch: only the new zone axes are simulated
+        db = DPDatabase.build(si, 'si_dpdb', res = 20)
+
+        # in indexing code: memory mapped once per process
+        db = DPDatabase.open('si_dpdb')
+
+    '''
+    def __init__(self, path, mmap = True):
+        '''
+        Opens the DP database in directory path.
+
+        :param path: DP database directory.
+        :type path: str, required
+
+        :param mmap: Whether to memory map the database arrays instead of reading them.
+        :type mmap: bool, optional
+
+        '''
+        mode = 'r' if mmap else None
+        try:
+            with open(os.path.join(path, DPDB_MANIFEST)) as f:
+                manifest = json.load(f)
+
+            fmt = manifest.get('format')
+            if fmt != DPDB_FORMAT:
+                raise DPError(f'Unsupported DP database format: {fmt}')
+
+            arrays = {k: np.load(os.path.join(path, k + '.npy'), mmap_mode = mode)
+                      for k in _DPDB_ARRAYS}
+
+        except (OSError, ValueError) as e:
+            raise DPError(f'Error reading DP database {path}: {e}') from e
+
+        # arrays are only appended to, and an update interrupted before its
+        # manifest was written leaves them longer than the manifest lists
+        n, m = manifest['npatterns'], manifest['npeaks']
+        if len(arrays['zones']) < n or len(arrays['peaks']) < m or len(arrays['hkls']) < m or \
+           len(arrays['descriptors']) < n:
+            raise DPError(f'DP database {path} is incomplete')
+
+        arrays['zones'] = arrays['zones'][:n]
+        arrays['offsets'] = arrays['offsets'][:n + 1]
+        arrays['peaks'] = arrays['peaks'][:m]
+        arrays['hkls'] = arrays['hkls'][:m]
+        arrays['descriptors'] = arrays['descriptors'][:n]
+
+        self._path = path
+        self._manifest = manifest
+        self._arrays = arrays
+        self._index = None
+
+    @classmethod
+    def open(cls, path):
+        '''
+        Opens the DP database in directory path once per process. Later
+        calls return the database already opened, until it is changed
+        on disk.
+
+        :param path: DP database directory.
+        :type path: str, required
+
+        :return: DP database
+        :rtype: pyemaps.dpdb.DPDatabase
+
+        '''
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(os.path.join(path, DPDB_MANIFEST))
+        except OSError as e:
+            raise DPError(f'Error reading DP database {path}: {e}') from e
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        if key in _open_dbs and _open_dbs[key][0] == stamp:
+            return _open_dbs[key][1]
+
+        db = cls(path)
+        _open_dbs[key] = (stamp, db)
+
+        return db
+
+    @classmethod
+    def build(cls, cr,
+                   path,
+                   vertices = DEF_DPDB_VERTICES,
+                   res = DEF_DPDB_RES,
+                   emc = None,
+                   mode = None,
+                   dsize = None,
+                   pool = None):
+        '''
+        Builds the DP database of crystal cr over a region in directory path,
+        or adds the region to the database already there. Only patterns of
+        zone axes not in the database are simulated.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :param path: DP database directory, created if it does not exist.
+        :type path: str, required
+
+        :param vertices: 3 or 4 zone axis vertices of the orientation region.
+        :type vertices: list of three integer tuples, optional
+
+        :param res: Number of grid steps along each region edge, see
+                    `zone_grid <pyemaps.dpdb.html#pyemaps.dpdb.zone_grid>`_.
+        :type res: int, optional
+
+        :param emc: Microscope controls of all patterns, the zone axis is taken from the region.
+        :type emc: pyemaps.EMC, optional
+
+        :param mode: Mode of kinemetic diffraction - normal(1) or CBED(2).
+        :type mode: int, optional
+
+        :param dsize: diffractted beam size, only applied to CBED mode.
+        :type dsize: float, optional
+
+        :param pool: Pool of worker processes to simulate the patterns in.
+        :type pool: pyemaps.parallel.DiffractionPool, optional
+
+        :return: DP database
+        :rtype: pyemaps.dpdb.DPDatabase
+
+        :raises: DPError, if the database in path is of another crystal or controls
+
+        '''
+        from .crystals import Crystal
+
+        if not isinstance(cr, Crystal):
+            raise DPError('DP database must be built for a Crystal object')
+
+        if emc is None:
+            emc = EMC()
+
+        if not isinstance(emc, EMC):
+            raise DPError('Microscope controls must be an EMControl object')
+
+        zones = zone_grid(vertices, res)
+        key = dict(crystal = cr._fingerprint(),
+                   controls = _controls_record(emc),
+                   mode = mode,
+                   dsize = dsize)
+
+        # mapped files can not be replaced on some platforms
+        _open_dbs.pop(os.path.abspath(path), None)
+
+        if os.path.exists(os.path.join(path, DPDB_MANIFEST)):
+            db = cls(path, mmap = False)
+            manifest = db._manifest
+            if manifest['key'] != key:
+                raise DPError(f'DP database {path} is of another crystal or controls')
+
+            arrays = dict(db._arrays)
+        else:
+            os.makedirs(path, exist_ok = True)
+            manifest = dict(format = DPDB_FORMAT, name = cr.name, key = key, regions = [],
+                            npatterns = 0, npeaks = 0)
+            arrays = dict(zones = np.zeros((0, 3), dtype=np.int32),
+                          offsets = np.zeros(1, dtype=np.int64),
+                          peaks = np.zeros((0, 2), dtype=np.float32),
+                          hkls = np.zeros((0, 3), dtype=np.int16),
+                          descriptors = np.zeros((0, 2*DPDB_DESCRIPTOR_BINS), dtype=np.float32))
+
+        have = {tuple(z) for z in arrays['zones'].tolist()}
+        new = np.array([z for z in zones.tolist() if tuple(z) not in have],
+                       dtype=np.int64).reshape(-1, 3)
+
+        if len(new) > 0:
+            grid = EMCGrid(tilt = emc.tilt, zone = new, defl = emc.defl,
+                           vt = emc.vt, cl = emc.cl, simc = emc.simc, xaxis = emc.xaxis)
+
+            if pool is not None:
+                dpl = pool.generateDP(cr, grid, mode = mode, dsize = dsize)
+            else:
+                dpl = cr.generateDPBatch(grid, mode = mode, dsize = dsize)
+
+            peaks, hkls, counts, descs = [], [], [], []
+            for _, dp in dpl.diffList:
+                disks = dp.disks_arr
+                hkl = np.rint(disks[:, 3:6]).astype(np.int16)
+
+                # positions relative to the transmitted beam
+                center = np.all(hkl == 0, axis = 1)
+                xy = disks[:, 0:2] - (disks[center, 0:2][0] if center.any() else 0.0)
+
+                peaks.append(xy[~center].astype(np.float32))
+                hkls.append(hkl[~center])
+                counts.append(int((~center).sum()))
+                descs.append(peak_descriptor(xy[~center]))
+
+            arrays['zones'] = np.concatenate((arrays['zones'], new.astype(np.int32)))
+            arrays['offsets'] = np.concatenate((arrays['offsets'],
+                                                arrays['offsets'][-1] + np.cumsum(counts)))
+            arrays['peaks'] = np.concatenate([arrays['peaks']] + peaks)
+            arrays['hkls'] = np.concatenate([arrays['hkls']] + hkls)
+            arrays['descriptors'] = np.concatenate((arrays['descriptors'], np.stack(descs)))
+
+            for k in _DPDB_ARRAYS:
+                _save_array(path, k, arrays[k])
+
+        manifest['regions'].append(dict(vertices = [list(v) for v in vertices],
+                                        res = res,
+                                        added = len(new)))
+        manifest['npatterns'] = len(arrays['zones'])
+        manifest['npeaks'] = len(arrays['peaks'])
+
+        # the manifest is written last, and lists only complete arrays
+        tmpfn = os.path.join(path, f'{DPDB_MANIFEST}.{os.getpid()}.tmp')
+        with open(tmpfn, 'w') as f:
+            json.dump(manifest, f, indent = 1)
+
+        os.replace(tmpfn, os.path.join(path, DPDB_MANIFEST))
+
+        return cls(path)
+
+    def close(self):
+        '''
+        Releases the memory mapped arrays of the database, and its
+        resident copy from `open <pyemaps.dpdb.html#pyemaps.dpdb.DPDatabase.open>`_.
+
+        '''
+        key = os.path.abspath(self._path)
+        if key in _open_dbs and _open_dbs[key][1] is self:
+            del _open_dbs[key]
+
+        self._arrays = {}
+        self._index = None
+
+    @property
+    def path(self):
+        '''
+        DP database directory
+
+        '''
+        return self._path
+
+    @property
+    def name(self):
+        '''
+        Name of the crystal of the database
+
+        '''
+        return self._manifest['name']
+
+    @property
+    def regions(self):
+        '''
+        Orientation regions the database was built for, with the number of
+        patterns each added
+
+        '''
+        return list(self._manifest['regions'])
+
+    @property
+    def zones(self):
+        '''
+        Zone axis of each pattern, shape (n, 3)
+
+        '''
+        return self._arrays['zones']
+
+    @property
+    def descriptors(self):
+        '''
+        `peak_descriptor <pyemaps.dpdb.html#pyemaps.dpdb.peak_descriptor>`_ of
+        each pattern, shape (n, 2*DPDB_DESCRIPTOR_BINS)
+
+        '''
+        return self._arrays['descriptors']
+
+    @property
+    def index(self):
+        '''
+        `Descriptor index <pyemaps.dpdb.html#pyemaps.dpdb.DescriptorIndex>`_
+        of the patterns, built on first use and kept with the database
+
+        '''
+        if self._index is None:
+            self._index = DescriptorIndex(self._arrays['descriptors'])
+
+        return self._index
+
+    def __len__(self):
+        return len(self._arrays['zones'])
+
+    def peaks(self, i):
+        '''
+        Diffraction peaks of pattern i.
+
+        :return: peak positions relative to the transmitted beam, shape (k, 2),
+                 and their Miller indexes, shape (k, 3)
+        :rtype: tuple of numpy.ndarray
+
+        '''
+        s, e = self._arrays['offsets'][i], self._arrays['offsets'][i + 1]
+
+        return self._arrays['peaks'][s:e], self._arrays['hkls'][s:e]
+
+    def match(self, xy, k = DPDB_TOP_K, tol = DPDB_MATCH_TOL):
+        '''
+        Matches experimental diffraction peaks to the patterns of the database.
+
+        The k patterns with descriptors nearest to that of the experimental
+        peaks are taken from the descriptor index, and each is fitted to
+        the peaks by a rotation and scale of the database pattern. The
+        correlation of a fit is the number of matched peaks over the
+        geometric mean of the numbers of experimental peaks and of database
+        peaks within the experimental radius.
+
+        :param xy: Experimental peak positions relative to the transmitted beam, shape (k, 2).
+        :type xy: numpy.ndarray, required
+
+        :param k: Number of candidate patterns matched in full.
+        :type k: int, optional
+
+        :param tol: Largest distance of matched peaks, relative to the shortest experimental vector.
+        :type tol: float, optional
+
+        :return: candidate matches of DPDB_MATCH_DTYPE, highest correlation first
+        :rtype: numpy.ndarray
+
+        '''
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        ze = xy[:, 0] + 1j*xy[:, 1]
+        ze = ze[np.argsort(np.abs(ze), kind = 'stable')]
+        ze = ze[np.abs(ze) > 0]
+        if len(ze) < 3:
+            raise DPError('At least 3 experimental peaks are needed for matching')
+
+        cands, _ = self.index.query(peak_descriptor(xy), k = k)
+
+        rmax = np.abs(ze[-1])*(1.0 + tol)
+        out = np.zeros(len(cands), dtype=DPDB_MATCH_DTYPE)
+        for n, c in enumerate(cands.tolist()):
+            p, _ = self.peaks(c)
+            zp = p[:, 0].astype(np.float64) + 1j*p[:, 1]
+            zp = zp[np.argsort(np.abs(zp), kind = 'stable')]
+
+            out[n]['pattern'] = c
+            if len(zp) == 0:
+                continue
+
+            a, nm = _match_peaks(ze, zp, tol)
+            ninside = max(int((np.abs(a*zp) <= rmax).sum()), 1)
+
+            out[n]['rotation'] = np.degrees(np.angle(a)) % 360.0
+            out[n]['scale'] = np.abs(a)
+            out[n]['correlation'] = nm/np.sqrt(len(ze)*max(ninside, nm))
+            out[n]['nmatched'] = nm
+
+        return out[np.argsort(-out['correlation'], kind = 'stable')]
@@ -100,6 +100,7 @@ Microscope control constants and default values
 
 from . import  EMCError
 import math
+import numpy as np
 EMC_TOLERANCE = 1.0e-07
 
 sdefault = ' [**default**]'
@@ -1014,4 +1015,367 @@ class EMControl:
             retdict[k] = DEF_EMC[k]['defval']
 
 
-        return retdict
\ No newline at end of file
+        return retdict
+
+EMC_QUANTUM = 1.0e-04
+#float: cell size of quantized control values in EMCIndex, much larger than EMC_TOLERANCE
+
+EMC_REL_TOLERANCE = 1.0e-09
+#float: default relative tolerance of math.isclose in EMControl equality
+
+def _hashable(v):
+    '''internal - hashable form of a control value'''
+    if isinstance(v, (list, tuple)):
+        return tuple(_hashable(x) for x in v)
+    
+    return v
+
+class EMCIndex:
+    '''
+    Tolerance-aware index of EMControl objects to their positions in a list,
+    used by diffraction pattern and Bloch image lists for lookups by controls.
+
+    Controls are hashed by zone, the integer simulation controls and the 
+    tilt, defl, vt and cl values quantized into cells of EMC_QUANTUM. A lookup
+    takes one hash probe, or a few when a value is within its tolerance of 
+    a cell boundary, and candidates are confirmed with EMControl equality.
+
+    '''
+    def __init__(self):
+
+        self._buckets = {}
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @staticmethod
+    def _fields(emc):
+        '''internal - exact and floating point control values of emc'''
+
+        sc = emc.simc
+        exact = _hashable((emc.zone, sc.intensity, sc.gctl, sc.zctl, sc.sth, sc.sampling))
+        floats = (*emc.tilt, *emc.defl, emc.vt, emc.cl)
+
+        return exact, floats
+
+    def add(self, emc, pos):
+        '''
+        Adds emc at position pos of the indexed list.
+
+        '''
+        if not isinstance(emc, EMControl):
+            raise EMCError('Only EMControl objects can be indexed')
+
+        exact, floats = self._fields(emc)
+        key = (exact, tuple(math.floor(v / EMC_QUANTUM) for v in floats))
+
+        self._buckets.setdefault(key, []).append((emc, pos))
+        self._n += 1
+
+    def find(self, emc):
+        '''
+        Positions of all indexed controls equal to emc, in list order.
+
+        '''
+        import itertools
+
+        if not isinstance(emc, EMControl):
+            raise EMCError('Lookup must be done with an EMControl object')
+
+        exact, floats = self._fields(emc)
+
+        # EMControl equality also takes the default relative tolerance of
+        # math.isclose, twice the larger one covers rounding in the quantization
+        cells = []
+        for v in floats:
+            tol = 2.0 * max(EMC_TOLERANCE, EMC_REL_TOLERANCE * abs(v))
+            cells.append(range(math.floor((v - tol) / EMC_QUANTUM), 
+                               math.floor((v + tol) / EMC_QUANTUM) + 1))
+
+        found = []
+        for c in itertools.product(*cells):
+            for e, pos in self._buckets.get((exact, c), ()):
+                if e == emc:
+                    found.append(pos)
+
+        return sorted(found) if len(found) > 1 else found
+
+GRID_BLOCK = 4096
+#int: number of EMCGrid rows converted to python values at a time
+
+def _column(v, name, width, dtype):
+    '''
+    internal - validated control column of shape (n, width), or (n,) 
+    if width is 0. A single value is repeated for all rows, n is None
+    when its number of rows is not known yet.
+
+    '''
+    try:
+        a = np.asarray(v)
+        if dtype is int:
+            if a.dtype.kind not in 'iu':
+                raise TypeError
+            a = a.astype(np.int64)
+        else:
+            if a.dtype.kind not in 'iuf':
+                raise TypeError
+            a = a.astype(np.float64)
+
+    except (TypeError, ValueError):
+        kind = 'integers' if dtype is int else 'numbers'
+        raise EMCError(f'Values of {name} must be {kind}')
+
+    single = a.ndim == (1 if width else 0)
+    if not single and (a.ndim != (2 if width else 1) or (width and a.shape[1] != width)):
+        raise EMCError(f'Values of {name} must be a single value or a column of {width or 1}-element values')
+
+    if dtype is float and not np.all(np.isfinite(a)):
+        raise EMCError(f'Values of {name} must be finite')
+
+    if single:
+        return a, None
+
+    return a, a.shape[0]
+
+class EMCGrid:
+    '''
+    Microscope controls of a simulation series held as numpy columns.
+
+    Building and sorting large sets of `EMControl <pyemaps.emcontrols.html#pyemaps.emcontrols.EMControl>`_ 
+    objects one at a time validates every attribute of every object. A grid 
+    validates each of its tilt, zone, defl, vt and cl columns once, and creates
+    EMControl objects only when they are read. Any column can be given as a 
+    single value shared by all rows.
+
+    A grid can be passed wherever a list of microscope controls is used by
+    batch, streamed and parallel kinematic diffraction simulations.
+
+    .. code-block:: python
+
+        import numpy as np
+        from pyemaps import Crystal, EMCGrid
+
+        si = Crystal.from_builtin('Silicon')
+        tx = np.linspace(-1.0, 1.0, 201)
+        grid = EMCGrid.tilt_grid(tx, tx, zone = (0,0,1))
+
+        dpl = si.generateDPBatch(grid)
+
+    '''
+    def __init__(self, tilt = DEF_TILT, 
+                       zone = DEF_ZONE, 
+                       defl = DEF_DEFL, 
+                       vt = DEF_KV, 
+                       cl = DEF_CL,
+                       simc = None,
+                       xaxis = DEF_XAXIS):
+        '''
+        :param tilt: Tilt (x, y) or an array of shape (n, 2).
+        :param zone: Zone axis of three integers or an integer array of shape (n, 3).
+        :param defl: Deflection (x, y) or an array of shape (n, 2).
+        :param vt: High voltage or an array of shape (n,).
+        :param cl: Camera length or an array of shape (n,).
+        :param simc: Simulation controls shared by all rows, defaults to SIMControl().
+        :param xaxis: Crystal horizontal axis shared by all rows.
+        :raises: EMCError, if validation fails
+
+        '''
+        cols = {}
+        n = None
+        for name, v, width, dtype in (('tilt', tilt, 2, float),
+                                      ('zone', zone, 3, int),
+                                      ('defl', defl, 2, float),
+                                      ('vt', vt, 0, float),
+                                      ('cl', cl, 0, float)):
+            a, m = _column(v, name, width, dtype)
+            if m is not None:
+                if n is not None and m != n:
+                    raise EMCError(f'Number of {name} values {m} differs from {n} of other controls')
+                n = m
+            cols[name] = (a, width)
+
+        if n is None:
+            n = 1
+
+        for name, (a, width) in cols.items():
+            a = np.ascontiguousarray(np.broadcast_to(a, (n, width) if width else (n,)))
+            a.flags.writeable = False
+            cols[name] = a
+
+        if np.any(np.all(cols['zone'] == 0, axis = 1)):
+            raise EMCError("Zone axis must not be (0,0,0)")
+
+        if simc is None:
+            simc = SIMControl()
+
+        if not isinstance(simc, SIMControl):
+            raise EMCError("Simulation control invlid")
+
+        if xaxis is not None and (not isinstance(xaxis, tuple) or len(xaxis) != 3 or \
+           not all(isinstance(x, int) for x in xaxis)):
+            raise EMCError('Invalid crystal horizon axis')
+
+        self._cols = cols
+        self._n = n
+        self._simc = simc
+        self._xaxis = DEF_XAXIS if xaxis is None else xaxis
+
+    @classmethod
+    def tilt_grid(cls, tx, ty, **kwargs):
+        '''
+        Grid of all combinations of x and y tilts, with x tilt varying slowest.
+
+        :param tx: Tilts in x direction.
+        :type tx: 1-D array like, required
+
+        :param ty: Tilts in y direction.
+        :type ty: 1-D array like, required
+
+        :param kwargs: Other controls as in the EMCGrid constructor.
+
+        '''
+        tx, _ = _column(tx, 'x tilt', 0, float)
+        ty, _ = _column(ty, 'y tilt', 0, float)
+        if tx.ndim != 1 or ty.ndim != 1:
+            raise EMCError('Tilt grid values must be one dimensional')
+
+        gx, gy = np.meshgrid(tx, ty, indexing = 'ij')
+
+        return cls(tilt = np.stack((gx.ravel(), gy.ravel()), axis = 1), **kwargs)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def tilt(self):
+        '''Tilt column of shape (n, 2)'''
+        return self._cols['tilt']
+
+    @property
+    def zone(self):
+        '''Zone axis column of shape (n, 3)'''
+        return self._cols['zone']
+
+    @property
+    def defl(self):
+        '''Deflection column of shape (n, 2)'''
+        return self._cols['defl']
+
+    @property
+    def vt(self):
+        '''High voltage column of shape (n,)'''
+        return self._cols['vt']
+
+    @property
+    def cl(self):
+        '''Camera length column of shape (n,)'''
+        return self._cols['cl']
+
+    @property
+    def simc(self):
+        '''Simulation controls shared by all rows'''
+        return self._simc
+
+    @property
+    def xaxis(self):
+        '''Crystal horizontal axis shared by all rows'''
+        return self._xaxis
+
+    def _emc(self, tilt, zone, defl, vt, cl):
+        '''
+        internal - EMControl of one row of validated column values, 
+        created without going through the EMControl setters. The 
+        attributes are set in the order of EMControl constructor, 
+        which EMControl comparisons depend on.
+
+        '''
+        emc = EMControl.__new__(EMControl)
+        emc.__dict__.update(_tilt = tuple(tilt),
+                            _zone = tuple(zone),
+                            _defl = tuple(defl),
+                            _vt = vt,
+                            _cl = cl,
+                            _simc = self._simc,
+                            _mode = DEF_MODE,
+                            _aperture = DEF_APERTURE,
+                            _dsize = DEF_CBED_DSIZE,
+                            _pix_size = DEF_PIXSIZE,
+                            _det_size = DEF_DETSIZE,
+                            _xaxis = self._xaxis)
+        return emc
+
+    def _rows(self, cols):
+        '''internal - python values of the columns, converted in bulk'''
+
+        return [self._cols[name][cols].tolist() for name in ('tilt', 'zone', 'defl', 'vt', 'cl')]
+
+    def take(self, idx):
+        '''
+        Grid of the rows selected by idx.
+
+        :param idx: Row indices, a boolean mask or a slice.
+        :rtype: pyemaps.EMCGrid
+
+        '''
+        g = EMCGrid.__new__(EMCGrid)
+        g._cols = {}
+        for name, a in self._cols.items():
+            a = np.ascontiguousarray(a[idx])
+            a.flags.writeable = False
+            g._cols[name] = a
+
+        g._n = g._cols['vt'].shape[0]
+        g._simc = self._simc
+        g._xaxis = self._xaxis
+
+        return g
+
+    def __getitem__(self, key):
+        '''
+        EMControl object of row key, or a grid of the rows when key is 
+        a slice, an index array or a boolean mask.
+
+        '''
+        if isinstance(key, (int, np.integer)):
+            if key < -self._n or key >= self._n:
+                raise IndexError('EMCGrid index out of range')
+            return self._emc(*self._rows(key))
+
+        return self.take(key)
+
+    def __iter__(self):
+        # converted in blocks to bound the memory of python values
+        for start in range(0, self._n, GRID_BLOCK):
+            for row in zip(*self._rows(slice(start, start + GRID_BLOCK))):
+                yield self._emc(*row)
+
+    def argsort(self):
+        '''
+        Row order grouping the controls that are most expensive to change
+        in the simulation backend: zone axis first, then high voltage and
+        camera length, then tilt and deflection.
+
+        :return: Row indices.
+        :rtype: numpy.ndarray
+
+        '''
+        c = self._cols
+        # np.lexsort sorts by the last key first
+        keys = (c['defl'][:, 1], c['defl'][:, 0],
+                c['tilt'][:, 1], c['tilt'][:, 0],
+                c['cl'], c['vt'],
+                c['zone'][:, 2], c['zone'][:, 1], c['zone'][:, 0])
+
+        return np.lexsort(keys)
+
+    def sort(self):
+        '''
+        Sorts the grid rows in the order of `argsort`.
+
+        '''
+        order = self.argsort()
+        for name, a in self._cols.items():
+            a = a[order]
+            a.flags.writeable = False
+            self._cols[name] = a
@@ -28,13 +28,17 @@ data. It is composed of Point, Line and Disk class objects.
 
 '''
 
+import numpy as np
+
 from . import EMC, SIMC
+from .emcontrols import EMCIndex
 from . import DPError, PointError, LineError, PIndexError, \
               DiskError, DPListError
 
 # precision digits for comparison purposes
 NDIGITS = 1
 DIFF_PRECISION = 0.95
+DISK_RADIUS_PRECISION = 1.0e-06
 MIN_OPACITY = 0.2
 MAX_OPACITY = 0.35
 
@@ -53,6 +57,29 @@ def _double_eq(a,b):
     '''
     return abs(a-b) <= DIFF_PRECISION
 
+def _to_columns(data, ncols, what):
+
+    '''
+
+    internal - columnar array of diffraction pattern elements with
+    ncols columns, floating point arrays are kept without copying
+
+    '''
+    if not hasattr(data, "__len__"):
+        raise DPError(f"{what} data invalid")
+
+    arr = np.asarray(data)
+    if arr.dtype.kind != 'f':
+        arr = arr.astype(np.float64)
+
+    if arr.size == 0:
+        return arr.reshape(0, ncols)
+
+    if arr.ndim != 2 or arr.shape[1] != ncols:
+        raise DPError(f"{what} data invalid: each row must have {ncols} values")
+
+    return arr
+
 class Point:
 
     '''
@@ -557,7 +584,7 @@ class Disk:
         if not (self._idx == other.idx):
             return False
         
-        if abs(self._r - other.r) > 1.0e-06:
+        if abs(self._r - other.r) > DISK_RADIUS_PRECISION:
             return False
 
         if not (self._c == other.c):
@@ -650,6 +677,109 @@ class Disk:
         i1, i2, i3 = self._idx
         return iter((cx, cy, self._r, i1, i2, i3))
 
+def _make_element(row, ty):
+
+    '''
+
+    internal - Line or Disk object of type ty from a shifted array row
+
+    '''
+    if ty == 0:
+        x, y, r, i1, i2, i3 = row
+        return Disk(Point((x, y)), r, Index((int(i1), int(i2), int(i3))))
+
+    x1, y1, x2, y2, intensity = row
+    return Line(pt1 = Point((x1, y1)),
+                pt2 = Point((x2, y2)),
+                intensity = intensity,
+                type = ty)
+
+class _ElementIndex:
+
+    '''
+
+    internal - tolerance-aware hash lookup of the rows of a diffraction
+    pattern array. 
+    
+    Rows are bucketed by their exact columns and by grid cells of two
+    coordinates. Cells are twice the tolerance wide, so a matching row
+    is always in the same or a neighbouring cell of the looked up row 
+    and each lookup checks at most nine buckets.
+
+    '''
+    def __init__(self, arr, exact, near, tols):
+
+        self._exact = exact
+        self._near = near
+        self._tols = tols
+        self._cell = 2.0 * tols[0]
+        self._rows = arr.tolist()
+        self._buckets = {}
+
+        cells = np.floor_divide(arr[:, near[0:2]], self._cell).astype(np.int64).tolist()
+        for i, row in enumerate(self._rows):
+            key = (*[row[c] for c in exact], *cells[i])
+            self._buckets.setdefault(key, []).append(i)
+
+    def __contains__(self, row):
+        
+        exact = [row[c] for c in self._exact]
+        cx, cy = [int(row[c] // self._cell) for c in self._near[0:2]]
+        near = [(row[c], t) for c, t in zip(self._near, self._tols)]
+
+        for i in (cx-1, cx, cx+1):
+            for j in (cy-1, cy, cy+1):
+                for n in self._buckets.get((*exact, i, j), ()):
+                    r = self._rows[n]
+                    if all(abs(r[c] - v) <= t for c, (v, t) in zip(self._near, near)):
+                        return True
+
+        return False
+
+class _DPElements:
+
+    '''
+
+    Read-only sequence of Line or Disk objects over one columnar array 
+    of a diffraction pattern. The objects are only created when indexed
+    or iterated, changing them does not change the diffraction pattern.
+
+    '''
+    def __init__(self, dp, arr, ty):
+
+        self._dp = dp
+        self._arr = arr
+        self._ty = ty   # 0 - disks, 1 - Kikuchi lines, 2 - HOLZ lines
+
+    def _element(self, row):
+        sx, sy = self._dp.shift
+
+        if self._ty == 0:
+            x, y, r, i1, i2, i3 = row.tolist()
+            return _make_element((x - sx, y - sy, r, i1, i2, i3), 0)
+
+        x1, y1, x2, y2, intensity = row.tolist()
+        return _make_element((x1 - sx, y1 - sy, x2 - sx, y2 - sy, intensity), self._ty)
+
+    def __len__(self):
+        return self._arr.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._element(row) for row in self._arr[i]]
+
+        return self._element(self._arr[i])
+
+    def __iter__(self):
+        for row in self._arr:
+            yield self._element(row)
+
+    def __contains__(self, e):
+        return self._dp._find(self._ty, e)
+
+    def __repr__(self):
+        return repr(list(self))
+
 class diffPattern:
 
     '''
@@ -657,6 +787,13 @@ class diffPattern:
     Create a kinematic diffraction pattern based on the pyemaps
     kinematic simulation output in python dict object.
 
+    The pattern keeps the simulation output in three columnar arrays:
+    Kikuchi lines (N, 5) and HOLZ lines (N, 5) of end points and intensity,
+    disks (N, 6) of center, radius and Miller index. The arrays are stored
+    as received and the pattern shift is applied when they are read
+    through klines_arr, hlines_arr and disks_arr. The Line and Disk objects
+    of klines, hlines and disks are created from the arrays on demand.
+
     See :doc:Visualization for how to visualize 
     kinematic diffraction patterns using this object.
 
@@ -687,6 +824,7 @@ class diffPattern:
            'ndisks' not in ndiffs:
             raise DPError("Invaild diffraction data")
 
+        self._indexes = {}
         if 'bounds' not in diff_dict:
             setattr(self, 'shift', [0.0,0.0])
         else:
@@ -697,7 +835,6 @@ class diffPattern:
         for k, v in diff_dict.items():
             if k != 'nums' and k != 'bounds':
                 setattr(self, k, v)
-
             elif k == 'nums':
                 
                 for k1, v1 in v.items():
@@ -708,30 +845,66 @@ class diffPattern:
 
         ''' 
         
-        Kikuchi lines array 
+        Kikuchi lines as a sequence of Line objects
         
         '''
-        return self._klines
+        return _DPElements(self, self._karr, 1)
 
     @property
     def hlines(self):
 
         ''' 
         
-        Holz lines array 
+        Holz lines as a sequence of Line objects
         
         '''
-        return self._hlines
+        return _DPElements(self, self._harr, 2)
 
     @property
     def disks(self):
 
         ''' 
         
-        Disks array 
+        Disks as a sequence of Disk objects
         
         '''
-        return self._disks
+        return _DPElements(self, self._darr, 0)
+
+    @property
+    def klines_arr(self):
+
+        ''' 
+        
+        Kikuchi lines array of (x1, y1, x2, y2, intensity) rows with
+        the shift applied and intensities as in Line objects
+        
+        '''
+        return self._lines_array(self._karr)
+
+    @property
+    def hlines_arr(self):
+
+        ''' 
+        
+        HOLZ lines array of (x1, y1, x2, y2, intensity) rows with
+        the shift applied and intensities as in Line objects
+        
+        '''
+        return self._lines_array(self._harr)
+
+    @property
+    def disks_arr(self):
+
+        ''' 
+        
+        Disks array of (x, y, r, i1, i2, i3) rows with the shift applied
+        
+        '''
+        sx, sy = self._shift
+        arr = self._darr.astype(np.float64)
+        arr[:, 0] -= sx
+        arr[:, 1] -= sy
+        return arr
 
     @property
     def nklines(self):
@@ -786,58 +959,14 @@ class diffPattern:
     @klines.setter
     def klines(self, kls):
         
-        if not hasattr(kls, "__len__"):
-            raise DPError("klines data invalid")
-        
-        self._klines = []
-        for k in kls:
-            try:
-                x1,y1,x2,y2,intensity = k
-
-            except Exception as e:
-                raise DPError(f'kline data invalid: {e}')
-
-            else:
-                pt1 = Point(p=(x1,y1))
-                pt2 = Point(p=(x2,y2))
-
-                pt1 -= self._shift
-                pt2 -= self._shift
-
-                ln = Line(pt1 = pt1, 
-                          pt2 = pt2, 
-                          intensity=intensity)
-
-                self._klines.append(ln)
+        self._karr = _to_columns(kls, 5, 'klines')
+        self._indexes = {}
 
     @hlines.setter
     def hlines(self, hls):
         
-        if not hasattr(hls, "__len__"):
-            raise DPError("hlines data invalid")
-        
-        self._hlines = []
-        for h in hls:
-            try:
-                x1,y1,x2,y2,intensity = h
-
-            except Exception as e:
-                raise DPError(f'hlines data invalid: {e}')
-                
-            else:
-                pt1 = Point(p=(x1,y1))
-                pt2 = Point(p=(x2,y2))
-
-
-                pt1 -= self._shift
-                pt2 -= self._shift
-
-                ln = Line(pt1 = pt1, 
-                          pt2 = pt2, 
-                          type = 2,
-                          intensity=intensity)
-
-                self._hlines.append(ln)
+        self._harr = _to_columns(hls, 5, 'hlines')
+        self._indexes = {}
 
     @disks.setter
     def disks(self, dks):
@@ -845,7 +974,12 @@ class diffPattern:
         if not hasattr(dks, "__len__"):
             raise DPError("disks must be an array of Disk objects")
         
-        self._disks =[]
+        self._indexes = {}
+        if isinstance(dks, np.ndarray):
+            self._darr = _to_columns(dks, 6, 'disks')
+            return
+
+        rows = []
         for d in dks:
             if not "c" in d or len(d['c']) != 2:
                 raise DPError("disks must have a center of Point type")
@@ -856,14 +990,9 @@ class diffPattern:
             if not "idx" in d or len(d['idx']) != 3:
                 raise DPError("disks must be an index of three integers")
 
-            ctr = Point(d['c'])
-            ctr -= self._shift
-            
-            r = d['r']
-            indx = Index(d['idx'])
-            dk = Disk(ctr, r, indx)
+            rows.append((*d['c'], d['r'], *d['idx']))
 
-            self._disks.append(dk)
+        self._darr = _to_columns(rows, 6, 'disks')
 
     @name.setter
     def name(self, name):
@@ -881,6 +1010,7 @@ class diffPattern:
             raise DPError("diffraction pattern shift must be a tuple of two floats")
 
         self._shift = Point(sft)
+        self._indexes = {}
 
     @nklines.setter
     def nklines(self, nk):
@@ -906,6 +1036,120 @@ class diffPattern:
             
         self._ndisks = nd
 
+    def _to_data(self):
+
+        '''
+        
+        internal - the pattern in the form of the simulation output it
+        was created from, with the arrays as stored
+        
+        '''
+        return {"nums": {"nklines": self._nklines, 
+                         "ndisks": self._ndisks, 
+                         "nhlines": self._nhlines},
+                "bounds": tuple(self._shift),
+                "klines": self._karr, 
+                "hlines": self._harr,
+                "disks": self._darr,
+                "name": self._name}
+
+    def _lines_array(self, larr):
+
+        '''
+        
+        internal - shifted copy of a lines array
+        
+        '''
+        sx, sy = self._shift
+        arr = larr.astype(np.float64)
+        arr[:, 0:4] -= (sx, sy, sx, sy)
+        arr[:, 4] = np.trunc(arr[:, 4])
+        return arr
+
+    def _element_index(self, ty):
+
+        '''
+        
+        internal - lookup index of the elements of type ty, created on
+        first use and kept until the elements or the shift are changed
+        
+        '''
+        if ty not in self._indexes:
+            if ty == 0:
+                # disks: Miller index exact, center and radius within tolerance
+                idx = _ElementIndex(self.disks_arr, (3, 4, 5), (0, 1, 2), 
+                            (DIFF_PRECISION, DIFF_PRECISION, DISK_RADIUS_PRECISION))
+            else:
+                # lines: intensity exact, end points within tolerance
+                arr = self.klines_arr if ty == 1 else self.hlines_arr
+                idx = _ElementIndex(arr, (4,), (0, 1, 2, 3), (DIFF_PRECISION,)*4)
+
+            self._indexes[ty] = idx
+
+        return self._indexes[ty]
+
+    def _find(self, ty, e):
+
+        '''
+        
+        internal - whether Line or Disk e matches any element of type ty 
+        within the comparison tolerances of Line and Disk objects
+        
+        '''
+        if ty == 0:
+            if not isinstance(e, Disk):
+                return False
+        
+        elif not isinstance(e, Line) or e.type != ty:
+            return False
+
+        return tuple(e) in self._element_index(ty)
+
+    def _missing(self, ty, other):
+
+        '''
+        
+        internal - rows of the elements of type ty in this pattern that
+        are not in other
+        
+        '''
+        if ty == 0:
+            arr = self.disks_arr
+        else:
+            arr = self.klines_arr if ty == 1 else self.hlines_arr
+
+        idx = other._element_index(ty)
+        return [row for row in arr.tolist() if row not in idx]
+
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state.pop('_indexes', None)
+        return state
+
+    def __setstate__(self, state):
+
+        '''
+        
+        Converts diffraction patterns pickled with lists of Line and Disk
+        objects, such as those in saved test baselines, to arrays.
+        
+        '''
+        state = dict(state)
+        if '_klines' in state:
+            sx, sy = state['_shift']
+            for k, ak in (('_klines', '_karr'), ('_hlines', '_harr')):
+                arr = _to_columns([tuple(l) for l in state.pop(k)], 5, k)
+                arr[:, 0:4] += (sx, sy, sx, sy)
+                state[ak] = arr
+
+            arr = _to_columns([tuple(d) for d in state.pop('_disks')], 6, 'disks')
+            arr[:, 0:2] += (sx, sy)
+            state['_darr'] = arr
+
+        self.__dict__.update(state)
+        self._indexes = {}
+
     def __eq__(self, other):
 
         if not isinstance(other, diffPattern):
@@ -919,21 +1163,13 @@ class diffPattern:
             self._nhlines != other.nhlines:
             return False
 
-        if len(self._klines) != len(other.klines) or \
-            len(self._disks) != len(other.disks) or \
-            len(self._hlines) != len(other.hlines):
+        if len(self._karr) != len(other.klines) or \
+            len(self._darr) != len(other.disks) or \
+            len(self._harr) != len(other.hlines):
             return False
 
-        for kl in other.klines:
-            if not kl in self._klines:
-                return False
-        
-        for hl in other.hlines:
-            if not hl in self._hlines:
-                return False
-            
-        for ds in other.disks:
-            if not ds in self._disks:
+        for ty in (1, 2, 0):
+            if other._missing(ty, self):
                 return False
 
         return True
@@ -943,34 +1179,23 @@ class diffPattern:
         if (not isinstance(lc, Line)) and (not isinstance(lc, Disk)):
             raise DPError("DP object does not contain other types other than defined lines, disks")
         
-        dlist = []
-        if isinstance(lc, Line) and lc.type == 1:
-            dlist = self.klines
-
-        elif isinstance(lc, Line) and lc.type == 2:
-            dlist = self.hlines
-
-        else:
-            dlist = self.disks
-
-        for l in dlist:
-            if l == lc:
-                return True 
+        if isinstance(lc, Line):
+            return self._find(lc.type, lc)
 
-        return False
+        return self._find(0, lc)
 
     def __str__(self):
 
         sDiff=[str(f'# of Kikuchi lines (kline): {self._nklines}')]
-        for i, k in enumerate(self._klines):
+        for i, k in enumerate(self.klines):
             sDiff.append(str("kline# {}:".format(i+1)).ljust(10) + repr(k))
 
         sDiff.append(str(f'\n# of diffracted beams (disk, index = Miller Index): {self._nklines}'))
-        for i, d in enumerate(self._disks):
+        for i, d in enumerate(self.disks):
             sDiff.append(str("disk# {}:".format(i+1)).ljust(10) + repr(d))
         
         sDiff.append(str(f'\n# of HOLZ lines (hline): {self._nhlines}'))
-        for i, h in enumerate(self._hlines):
+        for i, h in enumerate(self.hlines):
             sDiff.append(str("hline# {}:".format(i+1)).ljust(10) + repr(h))
         
         return "\n".join(sDiff)
@@ -986,29 +1211,20 @@ class diffPattern:
         if not isinstance(other, diffPattern):
             raise DPError("DP object does not compare with objects of DP types")
         
-        kdiff = []
-        for sk in self._klines:
-            if not (sk in other):
-                kdiff.append(sk)
-
-        hdiff = []
-        for sh in self._hlines:
-            if not (sh in other):
-                hdiff.append(sh)
-
-        ddiff = []
-        for d in self._disks:
-            if not (d in other):
-                ddiff.append(d)
+        kdiff, hdiff, ddiff = [[_make_element(row, ty) for row in self._missing(ty, other)]
+                               for ty in (1, 2, 0)]
         
         return (kdiff, hdiff, ddiff)
 
     def to_dict(self):
         retdict = {}
         
-        retdict['klines'] = [kl.to_dict() for kl in self._klines]
-        retdict['hlines'] = [hl.to_dict() for hl in self._hlines]
-        retdict['disks'] = [d.to_dict() for d in self._disks]
+        retdict['klines'] = [{'pt1': (x1, y1), 'pt2': (x2, y2), 'int': int(i)}
+                             for x1, y1, x2, y2, i in self.klines_arr.tolist()]
+        retdict['hlines'] = [{'pt1': (x1, y1), 'pt2': (x2, y2), 'int': int(i)}
+                             for x1, y1, x2, y2, i in self.hlines_arr.tolist()]
+        retdict['disks'] = [{'c': (x, y), 'idx': (int(i1), int(i2), int(i3)), 'r': r}
+                            for x, y, r, i1, i2, i3 in self.disks_arr.tolist()]
         return retdict
 
 class Diffraction:
@@ -1017,9 +1233,14 @@ class Diffraction:
 
     List of DP objects and its associated EMControl objects.
 
+    Lookups by controls go through an index of the controls that is 
+    built on first use, see `EMCIndex <pyemaps.emcontrols.html#pyemaps.emcontrols.EMCIndex>`_.
+    Controls must not be changed in place after they are added.
+
     '''
     def __init__(self, name, mode=DEF_MODE):
         
+        self._index = None
         setattr(self, 'name', name)
         setattr(self, 'mode', mode)
         setattr(self, 'diffList', [])
@@ -1062,6 +1283,22 @@ class Diffraction:
                 raise DPListError('invalid data found in DP list')
 
         self._diffList = dpl
+        self._index = None
+
+    def _emc_index(self):
+
+        '''
+        
+        internal - controls index of the list, rebuilt when the list 
+        has been changed other than by add
+        
+        '''
+        if self._index is None or len(self._index) != len(self._diffList):
+            self._index = EMCIndex()
+            for i, (emc, _) in enumerate(self._diffList):
+                self._index.add(emc, i)
+
+        return self._index
 
     # Adding new diffraction patterns
     def add(self, emc, diffP):
@@ -1072,11 +1309,57 @@ class Diffraction:
         controls
         
         '''
-        if not isinstance(diffP, diffPattern):
+        if not isinstance(diffP, diffPattern) or \
+           not isinstance(emc, EMC):
             raise DPListError('failed to add DP')
 
+        if self._index is not None and len(self._index) == len(self._diffList):
+            self._index.add(emc, len(self._diffList))
 
         self.diffList.append((emc, diffP))
+
+    def find(self, emc):
+
+        '''
+        
+        Diffraction pattern generated with controls emc.
+
+        :param emc: Microscope controls to look up.
+        :type emc: pyemaps.EMC, required
+
+        :return: The first diffraction pattern with controls equal to emc, None if not found.
+        :rtype: pyemaps.DP
+        
+        '''
+        pos = self._emc_index().find(emc)
+
+        return self._diffList[pos[0]][1] if pos else None
+
+    def merge(self, other):
+
+        '''
+        
+        Adds the diffraction patterns of another list whose controls
+        are not in this list yet.
+
+        :param other: Diffraction pattern list of the same mode.
+        :type other: pyemaps.DPList, required
+
+        :return: Number of diffraction patterns added.
+        :rtype: int
+        
+        '''
+        if not isinstance(other, Diffraction) or other.mode != self._mode:
+            raise DPListError('only DP lists of the same mode can be merged')
+
+        idx = self._emc_index()
+        nadded = 0
+        for emc, dp in list(other.diffList):
+            if not idx.find(emc):
+                self.add(emc, dp)
+                nadded += 1
+
+        return nadded
     
     def sort(self):
 
@@ -1085,7 +1368,9 @@ class Diffraction:
         Sorting diffraction list by controls
         
         '''
-        self._diffList.sort(key=lambda x: x[0])
+        # one key per entry instead of two for every comparison
+        self._diffList.sort(key=lambda x: x[0].__key__())
+        self._index = None
             
     def __eq__(self, other):
 
@@ -1104,17 +1389,11 @@ class Diffraction:
             return False
 
         found = False
+        oidx = other._emc_index()
         for c, d in self:
-            found = False
-            
-            for oc, od in other.diffList:
-                if c == oc:
-                    found = (d==od)
-                    if not found:
-                        break
-            if found:
-                continue
-            else:
+            pos = oidx.find(c)
+            found = len(pos) > 0 and all(d == other.diffList[i][1] for i in pos)
+            if not found:
                 break
         
         return found
@@ -1136,6 +1415,7 @@ class Diffraction:
 
         '''
         self._diffList.clear()
+        self._index = None
 
     def _report_difference(self, other):
         """ 
@@ -1155,61 +1435,61 @@ class Diffraction:
             return rep
 
 
+        oidx = other._emc_index()
         for c, d in self:
-            cl = list(c.values())
-            for oc, od in other:
-                ocl = list(oc.values())
-                
-                if cl == ocl:
-                    if not (d == od):
-                        dk,dh,dd = d.difference(od)
-                        dk2,dh2,dd2 = od.difference(d)
-
-                        details =[]
-                        details.append(str(f"Control parameters: {c}"))
-                        klen, hlen, dlen = len(dk), len(dh), len(dd)
-                        klen2, hlen2, dlen2 = len(dk2), len(dh2), len(dd2)
-
-                        if klen > 0:
-                            details.append(str(f"{klen} klines in the new run, not in the baseline:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for k in dk:
-                                details.append("   " + str(k))
-                        if klen2 > 0:
-                            details.append(str(f"{klen2} klines in the baseline, not in the new run:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for k in dk2:
-                                details.append("   " + str(k))
-                                
-                        if dlen > 0:
-                            details.append(str(f"{dlen} disks in the new run, not in the baseline:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for d in dd:
-                                details.append("   " + str(d))
-                        if dlen2 > 0:
-                            details.append(str(f"{dlen2} disks in the baseline, not in the new run:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for d in dd2:
-                                details.append("   " + str(d))
-                        
-                        if hlen > 0:
-                            details.append(str(f"{hlen} hlines in the new run, not in the baseline:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for h in dh:
-                                details.append("   " + str(h))
-                        if hlen2 > 0:
-                            details.append(str(f"{hlen2} hlines in the baseline, not in the new run:"))
-                            # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
-                            for h in dh2:
-                                details.append("   " + str(h))
-
-                        #  for debugging - dont delete!!!!
-                        # details.append(str(f"entire new DP:"))
-                        # details.append("   " + str(d))
-                        
-                        # details.append(str(f"entire baseline DP:"))
-                        # details.append("   " + str(od))
-        rep.extend(details)
+            for i in oidx.find(c):
+                od = other.diffList[i][1]
+                if not (d == od):
+                    dk,dh,dd = d._difference(od)
+                    dk2,dh2,dd2 = od._difference(d)
+
+                    details =[]
+                    details.append(str(f"Control parameters: {c}"))
+                    klen, hlen, dlen = len(dk), len(dh), len(dd)
+                    klen2, hlen2, dlen2 = len(dk2), len(dh2), len(dd2)
+
+                    if klen > 0:
+                        details.append(str(f"{klen} klines in the new run, not in the baseline:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for k in dk:
+                            details.append("   " + str(k))
+                    if klen2 > 0:
+                        details.append(str(f"{klen2} klines in the baseline, not in the new run:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for k in dk2:
+                            details.append("   " + str(k))
+                            
+                    if dlen > 0:
+                        details.append(str(f"{dlen} disks in the new run, not in the baseline:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for ds in dd:
+                            details.append("   " + str(ds))
+                    if dlen2 > 0:
+                        details.append(str(f"{dlen2} disks in the baseline, not in the new run:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for ds in dd2:
+                            details.append("   " + str(ds))
+                    
+                    if hlen > 0:
+                        details.append(str(f"{hlen} hlines in the new run, not in the baseline:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for h in dh:
+                            details.append("   " + str(h))
+                    if hlen2 > 0:
+                        details.append(str(f"{hlen2} hlines in the baseline, not in the new run:"))
+                        # save.writelines(str(f"{klen} klines in the new run, not in the baseline:"))
+                        for h in dh2:
+                            details.append("   " + str(h))
+
+                    #  for debugging - dont delete!!!!
+                    # details.append(str(f"entire new DP:"))
+                    # details.append("   " + str(d))
+                    
+                    # details.append(str(f"entire baseline DP:"))
+                    # details.append("   " + str(od))
+
+                    rep.extend(details)
+
         return rep
                 
     def __str__(self):
@@ -0,0 +1,338 @@
+'''
+.. This file is part of pyEMAPS
+
+Parallel module runs pyemaps simulations in a pool of worker processes.
+
+All crystal objects share one set of memory in the backend simulation
+modules, so simulations can not be run in threads. Instead, each worker
+process of a `DiffractionPool <pyemaps.parallel.html#pyemaps.parallel.DiffractionPool>`_
+keeps one crystal loaded in its own backend, and simulation tasks are
+routed to the workers that already have the crystal loaded.
+
+.. ----
+
+.. pyEMAPS is free software. You can redistribute it and/or modify
+.. it under the terms of the GNU General Public License as published
+.. by the Free Software Foundation, either version 3 of the License,
+.. or (at your option) any later version..
+
+.. pyEMAPS is distributed in the hope that it will be useful,
+.. but WITHOUT ANY WARRANTY; without even the implied warranty of
+.. MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+.. GNU General Public License for more details.
+
+.. You should have received a copy of the GNU General Public License
+.. along with pyEMAPS.  If not, see `<https://www.gnu.org/licenses/>`_.
+
+.. Contact supprort@emlabsoftware.com for any questions and comments.
+
+.. ----
+
+.. Author:     EMLab Solutions, Inc.
+.. Date:       October 18, 2026
+
+'''
+
+import multiprocessing as mp
+import queue
+import os
+from collections import OrderedDict
+
+from . import EMC, EMCGrid, DPList, DEF_MODE
+from . import DPError, DPListError
+
+# cost of loading a crystal into a worker, relative to one queued task.
+# A worker that does not hold the crystal is only picked over one that
+# does when the latter is busier by more than this.
+RELOAD_COST = 0.5
+
+# seconds between checks on worker processes while waiting for results
+RESULT_POLL = 1.0
+
+# crystals a worker keeps, least recently used ones are dropped first.
+# At least 2, so that the crystal loaded is never the one dropped.
+WORKER_CRYSTALS = 4
+
+def _crystal_key(cr):
+    '''
+    internal - key identifying crystal data loaded in a worker
+
+    '''
+    return cr._fingerprint()
+
+def _use(crystals, key, cr = None):
+    '''
+    internal - marks crystal key as the most recently used in crystals,
+    adding it with cr if given and dropping the least recently used
+    beyond WORKER_CRYSTALS. The pool keeps the keys of each worker with
+    the same calls in the same order as the worker, so both drop the
+    same crystals.
+
+    '''
+    if cr is not None or key not in crystals:
+        crystals[key] = cr
+    crystals.move_to_end(key)
+
+    while len(crystals) > WORKER_CRYSTALS:
+        crystals.popitem(last = False)
+
+def _worker(task_q, result_q):
+    '''
+    Worker process loop. The worker keeps the WORKER_CRYSTALS crystals
+    it has used last and one of them loaded in its backend, which is only
+    replaced when a task for another crystal arrives.
+
+    '''
+    crystals = OrderedDict()
+    current = None
+
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+
+        cmd = task[0]
+        if cmd == 'crystal':
+            _, key, cr = task
+            _use(crystals, key, cr)
+            continue
+
+        # cmd == 'dp'
+        _, tid, key, emcs, mode, dsize = task
+        try:
+            cr = crystals[key]
+            _use(crystals, key)
+            if current is not None and current is not cr and current.loaded():
+                current.unload()
+            current = cr
+
+            dpl = cr.generateDPBatch(emcs, mode = mode, dsize = dsize)
+
+        except Exception as e:
+            result_q.put((tid, 1, str(e)))
+        else:
+            result_q.put((tid, 0, dpl.diffList))
+
+    if current is not None and current.loaded():
+        current.unload()
+
+class DiffractionPool:
+    '''
+    Pool of worker processes for kinematic diffraction simulations.
+
+    Each worker loads a crystal once and keeps it loaded for as long as
+    tasks for the same crystal keep coming, so that orientation sweeps
+    do not pay for sending and reloading the crystal with every pattern.
+
+    .. code-block:: python
+
+        from pyemaps import Crystal, EMC
+        from pyemaps.parallel import DiffractionPool
+
+        si = Crystal.from_builtin('Silicon')
+        emcs = [EMC(tilt=(0.1*i, 0.0)) for i in range(-50, 50)]
+
+        with DiffractionPool(nworkers = 8) as pool:
+            dpl = pool.generateDP(si, emcs, mode = 2)
+
+    '''
+    def __init__(self, nworkers = None):
+        '''
+        :param nworkers: Number of worker processes, defaults to the number of CPUs.
+        :type nworkers: int, optional
+
+        '''
+        if nworkers is None:
+            nworkers = os.cpu_count() or 1
+
+        if not isinstance(nworkers, int) or nworkers < 1:
+            raise DPListError('Number of workers must be a positive integer')
+
+        self._nworkers = nworkers
+        self._result_q = mp.Queue()
+        self._task_qs = []
+        self._procs = []
+
+        for _ in range(nworkers):
+            tq = mp.Queue()
+            p = mp.Process(target=_worker, args=(tq, self._result_q), daemon=True)
+            p.start()
+            self._task_qs.append(tq)
+            self._procs.append(p)
+
+        # crystal keys each worker holds, least recently used first, 
+        # and the one it will hold loaded after its queued tasks are done
+        self._known = [OrderedDict() for _ in range(nworkers)]
+        self._resident = [None]*nworkers
+        self._tid = 0
+
+    @property
+    def nworkers(self):
+        '''
+        Number of worker processes
+
+        '''
+        return self._nworkers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        '''
+        Stops all worker processes.
+
+        '''
+        for tq in self._task_qs:
+            tq.put(None)
+
+        for p in self._procs:
+            p.join()
+
+        self._task_qs = []
+        self._procs = []
+
+    def _route(self, key, load):
+        '''
+        internal - picks the worker for a task on crystal key, given
+        the number of tasks already queued for each worker in load.
+
+        '''
+        costs = [load[w] + (0 if self._resident[w] == key else RELOAD_COST)
+                 for w in range(self._nworkers)]
+
+        return costs.index(min(costs))
+
+    def _collect(self, ntasks):
+        '''
+        internal - waits for ntasks results from the workers
+
+        '''
+        results = {}
+        while len(results) < ntasks:
+            try:
+                tid, status, payload = self._result_q.get(timeout=RESULT_POLL)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._procs):
+                    raise DPListError('A diffraction worker process terminated unexpectedly')
+                continue
+
+            results[tid] = (status, payload)
+
+        return results
+
+    def generateDPs(self, jobs, mode = None, dsize = None, chunksize = None):
+        """
+        Kinematic diffraction simulations for a list of crystals and their
+        microscope controls.
+
+        :param jobs: A list of (crystal, emc_list) pairs, where emc_list is a list of EMC objects or an EMCGrid.
+        :type jobs: list of tuples, required
+
+        :param mode: Mode of kinemetic diffraction - normal(1) or CBED(2).
+        :type mode: int, optional
+
+        :param dsize: diffractted beam size, only applied to CBED mode.
+        :type dsize: float, optional
+
+        :param chunksize: Number of patterns sent to a worker in one task,
+                          defaults to an even split of each job across all workers.
+        :type chunksize: int, optional
+
+        :return: One diffraction pattern list per job, in the order of its emc_list.
+        :rtype: list of pyemaps.DPList
+
+        """
+        from .crystals import Crystal
+
+        if not self._procs:
+            raise DPListError('Diffraction pool is closed')
+
+        if chunksize is not None and (not isinstance(chunksize, int) or chunksize < 1):
+            raise DPListError('Chunk size must be a positive integer')
+
+        load = [0]*self._nworkers
+        tasks = {}
+        for j, (cr, emcs) in enumerate(jobs):
+            if not isinstance(cr, Crystal):
+                raise DPListError('Diffraction pool jobs must be run on Crystal objects')
+
+            bGrid = isinstance(emcs, EMCGrid)
+            if not bGrid and not all(isinstance(emc, EMC) for emc in emcs):
+                raise DPListError('Microscope controls input must be a list of EMControl objects')
+
+            key = _crystal_key(cr)
+            n = len(emcs)
+            csize = chunksize if chunksize else max(1, -(-n // self._nworkers))
+
+            for start in range(0, n, csize):
+                w = self._route(key, load)
+
+                if key not in self._known[w]:
+                    self._task_qs[w].put(('crystal', key, cr))
+                _use(self._known[w], key)
+
+                tid = self._tid
+                self._tid += 1
+                # grid chunks are sent as their columns
+                chunk = emcs[start:start+csize]
+                if not bGrid:
+                    chunk = list(chunk)
+                self._task_qs[w].put(('dp', tid, key, chunk, mode, dsize))
+
+                self._resident[w] = key
+                load[w] += 1
+                tasks[tid] = (j, start)
+
+        results = self._collect(len(tasks))
+
+        if not mode:
+            mode = DEF_MODE
+        dpls = [DPList(cr.name, mode = mode) for cr, _ in jobs]
+        errors = []
+
+        for tid in sorted(tasks, key=lambda t: tasks[t]):
+            j, _ = tasks[tid]
+            status, payload = results[tid]
+            if status != 0:
+                errors.append(payload)
+                continue
+
+            for emc, dp in payload:
+                dpls[j].add(emc, dp)
+
+        if errors:
+            raise DPError(f'failed to generate diffraction patterns in worker: {errors[0]}')
+
+        return dpls
+
+    def generateDP(self, cr, emc_list, mode = None, dsize = None, chunksize = None):
+        """
+        Kinematic diffraction simulation of one crystal over a list of
+        microscope controls spread across the worker processes.
+
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :param emc_list: A list of `Microscope control <pyemaps.emcontrols.html#module-pyemaps.emcontrols>`_ objects or a `microscope controls grid <pyemaps.emcontrols.html#pyemaps.emcontrols.EMCGrid>`_.
+        :type emc_list: list of pyemaps.EMC or pyemaps.EMCGrid, required
+
+        :param mode: Mode of kinemetic diffraction - normal(1) or CBED(2).
+        :type mode: int, optional
+
+        :param dsize: diffractted beam size, only applied to CBED mode.
+        :type dsize: float, optional
+
+        :param chunksize: Number of patterns sent to a worker in one task.
+        :type chunksize: int, optional
+
+        :return: diffraction pattern list in the order of emc_list.
+        :rtype: pyemaps.DPList
+
+        """
+        return self.generateDPs([(cr, emc_list)],
+                                mode = mode,
+                                dsize = dsize,
+                                chunksize = chunksize)[0]
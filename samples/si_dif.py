@@ -47,9 +47,9 @@ def generate_difs(name = 'Silicon', mode = DEF_MODE, ckey = 'tilt', sim_rand=Fal
     :           are not changed much (default values if not set). But if changes are needed, then they 
     :           are also set from within EMControl class
     '''
-    from pyemaps import DPList, SIMC
-    import concurrent.futures
+    from pyemaps import SIMC, DPListError
     from pyemaps import Crystal as cryst
+    from pyemaps.parallel import DiffractionPool
 
     cr = cryst.from_builtin(name)
 
@@ -57,10 +57,6 @@ def generate_difs(name = 'Silicon', mode = DEF_MODE, ckey = 'tilt', sim_rand=Fal
         dsize = DEF_CBED_DSIZE
     else:
         dsize = None
-    
-    fs=[]
-    # create an empty diffraction pattern list
-    difs = DPList(name, mode = mode)
 
     emclist =[] 
 
@@ -89,22 +85,17 @@ def generate_difs(name = 'Silicon', mode = DEF_MODE, ckey = 'tilt', sim_rand=Fal
 
         emclist.append(emc)
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=MAX_PROCWORKERS) as e:
-
-        for ec in emclist:
-            fs.append(e.submit(cr.generateDP, mode=mode,  dsize=dsize, em_controls = ec))
-
-        for f in concurrent.futures.as_completed(fs):
-            try:
-                emc, diffP = f.result()
-                difs.add(emc, diffP)
-                
-            except (DPError, EMCError) as e:
-                print(f'{f} generated an exception: {e.message}')
-                exit(1)
-            except Exception as e:
-                print('failed to generate diffraction patterns with  ' + str(e))
-                exit(1)
+    # each worker loads the crystal once and keeps it for all its patterns
+    with DiffractionPool(nworkers=MAX_PROCWORKERS) as pool:
+        try:
+            difs = pool.generateDP(cr, emclist, mode=mode, dsize=dsize)
+
+        except (DPError, EMCError, DPListError) as e:
+            print(f'diffraction pool generated an exception: {e.message}')
+            exit(1)
+        except Exception as e:
+            print('failed to generate diffraction patterns with  ' + str(e))
+            exit(1)
 
     # sort the diffraction patern list by controls
     difs.sort()       
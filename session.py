@@ -0,0 +1,1114 @@
+'''
+.. This file is part of pyEMAPS
+
+Session module keeps a dynamic diffraction (Bloch) simulation open for
+as long as its results are used.
+
+The eigen-solutions computed when a Bloch simulation starts are held in
+the backend until the simulation ends, and Bloch images for any sample
+thickness, detector and image type as well as scattering matrices are
+derived from them without solving again. A
+`BlochSession <pyemaps.session.html#pyemaps.session.BlochSession>`_
+makes that life span explicit, replaces the pairing of
+`beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_
+and `endBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.endBloch>`_
+with a context manager and accounts for the memory used.
+
+.. ----
+
+.. pyEMAPS is free software. You can redistribute it and/or modify
+.. it under the terms of the GNU General Public License as published
+.. by the Free Software Foundation, either version 3 of the License,
+.. or (at your option) any later version..
+
+.. pyEMAPS is distributed in the hope that it will be useful,
+.. but WITHOUT ANY WARRANTY; without even the implied warranty of
+.. MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+.. GNU General Public License for more details.
+
+.. You should have received a copy of the GNU General Public License
+.. along with pyEMAPS.  If not, see `<https://www.gnu.org/licenses/>`_.
+
+.. Contact supprort@emlabsoftware.com for any questions and comments.
+
+.. ----
+
+.. Author:     EMLab Solutions, Inc.
+.. Date:       October 18, 2026
+
+'''
+
+import json
+import os
+
+import numpy as np
+
+from . import EMC, SIMC, BlochError
+from . import DEF_APERTURE, DEF_OMEGA, DEF_SAMPLING, DEF_CBED_DSIZE
+from . import DEF_THICKNESS, DEF_PIXSIZE, DEF_DETSIZE
+from . import TY_NORMAL, TY_LACBED
+from .diffract.bloch_dec import bloch_run, BIMG_ITEMSIZE
+from .diffract.dif_dec import is_resident
+
+EIGEN_ITEMSIZE = 8
+#int: bytes of a single precision complex value of eigen-solutions in the backend
+
+PROPAGATOR_TOLERANCE = 1.0e-3
+#float: largest difference allowed between propagated and backend scattering matrix elements
+
+PROPAGATOR_RANGE = (DEF_THICKNESS[0], DEF_THICKNESS[1])
+#tuple: default (start, end) sample thicknesses propagated scattering matrices are checked and valid over
+
+PHASE_CONVENTIONS = (2j*np.pi, -2j*np.pi, 1j, -1j)
+#tuple: candidate factors c of the backend eigen values gamma in the propagation exp(c*gamma*t)
+
+SESSION_FORMAT = 1
+#int: version of the Bloch session checkpoint file format
+
+def _eigen_bytes(nsampling, nbeams):
+    '''
+    internal - memory in bytes of eigenvectors and eigenvalues over 
+    nbeams beams at nsampling sampling points.
+
+    '''
+    return nsampling*(nbeams*nbeams + nbeams)*EIGEN_ITEMSIZE
+
+def _check_thicknesses(ref_thickness, thickness_range):
+    '''
+    internal - thicknesses of the backend scattering matrices a propagator
+    is derived from and checked against: ref_thickness, ref_thickness+1
+    and both ends of thickness_range.
+
+    '''
+    if not isinstance(ref_thickness, int) or ref_thickness <= 0:
+        raise BlochError('Reference thickness must be a positive integer')
+
+    try:
+        th_start, th_end = thickness_range
+    except (TypeError, ValueError):
+        raise BlochError('Thickness range must be (start, end)') from None
+
+    if not isinstance(th_start, int) or not isinstance(th_end, int) or \
+       th_start <= 0 or th_start > th_end:
+        raise BlochError('Thickness range must be positive integers (start, end) with start <= end')
+
+    return sorted({ref_thickness, ref_thickness + 1, th_start, th_end})
+
+def _thickness_count(sample_thickness):
+    '''
+    internal - number of thickness slices in sample_thickness
+    (start, end, step), 0 if invalid.
+
+    '''
+    try:
+        th_start, th_end, th_step = sample_thickness
+    except (TypeError, ValueError):
+        return 0
+
+    if th_step <= 0 or th_start > th_end:
+        return 0
+
+    if th_start == th_end:
+        return 1
+
+    n = len(range(th_start, th_end, th_step))
+    return n + 1
+
+class BlochSession:
+    '''
+    Dynamic diffraction simulation session of a crystal.
+
+    The simulation is started when the session is created and ended when
+    it is closed. In between, Bloch images and scattering matrices of any
+    sample thickness and detector settings are derived from the same
+    eigen-solutions.
+
+    .. code-block:: python
+
+        from pyemaps import Crystal, BlochSession
+
+        si = Crystal.from_builtin('Silicon')
+
+        with BlochSession(si, sampling = 20) as bs:
+            thin = bs.getBlochImages(sample_thickness = (100, 300, 100))
+            wide = bs.getBlochImages(sample_thickness = (200, 200, 100), det_size = 256)
+            scm = bs.getSCMatrix(ib_coords = bs.sampling_points[0])
+
+            print(bs.memory())
+
+    .. note::
+
+        The backend holds the results of one dynamic simulation at a time.
+        Starting another session, or calling beginBloch or endBloch directly,
+        ends this one, and it can no longer be used.
+
+    A session can be saved to a checkpoint file with 
+    `save <pyemaps.session.html#pyemaps.session.BlochSession.save>`_ and
+    restored in any process with 
+    `load <pyemaps.session.html#pyemaps.session.BlochSession.load>`_.
+
+    '''
+    def __init__(self, cr,
+                       aperture = DEF_APERTURE,
+                       omega = DEF_OMEGA,
+                       sampling = DEF_SAMPLING,
+                       dbsize = DEF_CBED_DSIZE,
+                       em_controls = None,
+                       mem_limit = None):
+        '''
+        :param cr: Crystal object.
+        :type cr: pyemaps.Crystal, required
+
+        :param aperture: Objective aperture.
+        :type aperture: float, optional
+
+        :param omega: Diagnization cutoff value.
+        :type omega: int, optional
+
+        :param sampling: Number of sampling points.
+        :type sampling: int, optional
+
+        :param dbsize: Diffracted beams size.
+        :type dbsize: float, optional
+
+        :param em_controls: Microscope controls, defaults to those of `beginBloch <pyemaps.crystals.html#pyemaps.crystals.Crystal.beginBloch>`_.
+        :type em_controls: pyemaps.EMC, optional
+
+        :param mem_limit: Memory limit in bytes of the session, checked before images are generated.
+        :type mem_limit: int, optional
+
+        '''
+        from .crystals import Crystal
+
+        if not isinstance(cr, Crystal):
+            raise BlochError('Bloch session must be run on a Crystal object')
+
+        if mem_limit is not None and (not isinstance(mem_limit, int) or mem_limit <= 0):
+            raise BlochError('Memory limit must be a positive integer')
+
+        if em_controls is None:
+            em_controls = EMC(cl=200, simc = SIMC(gmax=1.0, excitation=(0.3,1.0)))
+
+        self._cr = cr
+        self._name = cr.name
+        self._params = dict(aperture = aperture,
+                            omega = omega,
+                            sampling = sampling,
+                            dbsize = dbsize)
+        self._mem_limit = mem_limit
+        self._run = None
+        self._restored = None
+        self._images = 0
+        self._peak_images = 0
+        self._nrenders = 0
+
+        try:
+            self._nsampling, self._sampling_points = cr.beginBloch(aperture = aperture,
+                                                                   omega = omega,
+                                                                   sampling = sampling,
+                                                                   dbsize = dbsize,
+                                                                   em_controls = em_controls)
+            self._nbeams, _ = cr.getCalculatedBeams()
+
+        except BlochError:
+            cr.endBloch()
+            raise
+
+        except Exception as e:
+            cr.endBloch()
+            raise BlochError('Something went wrong in starting bloch simulation') from e
+
+        self._controls = cr.session_controls
+        self._run = bloch_run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        # an abandoned session still releases the backend memory
+        if getattr(self, '_run', None) is not None:
+            self.close()
+
+    @property
+    def crystal(self):
+        '''
+        Crystal object simulated, None for a session restored from a checkpoint
+
+        '''
+        return self._cr
+
+    @property
+    def name(self):
+        '''
+        Name of the crystal simulated
+
+        '''
+        return self._name
+
+    @property
+    def restored(self):
+        '''
+        Whether the session was restored from a checkpoint, with its
+        eigen-solutions in Python only
+
+        '''
+        return self._restored is not None
+
+    @property
+    def controls(self):
+        '''
+        Microscope controls of the session, updated with the simulation settings
+
+        '''
+        return self._controls
+
+    @property
+    def nsampling(self):
+        '''
+        Number of sampling points
+
+        '''
+        return self._nsampling
+
+    @property
+    def sampling_points(self):
+        '''
+        Sampling point coordinates
+
+        '''
+        return list(self._sampling_points)
+
+    @property
+    def nbeams(self):
+        '''
+        Number of diffracted beams calculated
+
+        '''
+        return self._nbeams
+
+    @property
+    def nrenders(self):
+        '''
+        Number of image sets generated from the session
+
+        '''
+        return self._nrenders
+
+    @property
+    def closed(self):
+        '''
+        Whether the session has been closed or replaced by another simulation
+
+        '''
+        return self._run is None or bloch_run() != self._run
+
+    def close(self):
+        '''
+        Ends the simulation and releases its backend memory. Closing a
+        session that is already closed does nothing.
+
+        '''
+        if self._run is None:
+            return
+
+        if bloch_run() == self._run:
+            self._cr.endBloch()
+
+        self._run = None
+
+    def save(self, path,
+                   ref_thickness = DEF_THICKNESS[0],
+                   thickness_range = PROPAGATOR_RANGE):
+        '''
+        Saves the session to a checkpoint file in numpy .npz format: the
+        simulation settings and controls, sampling points and their beam 
+        tilts, calculated beams, and the backend eigen values and scattering
+        matrices at all sampling points, at ref_thickness, ref_thickness+1
+        and both ends of thickness_range. The file is replaced only once it 
+        is complete.
+
+        The backend results are saved as they are, and the 
+        `BlochPropagator <pyemaps.session.html#pyemaps.session.BlochPropagator>`_
+        of a restored session is only derived from them when it is first
+        asked for, so sessions whose eigen-solutions can not be propagated
+        are saved as well.
+
+        :param path: Checkpoint file name.
+        :type path: str, required
+
+        :param ref_thickness: Reference thickness the scattering matrices are taken at, 
+                              see `BlochPropagator.from_session <pyemaps.session.html#pyemaps.session.BlochPropagator.from_session>`_.
+        :type ref_thickness: int, optional
+
+        :param thickness_range: Sample thicknesses (start, end) the propagator of the restored session is valid over.
+        :type thickness_range: tuple of 2 ints, optional
+
+        '''
+        from .ddiffs import _emc_record
+
+        self._check()
+
+        thicknesses = _check_thicknesses(ref_thickness, thickness_range)
+        res = self.getSCMatrixBatch(thicknesses = thicknesses)
+        _, beams = self.getCalculatedBeams()
+        _, ibs = self.getIBDetails()
+
+        meta = dict(format = SESSION_FORMAT,
+                    name = self._name,
+                    params = self._params,
+                    controls = _emc_record(self._controls),
+                    ref_thickness = ref_thickness,
+                    thickness_range = list(thickness_range),
+                    thicknesses = thicknesses)
+
+        arrays = dict(meta = np.array(json.dumps(meta)),
+                      sampling_points = np.array(self._sampling_points, dtype=int).reshape(-1, 2),
+                      tilts = np.array([ib['tilt'] for ib in ibs], dtype=float).reshape(-1, 3),
+                      calc_beams = np.array(beams, dtype=int).reshape(-1, 3),
+                      ib = res['ib'],
+                      ndim = res['ndim'],
+                      beams = res['beams'],
+                      scm = res['scm'][:, 0],
+                      ev = res['ev'][:, 0])
+
+        tmpfn = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmpfn, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+
+            os.replace(tmpfn, path)
+
+        except BaseException:
+            if os.path.exists(tmpfn):
+                os.remove(tmpfn)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Restores a session from a checkpoint file written by 
+        `save <pyemaps.session.html#pyemaps.session.BlochSession.save>`_, 
+        for scattering matrices and beam intensities only: Bloch images, 
+        including those at new detector settings, can not be rendered from 
+        a checkpoint, and `reopen <pyemaps.session.html#pyemaps.session.BlochSession.reopen>`_
+        solves the simulation again in the backend for them.
+
+        The eigen-solutions of the restored session are in Python only, as 
+        the backend can not take them back. Sampling points, calculated 
+        beams, controls, and scattering matrices and beam intensities at 
+        any thickness from `getPropagator <pyemaps.session.html#pyemaps.session.BlochSession.getPropagator>`_
+        are available without solving again. The propagator is derived from
+        the saved backend results on its first use.
+
+        :param path: Checkpoint file name.
+        :type path: str, required
+
+        :return: Restored session.
+        :rtype: pyemaps.BlochSession
+
+        '''
+        from .ddiffs import _emc_from_record
+
+        try:
+            with np.load(path, allow_pickle = False) as data:
+                arrays = {k: data[k] for k in data.files}
+            meta = json.loads(str(arrays.pop('meta')))
+        except (OSError, ValueError, KeyError) as e:
+            raise BlochError(f'Error reading Bloch session checkpoint {path}: {e}') from e
+
+        if meta.get('format') != SESSION_FORMAT:
+            raise BlochError(f'Unsupported Bloch session checkpoint format: {meta.get("format")}')
+
+        bs = cls.__new__(cls)
+        bs._cr = None
+        bs._name = meta['name']
+        bs._params = meta['params']
+        bs._mem_limit = None
+        bs._run = None
+        bs._images = 0
+        bs._peak_images = 0
+        bs._nrenders = 0
+
+        bs._sampling_points = [tuple(p) for p in arrays['sampling_points'].tolist()]
+        bs._nsampling = len(bs._sampling_points)
+        bs._nbeams = len(arrays['calc_beams'])
+        bs._controls = _emc_from_record(meta['controls'])
+
+        bs._restored = dict(tilts = arrays['tilts'],
+                            beams = arrays['calc_beams'],
+                            propagator = None)
+
+        try:
+            bs._restored['matrices'] = (meta['ref_thickness'],
+                                        tuple(meta['thickness_range']),
+                                        meta['thicknesses'],
+                                        {k: arrays[k] for k in ('ib', 'ndim', 'beams', 'scm', 'ev')})
+        except KeyError as e:
+            raise BlochError(f'Error reading Bloch session checkpoint {path}: missing {e}') from e
+
+        return bs
+
+    def reopen(self, cr, mem_limit = None):
+        '''
+        Runs the simulation of a restored session again in the backend, with
+        the settings and controls it was saved with.
+
+        :param cr: Crystal object, the crystal of the saved session.
+        :type cr: pyemaps.Crystal, required
+
+        :param mem_limit: Memory limit in bytes of the session.
+        :type mem_limit: int, optional
+
+        :return: New session of the simulation.
+        :rtype: pyemaps.BlochSession
+
+        '''
+        from copy import deepcopy
+
+        if self._restored is None:
+            raise BlochError('Only Bloch sessions restored from a checkpoint can be reopened')
+
+        if cr.name != self._name:
+            raise BlochError(f'Bloch session checkpoint is of crystal {self._name}, not {cr.name}')
+
+        bs = BlochSession(cr,
+                          em_controls = deepcopy(self._controls),
+                          mem_limit = mem_limit,
+                          **self._params)
+
+        if bs.sampling_points != self._sampling_points:
+            bs.close()
+            raise BlochError('Sampling points of the reopened Bloch session differ from the checkpoint')
+
+        return bs
+
+    def _check(self):
+        '''
+        internal - raises BlochError if the session results are no longer
+        available in the backend
+
+        '''
+        if self._restored is not None:
+            raise BlochError('Bloch session restored from a checkpoint has no backend results, reopen it first')
+
+        if self.closed:
+            raise BlochError('Bloch session is closed or replaced by another simulation')
+
+        if not is_resident(self._cr):
+            raise BlochError('Crystal of the Bloch session is no longer loaded')
+
+    def eigen_bytes(self):
+        '''
+        Estimated memory in bytes used by the eigen-solutions held in
+        the backend: eigenvectors and eigenvalues over all calculated
+        beams at every sampling point.
+
+        '''
+        return _eigen_bytes(self._nsampling, self._nbeams)
+
+    @staticmethod
+    def image_bytes(sample_thickness = DEF_THICKNESS,
+                    det_size = DEF_DETSIZE,
+                    nslices = None):
+        '''
+        Memory in bytes of the image buffer for a set of Bloch images.
+
+        :param sample_thickness: Sample thickness (start, end, step).
+        :param det_size: Detector size.
+        :param nslices: Number of images, overrides the count from sample_thickness.
+
+        '''
+        if nslices is None:
+            nslices = _thickness_count(sample_thickness)
+
+        return det_size*det_size*nslices*BIMG_ITEMSIZE
+
+    def memory(self):
+        '''
+        Memory accounting of the session in bytes:
+
+        * **eigen**: estimated eigen-solutions held in the backend
+        * **images**: image buffer of the last image set generated
+        * **peak_images**: largest image buffer generated
+        * **limit**: memory limit of the session, None if not set
+
+        '''
+        return dict(eigen = self.eigen_bytes(),
+                    images = self._images,
+                    peak_images = self._peak_images,
+                    limit = self._mem_limit)
+
+    def _chunk_limit(self, mem_limit):
+        '''
+        internal - image buffer limit of chunked image generation, the 
+        smaller of mem_limit and what the session memory limit leaves 
+        after the eigen-solutions.
+
+        '''
+        if self._mem_limit is None:
+            return mem_limit
+
+        avail = self._mem_limit - self.eigen_bytes()
+        if avail <= 0:
+            raise BlochError(f'Bloch eigen-solutions exceed the session memory limit of {self._mem_limit} bytes')
+
+        return avail if mem_limit is None else min(mem_limit, avail)
+
+    def _account(self, nbytes):
+        '''internal - records an image buffer of nbytes'''
+
+        self._images = nbytes
+        self._peak_images = max(self._peak_images, nbytes)
+        self._nrenders += 1
+
+    def _chunk_bytes(self, sample_thickness, det_size, nType, mem_limit):
+        '''internal - image buffer bytes of each chunk'''
+
+        nthick = _thickness_count(sample_thickness)
+        nper = self._nbeams if nType == TY_LACBED else 1
+        per = self.image_bytes(det_size = det_size, nslices = nper) \
+              if isinstance(det_size, int) else 0
+
+        nchunk = 1 if mem_limit is None or per == 0 else mem_limit // per
+        return min(nchunk, nthick)*per
+
+    def getBlochImages(self,
+                       sample_thickness = DEF_THICKNESS,
+                       pix_size = DEF_PIXSIZE,
+                       det_size = DEF_DETSIZE,
+                       nType = TY_NORMAL,
+                       bSave = False,
+                       sink = None,
+                       mem_limit = None):
+        '''
+        Bloch images from the session eigen-solutions. See
+        `getBlochImages <pyemaps.crystals.html#pyemaps.crystals.Crystal.getBlochImages>`_
+        for the parameters.
+
+        When images are generated into a sink, the chunks are also kept
+        within the session memory limit.
+
+        :return: `BImgList <pyemaps.ddiffs.html#pyemaps.ddiffs.BlochImgs>`_ object, or the sink
+        :rtype: BImgList
+
+        :raises: BlochError, if the images would exceed the session memory limit
+
+        '''
+        self._check()
+
+        if sink is not None or mem_limit is not None:
+            mem_limit = self._chunk_limit(mem_limit)
+            result = self._cr.getBlochImages(sample_thickness = sample_thickness,
+                                             pix_size = pix_size,
+                                             det_size = det_size,
+                                             nType = nType,
+                                             bSave = bSave,
+                                             sink = sink,
+                                             mem_limit = mem_limit)
+
+            self._account(self._chunk_bytes(sample_thickness, det_size, nType, mem_limit))
+            return result
+
+        nslices = _thickness_count(sample_thickness)
+        if nType == TY_LACBED:
+            nslices *= self._nbeams
+
+        nbytes = self.image_bytes(det_size = det_size, nslices = nslices) \
+                 if isinstance(det_size, int) else 0
+
+        if self._mem_limit is not None and nbytes + self.eigen_bytes() > self._mem_limit:
+            raise BlochError(f'Bloch images of {nbytes} bytes exceed the session memory limit of {self._mem_limit} bytes, '
+                             f'generate them in chunks into a sink instead')
+
+        bimgs = self._cr.getBlochImages(sample_thickness = sample_thickness,
+                                        pix_size = pix_size,
+                                        det_size = det_size,
+                                        nType = nType,
+                                        bSave = bSave)
+        self._account(nbytes)
+
+        return bimgs
+
+    def iterBlochImages(self,
+                        sample_thickness = DEF_THICKNESS,
+                        pix_size = DEF_PIXSIZE,
+                        det_size = DEF_DETSIZE,
+                        nType = TY_NORMAL,
+                        mem_limit = None):
+        '''
+        Generator of Bloch images from the session eigen-solutions, in
+        chunks kept within mem_limit and the session memory limit. See
+        `iterBlochImages <pyemaps.crystals.html#pyemaps.crystals.Crystal.iterBlochImages>`_
+        for the parameters.
+
+        '''
+        self._check()
+
+        mem_limit = self._chunk_limit(mem_limit)
+        imgs = self._cr.iterBlochImages(sample_thickness = sample_thickness,
+                                        pix_size = pix_size,
+                                        det_size = det_size,
+                                        nType = nType,
+                                        mem_limit = mem_limit)
+
+        self._account(self._chunk_bytes(sample_thickness, det_size, nType, mem_limit))
+        return self._checked(imgs)
+
+    def _checked(self, imgs):
+        '''
+        internal - passes on the images of generator imgs for as long as 
+        the session results are available
+
+        '''
+        while True:
+            self._check()
+            try:
+                item = next(imgs)
+            except StopIteration:
+                return
+
+            yield item
+
+    def getSCMatrix(self,
+                    ib_coords = (0,0),
+                    sample_thickness = DEF_THICKNESS[0],
+                    rvec = (0.0,0.0,0.0)):
+        '''
+        Scattering matrix at a sampling point from the session eigen-solutions. See
+        `getSCMatrix <pyemaps.crystals.html#pyemaps.crystals.Crystal.getSCMatrix>`_
+        for the parameters and return values.
+
+        '''
+        self._check()
+
+        return self._cr.getSCMatrix(ib_coords = ib_coords,
+                                    sample_thickness = sample_thickness,
+                                    rvec = rvec)
+
+    def getSCMatrixBatch(self,
+                         ib_list = None,
+                         thicknesses = (DEF_THICKNESS[0],),
+                         rvecs = ((0.0,0.0,0.0),),
+                         beams = None,
+                         bEigenOnly = False):
+        '''
+        Scattering matrices at many sampling points, thicknesses and R vectors
+        from the session eigen-solutions. See
+        `getSCMatrixBatch <pyemaps.crystals.html#pyemaps.crystals.Crystal.getSCMatrixBatch>`_
+        for the parameters and return values.
+
+        '''
+        self._check()
+
+        return self._cr.getSCMatrixBatch(ib_list = ib_list,
+                                         thicknesses = thicknesses,
+                                         rvecs = rvecs,
+                                         beams = beams,
+                                         bEigenOnly = bEigenOnly)
+
+    def getRvecSeries(self,
+                      rvecs,
+                      ib_list = None,
+                      thicknesses = (DEF_THICKNESS[0],),
+                      beams = None):
+        '''
+        Scattering matrices over a series of R vectors from the session eigen-solutions. See
+        `getRvecSeries <pyemaps.crystals.html#pyemaps.crystals.Crystal.getRvecSeries>`_
+        for the parameters and return values.
+
+        '''
+        self._check()
+
+        return self._cr.getRvecSeries(rvecs,
+                                      ib_list = ib_list,
+                                      thicknesses = thicknesses,
+                                      beams = beams)
+
+    def getIBDetails(self, bPrint = False):
+        '''
+        Sampling points and their beam tilts. See
+        `getIBDetails <pyemaps.crystals.html#pyemaps.crystals.Crystal.getIBDetails>`_.
+
+        '''
+        if self._restored is not None:
+            tilts = self._restored['tilts']
+            return len(tilts), [dict(ib = ib, tilt = t) for ib, t in zip(self._sampling_points, tilts)]
+
+        self._check()
+
+        return self._cr.getIBDetails(bPrint = bPrint)
+
+    def getCalculatedBeams(self, bPrint = False):
+        '''
+        Diffracted beams calculated. See
+        `getCalculatedBeams <pyemaps.crystals.html#pyemaps.crystals.Crystal.getCalculatedBeams>`_.
+
+        '''
+        if self._restored is not None:
+            return self._nbeams, self._restored['beams']
+
+        self._check()
+
+        return self._cr.getCalculatedBeams(bPrint = bPrint)
+
+    def getPropagator(self,
+                      ib_list = None,
+                      ref_thickness = DEF_THICKNESS[0],
+                      rvec = (0.0,0.0,0.0),
+                      thickness_range = PROPAGATOR_RANGE):
+        '''
+        Propagator of the session eigen-solutions at the sampling points in ib_list. See
+        `BlochPropagator.from_session <pyemaps.session.html#pyemaps.session.BlochPropagator.from_session>`_
+        for the parameters. A session restored from a checkpoint returns the 
+        propagator of the backend results saved, at R = (0,0,0), and the
+        reference thickness and thickness range of the checkpoint only.
+
+        :return: Scattering matrix propagator.
+        :rtype: pyemaps.session.BlochPropagator
+
+        '''
+        if self._restored is not None:
+            if any(rvec):
+                raise BlochError('Bloch session restored from a checkpoint only has eigen-solutions at R = (0,0,0)')
+
+            bp = self._restored['propagator']
+            if bp is None:
+                t0, th_range, thicknesses, m = self._restored['matrices']
+                bp = BlochPropagator._from_matrices(m['ib'], m['ndim'], m['beams'],
+                                                    m['scm'], thicknesses,
+                                                    m['ev'], t0, th_range)
+                self._restored['propagator'] = bp
+
+            return bp if ib_list is None else bp.take(ib_list)
+
+        return BlochPropagator.from_session(self,
+                                            ib_list = ib_list,
+                                            ref_thickness = ref_thickness,
+                                            rvec = rvec,
+                                            thickness_range = thickness_range)
+
+def _match(a, b):
+    '''
+    internal - one to one matching of complex values a and b, closest 
+    pairs first.
+
+    :return: index into b of the value matched to each value of a
+    '''
+    dist = np.abs(a[:, None] - b[None, :])
+    match = np.full(len(a), -1, dtype=int)
+    used = np.zeros(len(b), dtype=bool)
+
+    for flat in np.argsort(dist, axis=None):
+        k, j = divmod(int(flat), len(b))
+        if match[k] < 0 and not used[j]:
+            match[k] = j
+            used[j] = True
+
+    return match
+
+def _mode_exponents(lam, gamma, t0, c):
+    '''
+    internal - exponents kappa of the eigen modes of a scattering matrix 
+    at thickness t0 with eigen values lam, so that lam = exp(kappa*t0).
+
+    The logarithm of lam is only known up to multiples of 2*pi*i, the
+    multiple is taken from the backend eigen value gamma matched to 
+    each mode with the propagation exp(c*gamma*t).
+    '''
+    kappa = c*gamma
+    kappa = kappa[_match(lam, np.exp(kappa*t0))]
+
+    log_lam = np.log(lam)
+    m = np.round((kappa*t0 - log_lam).imag/(2*np.pi))
+
+    return (log_lam + 2j*np.pi*m)/t0
+
+class BlochPropagator:
+    '''
+    Scattering matrices and beam intensities at arbitrary sample thicknesses
+    from eigen-solutions of a dynamic diffraction simulation kept in Python.
+
+    A scattering matrix is propagated over thickness t from its eigen modes
+    as S(t) = C exp(kappa*t) inv(C), so thickness scans and fits are 
+    computed with numpy over whole thickness arrays, without calls to the
+    backend.
+
+    .. code-block:: python
+
+        import numpy as np
+        from pyemaps import Crystal, BlochSession
+
+        si = Crystal.from_builtin('Silicon')
+
+        with BlochSession(si, sampling = 20) as bs:
+            bp = bs.getPropagator(thickness_range = (50, 1500))
+
+        th = np.linspace(50.0, 1500.0, 500)
+        intensities = bp.getIntensities(th)
+
+    .. note::
+
+        The backend returns eigen values but not eigenvectors, so the
+        eigenvectors C are those of the backend scattering matrix at a
+        reference thickness, and the exponents kappa are checked against
+        the backend scattering matrices at a second thickness and at both
+        ends of a thickness range. Errors of the eigen-solutions grow with
+        the distance from the reference thickness, so the propagator only
+        returns scattering matrices and intensities within that range, 
+        `PROPAGATOR_RANGE` by default, and a wider scan needs a propagator
+        of a wider range.
+
+    '''
+    def __init__(self, ib, ndim, beams, vectors, inverses, exponents,
+                 thickness_range = None):
+        '''
+        :param ib: Sampling points, shape (nib, 2).
+        :param ndim: Matrix dimension at each sampling point, shape (nib,).
+        :param beams: Diffracted beams at each sampling point, shape (nib, n, 3).
+        :param vectors: Eigenvectors C in columns, shape (nib, n, n).
+        :param inverses: Inverses of the eigenvectors, shape (nib, n, n).
+        :param exponents: Exponents kappa of the eigen modes, shape (nib, n).
+        :param thickness_range: Sample thicknesses (start, end) the eigen-solutions are valid over, any if None.
+
+        Matrices of sampling points with dimension below n are padded with zeros.
+
+        '''
+        self._ib = np.asarray(ib, dtype=int)
+        self._ndim = np.asarray(ndim, dtype=int)
+        self._beams = np.asarray(beams, dtype=int)
+        self._vectors = np.asarray(vectors, dtype=np.complex128)
+        self._inverses = np.asarray(inverses, dtype=np.complex128)
+        self._exponents = np.asarray(exponents, dtype=np.complex128)
+        self._range = None if thickness_range is None else tuple(thickness_range)
+
+        nib, n = self._exponents.shape
+        if self._ib.shape != (nib, 2) or self._ndim.shape != (nib,) or \
+           self._beams.shape != (nib, n, 3) or \
+           self._vectors.shape != (nib, n, n) or self._inverses.shape != (nib, n, n):
+            raise BlochError('Inconsistent shapes of propagator eigen-solutions')
+
+        # column of the incident beam (0,0,0) at each sampling point
+        incident = np.all(self._beams == 0, axis=2)
+        incident[np.arange(n)[None, :] >= self._ndim[:, None]] = False
+        if not np.all(incident.any(axis=1)):
+            raise BlochError('Incident beam (0,0,0) not found in diffracted beams')
+
+        self._incident = incident.argmax(axis=1)
+
+    @classmethod
+    def from_session(cls, bs,
+                          ib_list = None,
+                          ref_thickness = DEF_THICKNESS[0],
+                          rvec = (0.0,0.0,0.0),
+                          thickness_range = PROPAGATOR_RANGE):
+        '''
+        Propagator of the eigen-solutions of a Bloch session. The backend
+        scattering matrices are retrieved once, at ref_thickness, and at
+        ref_thickness+1 and both ends of thickness_range for the check.
+
+        :param bs: Bloch session.
+        :type bs: pyemaps.BlochSession, required
+
+        :param ib_list: Sampling point coordinates, defaults to all sampling points.
+        :type ib_list: list of tuples, optional
+
+        :param ref_thickness: Sample thickness of the reference scattering matrices.
+        :type ref_thickness: int, optional
+
+        :param rvec: R vector shifting atom coordinates in crystal.
+        :type rvec: tuple of 3 floats, optional
+
+        :param thickness_range: Sample thicknesses (start, end) the propagator is checked and valid over.
+        :type thickness_range: tuple of 2 ints, optional
+
+        :return: Scattering matrix propagator.
+        :rtype: pyemaps.session.BlochPropagator
+
+        :raises: BlochError, if the propagated matrices do not reproduce the backend ones
+
+        '''
+        thicknesses = _check_thicknesses(ref_thickness, thickness_range)
+        res = bs.getSCMatrixBatch(ib_list = ib_list,
+                                  thicknesses = thicknesses,
+                                  rvecs = (rvec,))
+
+        return cls._from_matrices(res['ib'], res['ndim'], res['beams'],
+                                  res['scm'][:, 0], thicknesses,
+                                  res['ev'][:, 0], ref_thickness, thickness_range)
+
+    @classmethod
+    def _from_matrices(cls, ib, ndim, beams, scm, thicknesses, ev, t0, thickness_range):
+        '''
+        internal - propagator of backend scattering matrices scm at thicknesses,
+        including t0 and t0+1, and eigen values ev, at sampling points ib, 
+        valid over thickness_range
+
+        '''
+        k0 = thicknesses.index(t0)
+        k1 = thicknesses.index(t0 + 1)
+        checks = [k for k in range(len(thicknesses)) if k not in (k0, k1)]
+        th = np.array([thicknesses[k] for k in checks], dtype=float)
+
+        nib, n = ev.shape
+        vectors = np.zeros((nib, n, n), dtype=np.complex128)
+        inverses = np.zeros((nib, n, n), dtype=np.complex128)
+        exponents = np.zeros((nib, n), dtype=np.complex128)
+
+        conventions = PHASE_CONVENTIONS
+        for i in range(nib):
+            d = int(ndim[i])
+            s0 = scm[i, k0, :d, :d].astype(np.complex128)
+            s1 = scm[i, k1, :d, :d].astype(np.complex128)
+            gamma = ev[i, :d].astype(np.complex128)
+
+            lam, c_vec = np.linalg.eig(s0)
+            c_inv = np.linalg.inv(c_vec)
+
+            for c in conventions:
+                kappa = _mode_exponents(lam, gamma, t0, c)
+                s_prop = (c_vec*np.exp(kappa*(t0 + 1))) @ c_inv
+                if np.abs(s_prop - s1).max() <= PROPAGATOR_TOLERANCE:
+                    break
+            else:
+                raise BlochError(f'Eigen-solutions at {tuple(ib[i].tolist())} do not reproduce the backend scattering matrix')
+
+            # the convention of the backend eigen values is the same everywhere
+            conventions = (c,)
+
+            # far from t0, errors of the exponents are multiplied by the thickness
+            s_prop = np.einsum('ij,tj,jk->tik', c_vec, np.exp(kappa[None, :]*th[:, None]), c_inv)
+            diff = np.abs(s_prop - scm[i, checks, :d, :d]).max(axis=(1, 2))
+            if np.any(diff > PROPAGATOR_TOLERANCE):
+                bad = int(th[np.argmax(diff)])
+                raise BlochError(f'Eigen-solutions at {tuple(ib[i].tolist())} do not reproduce the backend scattering matrix at thickness {bad}')
+
+            vectors[i, :d, :d] = c_vec
+            inverses[i, :d, :d] = c_inv
+            exponents[i, :d] = kappa
+
+        return cls(ib, ndim, beams, vectors, inverses, exponents, thickness_range)
+
+    @property
+    def ib(self):
+        '''
+        Sampling points, shape (nib, 2)
+
+        '''
+        return self._ib
+
+    @property
+    def ndim(self):
+        '''
+        Matrix dimension at each sampling point, shape (nib,)
+
+        '''
+        return self._ndim
+
+    @property
+    def beams(self):
+        '''
+        Diffracted beams at each sampling point, shape (nib, n, 3)
+
+        '''
+        return self._beams
+
+    @property
+    def exponents(self):
+        '''
+        Exponents of the eigen modes at each sampling point, shape (nib, n)
+
+        '''
+        return self._exponents
+
+    @property
+    def thickness_range(self):
+        '''
+        Sample thicknesses (start, end) the propagator is valid over, None if any
+
+        '''
+        return self._range
+
+    def __len__(self):
+        return len(self._ib)
+
+    def take(self, ib_list):
+        '''
+        Propagator of the sampling points in ib_list.
+
+        :param ib_list: Sampling point coordinates.
+        :type ib_list: list of tuples, required
+
+        :rtype: pyemaps.session.BlochPropagator
+
+        '''
+        pos = {tuple(ib): i for i, ib in enumerate(self._ib.tolist())}
+        try:
+            idx = [pos[tuple(ib)] for ib in ib_list]
+        except KeyError as e:
+            raise BlochError(f'Sampling point {e.args[0]} not in the propagator') from e
+
+        if not idx:
+            raise BlochError('No sampling points to take')
+
+        n = int(self._ndim[idx].max())
+
+        return BlochPropagator(self._ib[idx],
+                               self._ndim[idx],
+                               self._beams[idx, :n],
+                               self._vectors[idx, :n, :n],
+                               self._inverses[idx, :n, :n],
+                               self._exponents[idx, :n],
+                               self._range)
+
+    def _phases(self, thicknesses):
+        '''
+        internal - propagation factors exp(kappa*t) of all eigen modes,
+        shape (nib, nthickness, n)
+
+        '''
+        th = np.asarray(thicknesses, dtype=float).reshape(-1)
+        if th.size == 0 or np.any(th < 0):
+            raise BlochError('Sample thicknesses must be non-negative')
+
+        if self._range is not None and \
+           (np.any(th < self._range[0]) or np.any(th > self._range[1])):
+            raise BlochError(f'Sample thicknesses must be within the propagator thickness range {self._range}')
+
+        return np.exp(self._exponents[:, None, :]*th[None, :, None])
+
+    def getSCMatrix(self, thicknesses):
+        '''
+        Scattering matrices at sample thicknesses.
+
+        :param thicknesses: Sample thicknesses within the thickness range, need not be integers.
+        :type thicknesses: float or array of floats, required
+
+        :return: scattering matrices, shape (nib, nthickness, n, n)
+        :rtype: numpy.ndarray
+
+        '''
+        ph = self._phases(thicknesses)
+
+        return np.einsum('bij,btj,bjk->btik', self._vectors, ph, self._inverses, optimize=True)
+
+    def getIntensities(self, thicknesses):
+        '''
+        Diffracted beam intensities at sample thicknesses for the incident
+        beam, the column of (0,0,0) in the scattering matrices.
+
+        :param thicknesses: Sample thicknesses within the thickness range, need not be integers.
+        :type thicknesses: float or array of floats, required
+
+        :return: beam intensities in the order of beams, shape (nib, nthickness, n)
+        :rtype: numpy.ndarray
+
+        '''
+        ph = self._phases(thicknesses)
+        c_inv0 = self._inverses[np.arange(len(self._ib)), :, self._incident]
+
+        amp = np.einsum('bij,btj,bj->bti', self._vectors, ph, c_inv0, optimize=True)
+
+        return np.abs(amp)**2
@@ -154,6 +154,10 @@ setup(name                              ="pyemaps",
                                            'pyemaps.xtal',
                                            'pyemaps.emcontrols',
                                            'pyemaps.stackimg',
+                                           'pyemaps.parallel',
+                                           'pyemaps.cache',
+                                           'pyemaps.session',
+                                           'pyemaps.dpdb',
                                            'pyemaps.CifFile.CifFile_module',
                                            'pyemaps.CifFile.yapps3_compiled_rt',
                                            'pyemaps.CifFile.YappsStarParser_1_1',
@@ -50,7 +50,86 @@ from .errors import XDPImageError
 
 from .display import normalizeImage, displayXImage
 
-    
+STACK_INDEX_DTYPE = np.dtype([('layer', np.int32),
+                              ('status', np.int32),
+                              ('npeaks', np.int32),
+                              ('nindexed', np.int32),
+                              ('fit', np.float64),
+                              ('map_row', np.int32),
+                              ('map_col', np.int32)])
+#numpy.dtype: indexing result of one image stack layer, status is 0 for indexed layers
+
+# image, database map dimensions and controls of the stack indexed by
+# this process, set up once per process by _init_index_worker
+_index_job = None
+
+def _init_index_worker(simg, dpdbfn, controls):
+    '''
+    internal - loads the DP database once into the stem4d module of this
+    process for indexing the layers of image simg
+
+    '''
+    global _index_job
+
+    ret, mr, mc = ediom.readDPDB(dpdbfn)
+    _index_job = (simg, mr, mc, controls) if ret == 0 else dpdbfn
+
+def _index_layer(st):
+    '''
+    internal - indexes image layer st against the DP database loaded by 
+    _init_index_worker, with the search and indexing calls of indexImage
+
+    '''
+    if not isinstance(_index_job, tuple):
+        raise XDPImageError(f'Error loading diffraction pattern database {_index_job}')
+
+    simg, mr, mc, controls = _index_job
+    cc, sigma, img_center, rmin, search_box, soption, filter_threshold, peak_threshold = controls
+
+    res = np.zeros((), dtype=STACK_INDEX_DTYPE)
+    res['layer'] = st
+    res['status'] = -1
+    res['map_row'] = res['map_col'] = -1
+
+    try:
+        simg.loadImage(rmode = EL_ONE, stack = st)
+    except Exception as e:
+        raise XDPImageError(f"Error loading image layer {st} for stem4d analysis: {e}") from e
+
+    edc = stem4d.cvar.edc
+    edc.cc = cc
+    edc.sigma = sigma
+    edc.set_center(img_center[0], img_center[1])
+
+    ret, kc, kr = stem4d.prepareSearch(img_center[0], img_center[1], rmin)
+    if ret != 0 or kc <= 0 or kr <= 0:
+        return res
+
+    xpeaks = ediom.searchXPeaks(search_box, threshold=peak_threshold)
+    if xpeaks == -1:
+        return res
+
+    res['npeaks'] = xpeaks
+    if xpeaks <= 3:
+        return res
+
+    ret = ediom.indexXPeaks(rmin, soption, filter_threshold)
+    if ret != 0:
+        res['status'] = ret
+        return res
+
+    ret, fmap = ediom.getFitMap(mr*mc)
+    if ret != 0:
+        return res
+
+    best = int(np.argmax(fmap))
+    res['fit'] = fmap[best]
+    res['map_row'], res['map_col'] = divmod(best, mc)
+    res['nindexed'] = ediom.getExpImagePeaks()
+    res['status'] = 0
+
+    return res
+
 def _getDateTimeString():
     '''
     Helper function to create a unique name for the image file name.
@@ -694,15 +773,7 @@ class StackImage():
 
         """ 
         
-        if scaling_option[0] < 0 or scaling_option[0] > 5:
-            raise XDPImageError('Experimental scaling factor out of range')
-        
-        if scaling_option[1] < 0 or scaling_option[1] > 5:
-            raise XDPImageError('Theoretical scaling factor out of range')
-        
-        soption = scaling_option[0] * 10 + scaling_option[1]
-        if soption == 0:
-             raise XDPImageError('Both scaling factors out of range')
+        soption = StackImage._scaling_option(scaling_option)
 
         # loading theoretical diffraction image database 
         # generated from pyemaps dpgen module
@@ -774,6 +845,124 @@ class StackImage():
         ediom.printIndexDetails()
         return 0
     
+    def indexStack(self,
+                   dpdbfn,
+                   cc                      = DEF_CC,
+                   sigma                   = DEF_SIGMA,
+                   img_center              = DEF_ICENTER,
+                   rmin                    = DEF_RMIN,
+                   search_box              = DEF_BOXSIZE,
+                   scaling_option          = (DEF_XSCALE, DEF_TSCALE),
+                   filter_threshold        = DEF_FILTER_THRESHOLD,
+                   peak_threshold          = DEF_SEARCH_THRESHOLD,
+                   stacks                  = None,
+                   nworkers                = None
+              ):
+        """
+        Searches and indexes the layers of an experimental image stack, such as
+        the diffraction patterns of a 4D-STEM scan, without displays or printed
+        output. 
+        
+        Each layer is searched and indexed with the same stem4d calls as
+        `indexImage <pyemaps.stackimg.html#pyemaps.stackimg.StackImage.indexImage>`_,
+        so the results of a layer are those of indexImage with *ssel* set to it.
+        The diffraction pattern database is loaded once for all layers, once in
+        each worker process with *nworkers*.
+
+        .. code-block:: python
+
+            from pyemaps import StackImage
+
+            scan = StackImage('scan.img')
+            omap = scan.indexStack('al_dpdb.bin', cc = 29.0, sigma = 3.0, 
+                                   img_center = (99.9, 99.9), nworkers = 8)
+
+            good = omap[omap['status'] == 0]
+
+        :param stacks: image layers to index, numbered from 1, all layers by default.
+        :type stacks: list of int, optional
+
+        :param nworkers: Number of worker processes, all layers are indexed in this process by default.
+        :type nworkers: int, optional
+
+        Other parameters are those of `indexImage <pyemaps.stackimg.html#pyemaps.stackimg.StackImage.indexImage>`_.
+
+        :return: indexing results of STACK_INDEX_DTYPE, one per layer in the order of *stacks*
+        :rtype: numpy.ndarray
+
+        Fields of the results:
+
+        - **layer**: image layer number
+        - **status**: 0 for an indexed layer, the stem4d status code or -1 otherwise
+        - **npeaks**: number of peaks found in the layer
+        - **nindexed**: number of peaks indexed
+        - **fit**: highest matching index in the matching index map of the database
+        - **map_row**, **map_col**: location of the highest matching index in the stereo projection map, the orientation of the layer
+
+        """
+        soption = StackImage._scaling_option(scaling_option)
+
+        if nworkers is not None and (not isinstance(nworkers, int) or nworkers < 1):
+            raise XDPImageError('Number of workers must be a positive integer')
+
+        try:
+            self.loadImage(rmode = EL_ONE, stack = 1)
+        except Exception as e:
+            raise XDPImageError(f"Error loading image for stem4d analysis: {e}") from e
+
+        if img_center[0] < 0 or img_center[0] > self.dim[0] or \
+            img_center[1] < 0 or img_center[1] > self.dim[1]:
+            raise ValueError('Point of interest on Experimental image invalid')
+
+        nl = self.dim[2]
+        if stacks is None:
+            stacks = range(1, nl+1)
+
+        stacks = list(stacks)
+        if not stacks or any(not isinstance(st, int) or st < 1 or st > nl for st in stacks):
+            raise XDPImageError(f'Image layers must be numbers in range (1, {nl})')
+
+        controls = (cc, sigma, tuple(img_center), rmin, search_box, soption, 
+                    filter_threshold, peak_threshold)
+
+        try:
+            if nworkers is None:
+                _init_index_worker(self, dpdbfn, controls)
+                results = [_index_layer(st) for st in stacks]
+            else:
+                import multiprocessing as mp
+
+                with mp.Pool(min(nworkers, len(stacks)), initializer = _init_index_worker,
+                             initargs = (self, dpdbfn, controls)) as pool:
+                    results = pool.map(_index_layer, stacks,
+                                       chunksize = max(1, len(stacks)//(4*nworkers)))
+
+        except XDPImageError:
+            raise
+        except Exception as e:
+            raise XDPImageError(f"Error indexing image stack: {e}") from e
+
+        return np.array(results, dtype=STACK_INDEX_DTYPE)
+
+    @staticmethod
+    def _scaling_option(scaling_option):
+        '''
+        internal - validates the experimental and theoretical scaling factors
+        of indexImage and indexStack and combines them for stem4d
+
+        '''
+        if scaling_option[0] < 0 or scaling_option[0] > 5:
+            raise XDPImageError('Experimental scaling factor out of range')
+        
+        if scaling_option[1] < 0 or scaling_option[1] > 5:
+            raise XDPImageError('Theoretical scaling factor out of range')
+        
+        soption = scaling_option[0] * 10 + scaling_option[1]
+        if soption == 0:
+             raise XDPImageError('Both scaling factors out of range')
+
+        return soption
+
     def generateBDF(self,
                     center=(0.0, 0.0), 
                     rads = (0.0, 0.0),
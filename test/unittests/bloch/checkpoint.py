@@ -0,0 +1,58 @@
+import os
+import tempfile
+
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession
+
+    si = Crystal.from_builtin('Silicon')
+    ths = [120, 450.5]
+    fn = os.path.join(tempfile.mkdtemp(), 'si_session.npz')
+
+    with BlochSession(si, sampling = 10) as bs:
+        bs.save(fn, thickness_range = (100, 500))
+
+        # a failed write leaves neither the checkpoint nor its temporary file
+        bad = os.path.join(os.path.dirname(fn), 'bad.npz')
+        os.mkdir(bad)
+        try:
+            bs.save(bad)
+        except OSError:
+            pass
+        else:
+            raise AssertionError('Checkpoint replaced a directory')
+
+        assert sorted(os.listdir(os.path.dirname(fn))) == ['bad.npz', 'si_session.npz'], \
+            'Temporary checkpoint file left behind'
+        os.rmdir(bad)
+
+        points = bs.sampling_points
+        nbeams = bs.nbeams
+        scm = bs.getPropagator(thickness_range = (100, 500)).getSCMatrix(ths)
+
+    rs = BlochSession.load(fn)
+    assert rs.restored and rs.closed
+    assert rs.name == si.name
+    assert rs.sampling_points == points and rs.nbeams == nbeams
+    assert rs.controls.simc.sampling == 10
+    assert rs.getPropagator().thickness_range == (100, 500)
+    assert np.allclose(rs.getPropagator().getSCMatrix(ths), scm)
+
+    try:
+        rs.getBlochImages()
+    except Exception:
+        pass
+    else:
+        raise AssertionError('Restored session generated images without the backend')
+
+    with rs.reopen(si) as bs:
+        assert bs.sampling_points == points
+        bimgs = bs.getBlochImages(det_size = 128)
+        assert len(bimgs.blochList) == 1
+
+    os.remove(fn)
+    print('unit test for Bloch session checkpoints completed')
+
+if __name__ == '__main__':
+    main()
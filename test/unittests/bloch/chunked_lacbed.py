@@ -0,0 +1,45 @@
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession, BImgList, BlochError, TY_LACBED
+
+    si = Crystal.from_builtin('Silicon')
+    th = (200, 400, 100)
+    det = 64
+
+    with BlochSession(si) as bs:
+        full = bs.getBlochImages(sample_thickness = th, det_size = det, nType = TY_LACBED)
+        n = len(full.blochList)
+        assert n == 3*bs.nbeams, f'{n} LACBED images generated, expected {3*bs.nbeams}'
+
+        # one thickness of images per chunk
+        per_thickness = det*det*bs.nbeams*4
+        sink = np.zeros((n, det, det), dtype = np.float32)
+        bs.getBlochImages(sample_thickness = th, det_size = det, nType = TY_LACBED,
+                          sink = sink, mem_limit = per_thickness)
+
+        for i, (_, img) in enumerate(full.blochList):
+            assert np.array_equal(sink[i], img), f'Chunked LACBED image {i} differs'
+
+        assert bs.memory()['images'] == per_thickness
+
+        # the beams of one thickness are not split
+        try:
+            bs.getBlochImages(sample_thickness = th, det_size = det, nType = TY_LACBED,
+                              sink = sink, mem_limit = per_thickness - 1)
+        except BlochError:
+            pass
+        else:
+            raise AssertionError('LACBED images of one thickness generated over the memory limit')
+
+        chunked = bs.getBlochImages(sample_thickness = th, det_size = det, nType = TY_LACBED,
+                                    sink = BImgList(si.name))
+        assert chunked == full, 'Chunked LACBED image list differs'
+
+        ths = [emc.simc.sth for emc, _ in bs.iterBlochImages(sample_thickness = th, det_size = det)]
+        assert ths == [200, 300, 400], f'Streamed images of thicknesses {ths}'
+
+    print('unit test for chunked LACBED generation completed')
+
+if __name__ == '__main__':
+    main()
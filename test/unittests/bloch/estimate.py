@@ -0,0 +1,46 @@
+def main():
+    from pyemaps import Crystal, BlochSession, TY_LACBED
+
+    si = Crystal.from_builtin('Silicon')
+
+    est = si.estimateBloch(sampling = 10, det_size = 256)
+    assert est['nbeams'] > 0 and est['nsampling'] > 0
+    assert est['flops'] == est['nsampling']*est['point_flops']
+    assert est['image_bytes'] == BlochSession.image_bytes(det_size = 256)
+    assert est['total_bytes'] == est['eigen_bytes'] + est['image_bytes']
+    assert est['fits'] is None
+
+    lacbed = si.estimateBloch(sampling = 10, det_size = 256, nType = TY_LACBED, mem_limit = 1024)
+    assert lacbed['image_bytes'] == est['image_bytes']*est['nbeams']
+    assert lacbed['fits'] is False
+
+    # a smaller objective aperture cuts the pre-pass beams
+    narrow = si.estimateBloch(aperture = 0.5, sampling = 10, det_size = 256)
+    assert 0 < narrow['nbeams'] <= est['nbeams']
+    assert narrow['nsampling'] == est['nsampling']
+
+    for bad in (dict(aperture = 0), dict(aperture = None), dict(omega = 1.5)):
+        try:
+            si.estimateBloch(**bad)
+        except Exception:
+            pass
+        else:
+            raise AssertionError(f'Estimate allowed invalid input {bad}')
+
+    with BlochSession(si, sampling = 10) as bs:
+        assert est['nbeams'] >= bs.nbeams, \
+            f"Estimated beams {est['nbeams']} below the {bs.nbeams} calculated"
+        assert est['nsampling'] >= bs.nsampling, \
+            f"Estimated sampling points {est['nsampling']} below the {bs.nsampling} run"
+
+        try:
+            si.estimateBloch()
+        except Exception:
+            pass
+        else:
+            raise AssertionError('Estimate allowed during an open Bloch simulation')
+
+    print('unit test for Bloch resource estimates completed')
+
+if __name__ == '__main__':
+    main()
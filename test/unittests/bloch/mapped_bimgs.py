@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession, BImgList, TY_LACBED
+
+    si = Crystal.from_builtin('Silicon')
+
+    with BlochSession(si) as bs:
+        bimgs = bs.getBlochImages(sample_thickness = (200, 300, 100), det_size = 64, nType = TY_LACBED)
+
+    with tempfile.TemporaryDirectory() as d:
+        fn = os.path.join(d, 'si_lacbed.im3')
+        nimgs = len(bimgs.blochList)
+        bimgs.save_im3(fn)
+        assert bimgs.filename == fn
+
+        # the header holds the number of thicknesses, as the backend writes it
+        header = np.fromfile(fn, dtype = np.int32, count = 2).tolist()
+        assert header == [64, 2], f'Raw image file header {header}, expected [64, 2]'
+        assert os.path.getsize(fn) == 8 + 64*64*nimgs*4
+
+        mapped = BImgList.from_im3(fn)
+        assert isinstance(mapped.blochList[0][1], np.memmap), 'Bloch images are not memory mapped'
+        assert mapped == bimgs, 'Memory mapped Bloch images differ'
+
+        for (e1, _), (e2, _) in zip(mapped.blochList, bimgs.blochList):
+            assert e1 == e2 and e1.simc.sth == e2.simc.sth, 'Bloch image controls not restored'
+
+        del mapped
+        bimgs = None
+
+    print('unit test for memory mapped Bloch image lists completed')
+
+if __name__ == '__main__':
+    main()
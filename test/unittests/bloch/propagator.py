@@ -0,0 +1,46 @@
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession, BlochError
+
+    si = Crystal.from_builtin('Silicon')
+    ths = [150, 333, 600]
+
+    with BlochSession(si) as bs:
+        ibs = bs.sampling_points[:3]
+        bp = bs.getPropagator(ib_list = ibs, ref_thickness = 200, thickness_range = (150, 600))
+        res = bs.getSCMatrixBatch(ib_list = ibs, thicknesses = ths)
+
+    # propagated after the session is closed
+    scm = bp.getSCMatrix(ths)
+    intensities = bp.getIntensities(ths)
+
+    assert scm.shape[:2] == (len(ibs), len(ths))
+    assert intensities.shape == scm.shape[:3]
+
+    for i, ib in enumerate(ibs):
+        n = bp.ndim[i]
+        for t, th in enumerate(ths):
+            assert np.allclose(scm[i, t, :n, :n], res['scm'][i, 0, t, :n, :n], atol = 1.0e-3), \
+                f'Propagated scattering matrix at {ib}, thickness {th} differs'
+
+        i0 = np.flatnonzero(np.all(bp.beams[i, :n] == 0, axis = 1))[0]
+        assert np.allclose(intensities[i, :, :n], np.abs(scm[i, :, :n, i0])**2)
+
+    # non-integer thicknesses
+    assert bp.getIntensities(np.linspace(300.0, 301.0, 5)).shape[1] == 5
+
+    # only the checked thickness range is propagated
+    assert bp.thickness_range == (150, 600)
+    for th in (100, 600.5):
+        try:
+            bp.getSCMatrix(th)
+        except BlochError:
+            pass
+        else:
+            raise AssertionError(f'Propagated outside the thickness range at {th}')
+
+    print('unit test for Bloch propagator completed')
+
+if __name__ == '__main__':
+    main()
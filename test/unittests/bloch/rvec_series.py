@@ -0,0 +1,27 @@
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession
+
+    si = Crystal.from_builtin('Silicon')
+    rvecs = [(0.0, 0.0, 0.0), (0.25, 0.0, 0.0), (0.1, 0.2, 0.3), (0.5, 0.5, 0.0)]
+    ths = [150, 300]
+
+    with BlochSession(si) as bs:
+        ibs = bs.sampling_points[:3]
+        series = bs.getRvecSeries(rvecs, ib_list = ibs, thicknesses = ths)
+        res = bs.getSCMatrixBatch(ib_list = ibs, thicknesses = ths, rvecs = rvecs)
+
+    print(f"R vector series computed from phases: {series['phased']}")
+
+    assert series['scm'].shape[:3] == (len(rvecs), len(ibs), len(ths))
+    assert np.array_equal(series['ndim'], res['ndim'])
+
+    for r, rv in enumerate(rvecs):
+        assert np.allclose(series['scm'][r], res['scm'][:, r], atol = 1.0e-3), \
+            f'Scattering matrices of R vector {rv} differ'
+
+    print('unit test for R vector series completed')
+
+if __name__ == '__main__':
+    main()
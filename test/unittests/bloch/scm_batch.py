@@ -0,0 +1,34 @@
+import numpy as np
+
+def main():
+    from pyemaps import Crystal, BlochSession
+
+    si = Crystal.from_builtin('Silicon')
+    ths = [100, 200]
+
+    with BlochSession(si) as bs:
+        ibs = bs.sampling_points[:3]
+        res = bs.getSCMatrixBatch(ib_list = ibs, thicknesses = ths)
+
+        assert res['scm'].shape[:3] == (len(ibs), 1, len(ths))
+
+        for i, ib in enumerate(ibs):
+            for t, th in enumerate(ths):
+                ndim, scm, ev, beams = bs.getSCMatrix(ib_coords = ib, sample_thickness = th)
+                assert ndim == res['ndim'][i]
+                assert np.allclose(res['scm'][i, 0, t, :ndim, :ndim], scm), \
+                    f'Batched scattering matrix at {ib}, thickness {th} differs'
+                assert np.allclose(res['ev'][i, 0, :ndim], ev)
+                assert np.array_equal(res['beams'][i, :ndim], beams)
+
+        _, _, _, beams = bs.getSCMatrix(ib_coords = ibs[0])
+        sel = bs.getSCMatrixBatch(ib_list = ibs[:1], beams = beams[:2])
+        assert sel['scm'].shape[-2:] == (2, 2) and sel['present'].all()
+
+        ev = bs.getSCMatrixBatch(ib_list = ibs, bEigenOnly = True)
+        assert ev['scm'] is None and np.allclose(ev['ev'], res['ev'])
+
+    print('unit test for batched scattering matrices completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+def session_reuse():
+    from pyemaps import Crystal, BlochSession, EMC, SIMC
+
+    si = Crystal.from_builtin('Silicon')
+    emc = EMC(cl=200, simc = SIMC(gmax=1.0, excitation=(0.3,1.0)))
+    
+    bimgs = si.generateBloch(sampling = 8, det_size = 128, 
+                             sample_thickness = (200, 300, 100),
+                             em_controls = emc)
+
+    with BlochSession(si, sampling = 8, em_controls = emc) as bs:
+        assert bs.nsampling > 0 and len(bs.sampling_points) == bs.nsampling
+
+        simgs = bs.getBlochImages(det_size = 128, sample_thickness = (200, 300, 100))
+        assert simgs == bimgs, 'Bloch images from session differ from generateBloch'
+
+        # more renders from the same eigen-solutions
+        small = bs.getBlochImages(det_size = 64, sample_thickness = (200, 200, 100))
+        assert len(small.blochList) == 1
+        assert bs.nrenders == 2
+
+        ndim, scm, ev, beams = bs.getSCMatrix(ib_coords = bs.sampling_points[0])
+        assert scm.shape == (ndim, ndim) and len(ev) == ndim
+
+        mem = bs.memory()
+        assert mem['images'] == 64*64*4, f'Image memory {mem["images"]} is not for the last render'
+        assert mem['peak_images'] == 128*128*2*4
+        assert mem['eigen'] > 0
+
+    assert bs.closed
+
+def session_replaced():
+    from pyemaps import Crystal, BlochSession, BlochError
+
+    si = Crystal.from_builtin('Silicon')
+
+    bs1 = BlochSession(si)
+    bs2 = BlochSession(si)
+    assert bs1.closed and not bs2.closed
+
+    try:
+        bs1.getBlochImages()
+    except BlochError:
+        pass
+    else:
+        assert False, 'Replaced Bloch session was used'
+
+    bs1.close()
+    assert not bs2.closed, 'Closing a replaced session ended the current one'
+    bs2.close()
+
+def session_limit():
+    from pyemaps import Crystal, BlochSession, BlochError
+
+    si = Crystal.from_builtin('Silicon')
+
+    with BlochSession(si, mem_limit = 1024*1024) as bs:
+        try:
+            bs.getBlochImages(det_size = 512)
+        except BlochError:
+            pass
+        else:
+            assert False, 'Bloch images over the session memory limit generated'
+
+def main():
+    session_reuse()
+    session_replaced()
+    session_limit()
+
+    print('unit test for dynamic diffraction sessions completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+from pyemaps import Crystal as cr
+from pyemaps import EMC
+from pyemaps.diffract.dpgen_dec import split_vertices
+import json
+import os
+import tempfile
+
+
+def test_split_vertices():
+
+    tris = split_vertices([[0,0,1],[1,1,1],[0,1,1]], depth = 2)
+    assert len(tris) == 16
+
+    quads = split_vertices([[0,0,1],[1,0,1],[1,1,1],[0,1,1]], depth = 1)
+    assert len(quads) == 8
+    assert all(len(t) == 3 and all(isinstance(v, int) for z in t for v in z) for t in quads)
+
+def test_split_vertices_midpoints():
+
+    import numpy as np
+    from pyemaps.diffract.dpgen_dec import _lattice_basis, ZONE_ANGLE_TOL
+
+    def angle(basis, p, q):
+        u, v = basis @ np.array(p, dtype=float), basis @ np.array(q, dtype=float)
+        return np.degrees(np.arccos(np.clip(u @ v/np.linalg.norm(u)/np.linalg.norm(v), -1.0, 1.0)))
+
+    # edges are split at their angular midpoints, also in a hexagonal lattice
+    for cell, verts in ((None, [[0,0,1],[1,1,1],[0,1,1]]),
+                        ([3.0, 3.0, 5.0, 90.0, 90.0, 120.0], [[0,0,1],[1,0,0],[1,1,0]])):
+        basis = np.identity(3) if cell is None else _lattice_basis(cell)
+        a, b, c = verts
+        ab, bc, ca = split_vertices(verts, depth = 1, cell = cell)[3]
+        for p, q, m in ((a, b, ab), (b, c, bc), (c, a, ca)):
+            assert abs(angle(basis, p, m) - angle(basis, p, q)/2) < ZONE_ANGLE_TOL
+            assert abs(angle(basis, q, m) - angle(basis, p, q)/2) < ZONE_ANGLE_TOL
+
+def test_dpgen_shards_resume():
+
+    si = cr.from_builtin('Silicon')
+    fn = os.path.join(tempfile.mkdtemp(), 'si_shards')
+
+    counts = []
+    ret, mfn = si.generateDPDBSharded(emc = EMC(zone=(0,0,1)), res = 100, depth = 1,
+                                      nworkers = 2, output_fn = fn,
+                                      progress = lambda n, total: counts.append((n, total)))
+    assert ret == 0 and os.path.exists(mfn)
+    assert counts[-1] == (4, 4)
+
+    with open(mfn) as f:
+        shards = json.load(f)['shards']
+    assert all(sh['status'] == 'done' and os.path.exists(sh['file']) for sh in shards)
+
+    # only the missing part is generated again
+    os.remove(shards[1]['file'])
+    counts = []
+    ret, _ = si.generateDPDBSharded(emc = EMC(zone=(0,0,1)), res = 100, depth = 1,
+                                    nworkers = 2, output_fn = fn,
+                                    progress = lambda n, total: counts.append((n, total)))
+    assert ret == 0 and counts == [(4, 4)]
+
+    with open(mfn) as f:
+        manifest = json.load(f)
+    assert manifest['key']['res'] == 100
+
+def test_dpgen_shards_extend_region():
+
+    si = cr.from_builtin('Silicon')
+    d = tempfile.mkdtemp()
+
+    tri = [[0,0,1],[1,0,1],[1,1,1]]
+    ret, tri_mfn = si.generateDPDBSharded(emc = EMC(zone=(0,0,1)), res = 100, depth = 0,
+                                          vertices = tri, nworkers = 2,
+                                          output_fn = os.path.join(d, 'tri'))
+    assert ret == 0
+
+    # the first triangle of the extended region is reused from the earlier database
+    counts = []
+    ret, mfn = si.generateDPDBSharded(emc = EMC(zone=(0,0,1)), res = 100, depth = 0,
+                                      vertices = tri + [[0,1,1]], nworkers = 2,
+                                      output_fn = os.path.join(d, 'quad'), base = tri_mfn,
+                                      progress = lambda n, total: counts.append((n, total)))
+    assert ret == 0 and counts == [(2, 2)]
+
+    with open(tri_mfn) as f:
+        tri_file = json.load(f)['shards'][0]['file']
+    with open(mfn) as f:
+        assert json.load(f)['shards'][0]['file'] == tri_file
@@ -0,0 +1,60 @@
+import numpy as np
+
+from pyemaps import EMC, EMCGrid, EMCError
+
+def grid_controls():
+    tx = np.linspace(-1.0, 1.0, 5).tolist()
+    ty = [0.0, 0.5]
+    grid = EMCGrid.tilt_grid(tx, ty, zone = (0,1,1), vt = 100.0)
+
+    assert len(grid) == len(tx)*len(ty), f'Grid has {len(grid)} rows, expected {len(tx)*len(ty)}'
+
+    emcs = [EMC(tilt=(x, y), zone=(0,1,1), vt=100.0) for x in tx for y in ty]
+    for i, emc in enumerate(grid):
+        assert emc == emcs[i], f'Grid controls {i} differ'
+
+    assert grid[-1] == emcs[-1]
+    assert len(grid[2:6]) == 4
+
+def grid_sort():
+    grid = EMCGrid(zone = [(1,1,1), (0,0,1), (0,0,1)],
+                   tilt = [(0.0, 0.0), (0.5, 0.0), (0.0, 0.0)])
+    emcs = sorted(grid, key = lambda e: (e.zone, e.tilt))
+
+    grid.sort()
+    assert [e.zone for e in grid] == [e.zone for e in emcs]
+    assert [e.tilt for e in grid] == [e.tilt for e in emcs]
+
+def grid_validation():
+    for bad in (dict(zone = (0,0,0)), 
+                dict(zone = (0.0, 0.0, 1.0)),
+                dict(tilt = np.zeros((3,2)), cl = [1000.0, 1200.0]),
+                dict(vt = np.nan)):
+        try:
+            EMCGrid(**bad)
+        except EMCError:
+            continue
+        
+        assert False, f'Invalid grid controls {bad} accepted'
+
+def grid_batch():
+    from pyemaps import Crystal
+
+    si = Crystal.from_builtin('Silicon')
+    grid = EMCGrid.tilt_grid(np.arange(-2, 2)*0.5, [0.0])
+
+    gdpl = si.generateDPBatch(grid)
+    dpl = si.generateDPBatch([EMC(tilt=(0.5*i, 0.0)) for i in range(-2, 2)])
+
+    assert gdpl == dpl, 'Patterns from grid controls differ'
+
+def main():
+    grid_controls()
+    grid_sort()
+    grid_validation()
+    grid_batch()
+
+    print('unit test for microscope controls grid completed')
+
+if __name__ == '__main__':
+    main()
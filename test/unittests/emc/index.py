@@ -0,0 +1,30 @@
+from pyemaps import EMC
+
+from pyemaps.emcontrols import EMCIndex, EMC_QUANTUM
+
+def main():
+
+    # equal by the relative tolerance of large values, in adjacent cells
+    big = EMC(cl = 1.0e6 + 4.9*EMC_QUANTUM)
+    other = EMC(cl = 1.0e6 - 4.9*EMC_QUANTUM)
+    assert big == other
+
+    # equal by the absolute tolerance, across a cell boundary
+    low = EMC(tilt = (EMC_QUANTUM - 1.0e-11, 0.0))
+    high = EMC(tilt = (EMC_QUANTUM, 0.0))
+    assert low == high
+
+    ix = EMCIndex()
+    ix.add(big, 0)
+    ix.add(low, 1)
+    ix.add(EMC(), 2)
+
+    assert ix.find(other) == [0], f'Found {ix.find(other)} for equal large controls'
+    assert ix.find(high) == [1], f'Found {ix.find(high)} across a cell boundary'
+    assert ix.find(EMC(cl = 500)) == [], 'Found controls not indexed'
+    assert len(ix) == 3
+
+    print('unit test for EMControl index completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+def generate_tilt_series(name = 'Silicon', mode = 1):
+
+    from pyemaps import Crystal, EMC, DPList
+
+    cr = Crystal.from_builtin(name)
+
+    dpl = DPList(name, mode = mode)
+    emclist = []
+    for i in range(-3,3):
+        emclist.append(EMC(tilt=(i*0.5, 0.0)))
+        emc, dp = cr.generateDP(mode = mode, em_controls = EMC(tilt=(i*0.5, 0.0)))
+        dpl.add(emc, dp)
+
+    bdpl = cr.generateDPBatch(emclist, mode = mode, bTiming = True)
+
+    return dpl, bdpl
+
+def main():
+    for mode in (1, 2):
+        dpl, bdpl = generate_tilt_series(mode = mode)
+        assert len(bdpl.diffList) == len(dpl.diffList), \
+            f'Batch generated {len(bdpl.diffList)} patterns, expected {len(dpl.diffList)}'
+
+        assert bdpl == dpl, f'Batch generated patterns differ in mode {mode}'
+
+    print('unit test for kinematic diffraction batch generation completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+def generate_cached(name = 'Silicon', mode = 1):
+
+    import tempfile
+    from pyemaps import Crystal, EMC, SimCache
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = SimCache(cache_dir = d)
+
+        _, dp = cr.generateDP(mode = mode, em_controls = EMC(tilt=(0.5, 0.0)))
+        _, cdp1 = cache.generateDP(cr, mode = mode, em_controls = EMC(tilt=(0.5, 0.0)))
+        _, cdp2 = cache.generateDP(cr, mode = mode, em_controls = EMC(tilt=(0.5, 0.0)))
+
+        return dp, cdp1, cdp2, cache.stats()
+
+def stereo_cached(name = 'Silicon'):
+
+    import tempfile
+    from pyemaps import Crystal, SimCache
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = SimCache(cache_dir = d)
+
+        return cache.generateStereo(cr), cache.generateStereo(cr), cache.stats()
+
+def unknown_backend(name = 'Silicon'):
+
+    import tempfile
+    from pyemaps import Crystal, SimCache
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = SimCache(cache_dir = d)
+        cache._version = None
+
+        cache.generateStereo(cr)
+        cache.generateStereo(cr)
+
+        return cache.stats()
+
+def main():
+    for mode in (1, 2):
+        dp, cdp1, cdp2, stats = generate_cached(mode = mode)
+
+        assert stats['hits'] == 1 and stats['misses'] == 1, \
+            f'Unexpected cache usage in mode {mode}: {stats}'
+
+        assert dp == cdp1 and dp == cdp2, f'Cached patterns differ in mode {mode}'
+
+    sl, csl, stats = stereo_cached()
+    assert stats['hits'] == 1 and stats['misses'] == 1, f'Unexpected cache usage of stereo: {stats}'
+    assert csl == sl, 'Cached stereodiagram differs'
+    assert all(type(i) is int for s in csl for i in s['idx']), 'Cached stereo indexes are not int'
+
+    stats = unknown_backend()
+    assert stats['hits'] == 0 and stats['entries'] == 0, \
+        f'Results cached for an unknown backend version: {stats}'
+
+    print('unit test for cached kinematic diffraction completed')
+
+if __name__ == '__main__':
+    main()
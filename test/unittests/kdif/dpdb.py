@@ -0,0 +1,40 @@
+def build_refined(name = 'Silicon', res = 4):
+
+    import tempfile
+    from pyemaps import Crystal, EMC
+    from pyemaps.dpdb import DPDatabase, zone_grid
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        coarse = DPDatabase.build(cr, d, res = res)
+        ncoarse = len(coarse)
+
+        fine = DPDatabase.build(cr, d, res = 2*res)
+        again = DPDatabase.build(cr, d, res = 2*res)
+
+        _, dp = cr.generateDP(em_controls = EMC(zone = tuple(fine.zones[-1].tolist())))
+
+        return (ncoarse, fine.regions, len(again), len(zone_grid(res = 2*res)),
+                fine.peaks(len(fine) - 1), dp)
+
+def main():
+    import numpy as np
+
+    ncoarse, regions, nagain, nfine, (xy, hkl), dp = build_refined()
+
+    assert regions[1]['added'] == nfine - ncoarse, \
+        f'Refined grid simulated {regions[1]["added"]} patterns, expected {nfine - ncoarse}'
+
+    assert regions[2]['added'] == 0 and nagain == nfine, \
+        f'Rebuilding the same grid simulated {regions[2]["added"]} patterns'
+
+    disks = dp.disks_arr
+    center = np.all(np.rint(disks[:, 3:6]) == 0, axis = 1)
+    assert len(xy) == len(hkl) == int((~center).sum()), \
+        f'Stored {len(xy)} peaks, expected {int((~center).sum())}'
+
+    print('unit test for incremental DP database refinement completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+def match_rotated(name = 'Silicon', res = 6, angle = 30.0, scale = 1.5):
+
+    import tempfile
+    import numpy as np
+    from pyemaps import Crystal
+    from pyemaps.dpdb import DPDatabase, DescriptorIndex
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        db = DPDatabase.build(cr, d, res = res)
+
+        i = len(db)//2
+        xy, _ = db.peaks(i)
+
+        t = np.radians(angle)
+        rot = scale*np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
+        matches = db.match(xy @ rot.T)
+
+        descriptors = np.array(db.descriptors)
+        nearest, _ = db.index.query(descriptors[i], k = 5)
+
+        # the tree walk of databases above the full scan size
+        tree, _ = DescriptorIndex(descriptors, leaf_size = 4, brute_force = 0).query(descriptors[i], k = 5)
+
+        db.close()
+
+        return i, matches, descriptors, nearest, tree
+
+def main():
+    import numpy as np
+
+    i, matches, descriptors, nearest, tree = match_rotated()
+
+    brute = np.argsort(np.linalg.norm(descriptors - descriptors[i], axis = 1), kind = 'stable')[:5]
+    assert np.allclose(np.linalg.norm(descriptors[nearest] - descriptors[i], axis = 1),
+                       np.linalg.norm(descriptors[brute] - descriptors[i], axis = 1)), \
+        f'Descriptor index found {nearest}, expected {brute}'
+
+    assert np.allclose(np.linalg.norm(descriptors[tree] - descriptors[i], axis = 1),
+                       np.linalg.norm(descriptors[brute] - descriptors[i], axis = 1)), \
+        f'Descriptor index tree found {tree}, expected {brute}'
+
+    assert i in matches['pattern'], f'Pattern {i} not among the candidates {matches["pattern"]}'
+
+    best = matches[0]
+    assert np.isclose(best['correlation'], 1.0), \
+        f'Best match correlation {best["correlation"]}, expected 1.0'
+
+    own = matches[matches['pattern'] == i][0]
+    assert np.isclose(own['correlation'], 1.0) and np.isclose(own['scale'], 1.5), \
+        f'Pattern {i} fitted with correlation {own["correlation"]} and scale {own["scale"]}'
+
+    print('unit test for DP database matching completed')
+
+if __name__ == '__main__':
+    main()
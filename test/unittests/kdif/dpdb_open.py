@@ -0,0 +1,42 @@
+def open_resident(name = 'Silicon', res = 4):
+
+    import tempfile
+    from pyemaps import Crystal
+    from pyemaps.dpdb import DPDatabase
+
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        DPDatabase.build(cr, d, res = res)
+
+        db1 = DPDatabase.open(d)
+        db2 = DPDatabase.open(d)
+
+        peaks = [db1.peaks(i)[0].copy() for i in range(len(db1))]
+        descriptors = db1.descriptors.copy()
+        same = db1 is db2
+
+        db1.close()
+
+        return same, peaks, descriptors
+
+def main():
+    import numpy as np
+    from pyemaps.dpdb import peak_descriptor
+
+    same, peaks, descriptors = open_resident()
+
+    assert same, 'DP database opened again instead of kept resident'
+
+    rot = np.array([[0.0, -1.5], [1.5, 0.0]])
+    for i, xy in enumerate(peaks):
+        assert np.allclose(peak_descriptor(xy), descriptors[i]), \
+            f'Stored descriptor of pattern {i} differs'
+
+        assert np.allclose(peak_descriptor(xy @ rot.T), descriptors[i], atol = 1e-6), \
+            f'Descriptor of pattern {i} changes with rotation and scale'
+
+    print('unit test for memory mapped DP database completed')
+
+if __name__ == '__main__':
+    main()
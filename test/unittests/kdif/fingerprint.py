@@ -0,0 +1,27 @@
+def main():
+    import copy
+    from pyemaps import Crystal
+
+    si = Crystal.from_builtin('Silicon')
+    key = si._fingerprint()
+
+    # the name is not part of the crystal data
+    other = copy.deepcopy(si)
+    other.name = 'Other'
+    assert other._fingerprint() == key, 'Fingerprint changed with the crystal name'
+
+    # a site change that prints the same as the number changes nothing
+    loc = other.atoms[0].loc
+    loc[0] = str(loc[0])
+    other.atoms[0].loc = loc
+    assert other._fingerprint() == key, 'Fingerprint changed with the type of a site value'
+
+    # any change of the site data does
+    loc[0] = float(loc[0]) + 1.0e-12
+    other.atoms[0].loc = loc
+    assert other._fingerprint() != key, 'Fingerprint unchanged by a site change'
+
+    print('unit test for crystal fingerprints completed')
+
+if __name__ == '__main__':
+    main()
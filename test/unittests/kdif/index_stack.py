@@ -0,0 +1,58 @@
+CONTROLS = dict(cc = 29.0,
+                sigma = 3.0,
+                img_center = (99.923, 99.919),
+                rmin = 10,
+                search_box = 10.0,
+                scaling_option = (1, 2),
+                filter_threshold = 0.0,
+                peak_threshold = 0.8)
+
+def main(name = 'Aluminium', res = 100):
+    import os
+    import tempfile
+    import numpy as np
+    import pyemaps
+    from pyemaps import Crystal, EMC, StackImage, XDPImageError
+    from pyemaps.stackimg import ediom
+
+    imgfn = os.path.join(os.path.dirname(pyemaps.__file__), 'samples', 'al.img')
+    cr = Crystal.from_builtin(name)
+
+    with tempfile.TemporaryDirectory() as d:
+        ret, dbfn = cr.generateDPDB(emc = EMC(zone = (0,0,1)), res = res, xa = (2,0,0),
+                                    output_fn = os.path.join(d, 'al_dpdb'))
+        assert ret == 0, 'Failed to generate the DP database'
+
+        img = StackImage(imgfn)
+        omap = img.indexStack(dbfn, **CONTROLS)
+        assert len(omap) == 1 and omap['layer'][0] == 1, f'Indexed layers {omap["layer"]}, expected [1]'
+
+        r = omap[0]
+        assert r['status'] == 0 and r['npeaks'] > 3 and r['nindexed'] > 0, \
+            f'Layer not indexed: status {r["status"]}, {r["npeaks"]} peaks, {r["nindexed"]} indexed'
+
+        pool = img.indexStack(dbfn, nworkers = 2, **CONTROLS)
+        assert (pool == omap).all(), 'Pool results differ from those of this process'
+
+        # the results are those of indexImage of the layer
+        _, mr, mc = StackImage.loadDPDB(dbfn)
+        assert img.indexImage(dbfn, **CONTROLS) == 0, 'indexImage failed'
+
+        ret, fmap = ediom.getFitMap(mr*mc)
+        assert ret == 0
+        assert ediom.getExpImagePeaks() == r['nindexed'], \
+            f'indexStack indexed {r["nindexed"]} peaks, indexImage {ediom.getExpImagePeaks()}'
+        assert np.argmax(fmap) == r['map_row']*mc + r['map_col'] and np.max(fmap) == r['fit'], \
+            'Matching index maps of indexStack and indexImage differ'
+
+        try:
+            img.indexStack(dbfn, stacks = [2], **CONTROLS)
+        except XDPImageError:
+            pass
+        else:
+            raise AssertionError('Layer out of range accepted')
+
+    print('unit test for image stack indexing completed')
+
+if __name__ == '__main__':
+    main()
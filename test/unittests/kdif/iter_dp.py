@@ -0,0 +1,28 @@
+def tilt_sweep(n = 6):
+    from pyemaps import EMC
+
+    for i in range(n):
+        yield EMC(tilt=((i - n//2)*0.5, 0.0))
+
+def main():
+    from pyemaps import Crystal
+
+    cr = Crystal.from_builtin('Silicon')
+
+    for mode in (1, 2):
+        bdpl = cr.generateDPBatch(list(tilt_sweep()), mode = mode)
+
+        n = 0
+        for emc, dp in cr.iterDP(tilt_sweep(), mode = mode):
+            bemc, bdp = bdpl.diffList[n]
+            assert emc == bemc, f'Streamed pattern {n} controls differ in mode {mode}'
+            assert dp == bdp, f'Streamed pattern {n} differs in mode {mode}'
+            n += 1
+
+        assert n == len(bdpl.diffList), \
+            f'Streamed {n} patterns, expected {len(bdpl.diffList)}'
+
+    print('unit test for streamed kinematic diffraction completed')
+
+if __name__ == '__main__':
+    main()
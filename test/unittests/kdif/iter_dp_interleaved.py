@@ -0,0 +1,31 @@
+def tilt_sweep(n = 6):
+    from pyemaps import EMC
+
+    for i in range(n):
+        yield EMC(tilt=((i - n//2)*0.5, 0.0))
+
+def main():
+    from pyemaps import Crystal, EMC
+
+    cr = Crystal.from_builtin('Silicon')
+
+    bdpl = cr.generateDPBatch(list(tilt_sweep()), mode = 2, dsize = 0.2)
+
+    n = 0
+    stream = cr.iterDP(tilt_sweep(), mode = 2, dsize = 0.2)
+    for emc, dp in stream:
+        bemc, bdp = bdpl.diffList[n]
+        assert emc == bemc, f'Interleaved stream pattern {n} controls differ'
+        assert dp == bdp, f'Interleaved stream pattern {n} differs'
+
+        # sets other zone, mode and controls in the backend between patterns
+        cr.generateDP(mode = 1, em_controls = EMC(zone = (1,1,1), cl = 500))
+        n += 1
+
+    assert n == len(bdpl.diffList), \
+        f'Streamed {n} patterns, expected {len(bdpl.diffList)}'
+
+    print('unit test for interleaved streamed kinematic diffraction completed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+def main():
+    import gc
+    from pyemaps import Crystal
+    from pyemaps.diffract.dif_dec import _resident
+
+    si1 = Crystal.from_builtin('Silicon')
+    si2 = Crystal.from_builtin('Silicon')
+    si1.load()
+    si2.load()
+
+    # the data is shared, and kept while one crystal still uses it
+    del si1
+    gc.collect()
+    assert si2.loaded() and _resident['key'] is not None, \
+        'Backend data freed while a crystal still uses it'
+
+    # and freed with the last one
+    del si2
+    gc.collect()
+    assert _resident['key'] is None and not _resident['owners'], \
+        'Backend data kept after its last crystal was deleted'
+
+    print('unit test for shared backend crystal data completed')
+
+if __name__ == '__main__':
+    main()
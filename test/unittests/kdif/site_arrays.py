@@ -0,0 +1,40 @@
+def main():
+    import copy
+    import numpy as np
+    from pyemaps import Crystal
+
+    si = Crystal.from_builtin('Silicon')
+    xyz0 = si._site_arrays()[0]['xyz'].copy()
+
+    # positions changed in place are picked up, and changed back
+    si.atoms[0].loc[0] = 0.3
+    assert np.isclose(si._site_arrays()[0]['xyz'][0, 0], 0.3), \
+        'Site arrays not rebuilt for a position changed in place'
+
+    si.atoms[0].loc[0] = xyz0[0, 0]
+    assert np.array_equal(si._site_arrays()[0]['xyz'], xyz0), \
+        'Site arrays not rebuilt for a position changed back in place'
+
+    # changes of the atoms of another crystal rebuild no arrays of this one
+    sites = si._site_arrays()
+    other = Crystal.from_builtin('Silicon')
+    other.atoms[0].loc = [0.1, 0.1, 0.1, 0.5]
+    assert si._site_arrays() is sites, 'Site arrays rebuilt for a change of another crystal'
+
+    # atoms replaced in the list, and put back, are picked up
+    old = si.atoms[0]
+    moved = copy.deepcopy(old)
+    moved.loc[0] = 0.3
+
+    si.atoms[0] = moved
+    assert np.isclose(si._site_arrays()[0]['xyz'][0, 0], 0.3), \
+        'Site arrays not rebuilt for a replaced atom'
+
+    si.atoms[0] = old
+    assert np.array_equal(si._site_arrays()[0]['xyz'], xyz0), \
+        'Site arrays not rebuilt for an atom put back'
+
+    print('unit test for crystal site arrays completed')
+
+if __name__ == '__main__':
+    main()